@@ -2,19 +2,38 @@
 Flask application entry point for AI Services API.
 """
 
+import multiprocessing
+import os
 from flask import Flask, jsonify
 from flask_cors import CORS
 from routes_ai import ai_routes
+from vision_ai.image_classifier import warmup_classifier
+from shared.uploads import InMemoryRequest, max_request_bytes
 
 # Create Flask app
 app = Flask(__name__)
 
+# Keep uploads in memory and reject oversized bodies while streaming
+app.request_class = InMemoryRequest
+app.config['MAX_CONTENT_LENGTH'] = max_request_bytes()
+
 # Enable CORS for frontend integration
 CORS(app, resources={r"/ai/*": {"origins": "*"}})
 
 # Register AI routes blueprint
 app.register_blueprint(ai_routes)
 
+# Load and warm up the vision model once per process, so the first
+# classification request does not pay for loading ResNet50 weights.
+# Set VISION_WARMUP=false to defer loading until the first request.
+# Inference worker processes (VISION_MODEL_SERVER) may re-import this module
+# while starting up; they load their own model, so they skip it.
+if os.getenv('VISION_WARMUP', 'true').lower() == 'true' and multiprocessing.current_process().name == 'MainProcess':
+    try:
+        warmup_classifier()
+    except Exception as e:
+        print(f"⚠️  Vision AI warmup failed, model will load on first request: {e}")
+
 
 @app.route('/')
 def index():
@@ -25,8 +44,17 @@ def index():
         "endpoints": {
             "health": "/ai/health",
             "classify_image": "/ai/classify_image",
+            "classify_images": "/ai/classify_images",
+            "similar_crafts": "/ai/similar_crafts",
+            "reload_classifier": "/ai/classifier/reload",
+            "classifier_stats": "/ai/classifier/stats",
             "generate_story": "/ai/generate_story",
-            "generate_lesson": "/ai/generate_lesson"
+            "generate_lesson": "/ai/generate_lesson",
+            "stream_story": "/ai/generate_story/stream",
+            "stream_lesson": "/ai/generate_lesson/stream",
+            "generate_bundle": "/ai/generate_bundle",
+            "craft_pipeline": "/ai/craft_pipeline",
+            "generation_stats": "/ai/generation/stats"
         },
         "documentation": "See README.md for API usage"
     })
@@ -50,13 +78,21 @@ if __name__ == '__main__':
     print("   GET  /health        - Health check")
     print("   GET  /ai/health     - AI services health check")
     print("   POST /ai/classify_image   - Vision AI image classification")
+    print("   POST /ai/classify_images  - Vision AI bulk classification")
+    print("   POST /ai/similar_crafts   - Visually similar catalog crafts")
+    print("   POST /ai/classifier/reload - Reload Vision AI model")
+    print("   GET  /ai/classifier/stats  - Vision AI runtime statistics")
     print("   POST /ai/generate_story   - Story generation")
     print("   POST /ai/generate_lesson  - Lesson generation")
+    print("   POST /ai/generate_story/stream  - Story generation (SSE)")
+    print("   POST /ai/generate_lesson/stream - Lesson generation (SSE)")
+    print("   POST /ai/generate_bundle     - Story + lesson in parallel")
+    print("   POST /ai/craft_pipeline      - Image -> story + lesson (SSE)")
+    print("   GET  /ai/generation/stats  - Story/lesson cache statistics")
     print("\n" + "="*70)
     print("🌐 Server running on http://localhost:5000")
     print("="*70 + "\n")
     
     # Use debug=False for production/Docker
-    import os
     debug_mode = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
     app.run(debug=debug_mode, host='0.0.0.0', port=5000)
@@ -3,30 +3,197 @@ Flask API routes for AI services integration.
 Exposes Vision AI, Story Generation, and Lesson Generation as REST endpoints.
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
+from werkzeug.exceptions import RequestEntityTooLarge
+import os
 import sys
+import time
 from pathlib import Path
 
 # Add current directory to path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from vision_ai.image_classifier import classify_craft_image
-from vertex_ai.story_service import generate_story
-from vertex_ai.lesson_service import generate_lesson
+from vision_ai.image_classifier import (
+    classify_craft_image,
+    classify_craft_images,
+    embed_craft_image,
+    get_batch_scheduler,
+    get_pipeline,
+    is_classifier_loaded,
+    loaded_inference_backend,
+    model_server_enabled,
+    reload_classifier
+)
+from vision_ai.result_cache import get_result_cache
+from vision_ai.near_duplicates import get_near_duplicate_index
+from vision_ai.image_io import ImageTooLargeError, InvalidImageError
+from vision_ai.similarity_index import get_similarity_index
+from shared.uploads import InvalidUploadError, UploadTooLargeError, decode_base64_image, read_limited
+from shared.utils import format_sse
+from vertex_ai.story_service import generate_story, stream_story
+from vertex_ai.lesson_service import generate_lesson, stream_lesson
+from vertex_ai.bundle_service import generate_bundle, iter_bundle, stream_bundle
+from vertex_ai.generation_cache import get_generation_cache, get_refresher, single_flight_stats
+from vertex_ai.model_gemini import gemini_call_stats
 
 # Create Blueprint
 ai_routes = Blueprint('ai_routes', __name__, url_prefix='/ai')
 
+# Upper bound on images accepted by one /classify_images request
+MAX_BULK_IMAGES = int(os.getenv('VISION_BULK_MAX_IMAGES', '256'))
+
+# Upper bound on neighbours returned by one /similar_crafts request
+MAX_SIMILAR_RESULTS = 100
+
+
+def _read_image_source() -> tuple:
+    """
+    Extract the image to classify from the current request.
+    
+    Supports a multipart file field named 'image', a raw image request body
+    (Content-Type image/* or application/octet-stream), and JSON with either
+    'image_base64' or a server-side 'image' path. Uploaded bytes are read
+    into memory with a size limit and never written to disk.
+    
+    Returns:
+        tuple: (image source, label for logging), or (None, None) if the
+        request does not contain an image
+    """
+    if 'image' in request.files:
+        upload = request.files['image']
+        return read_limited(upload.stream), upload.filename or "multipart upload"
+    
+    if request.mimetype.startswith('image/') or request.mimetype == 'application/octet-stream':
+        return read_limited(request.stream), "request body"
+    
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        if 'image_base64' in data:
+            return decode_base64_image(str(data['image_base64'])), "base64 payload"
+        if 'image' in data:
+            return data['image'], data['image']
+    
+    return None, None
+
+
+def _request_option(name: str):
+    """
+    Read an optional field from the JSON body or, for uploads, the form.
+    """
+    data = request.get_json(silent=True)
+    if isinstance(data, dict) and name in data:
+        return data[name]
+    if name in request.form:
+        return request.form[name]
+    return request.args.get(name)
+
+
+def _is_true(value) -> bool:
+    return value is True or str(value).lower() == 'true'
+
+
+def _generation_request() -> tuple:
+    """
+    Read craft_name, category and region from a JSON request body.
+    
+    Returns:
+        tuple: (dict with the three fields and use_cache, None), or
+        (None, error response) if the body is missing or incomplete
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        print("❌ Error: No JSON data provided")
+        return None, (jsonify({
+            "status": "error",
+            "message": "Request body must be JSON"
+        }), 400)
+    
+    required_fields = ['craft_name', 'category', 'region']
+    missing_fields = [field for field in required_fields if field not in data]
+    if missing_fields:
+        print(f"❌ Error: Missing fields: {', '.join(missing_fields)}")
+        return None, (jsonify({
+            "status": "error",
+            "message": f"Missing required fields: {', '.join(missing_fields)}"
+        }), 400)
+    
+    inputs = {field: data[field] for field in required_fields}
+    inputs["use_cache"] = not _is_true(data.get('bypass_cache'))
+    print(f"📝 Craft: {inputs['craft_name']}")
+    print(f"📦 Category: {inputs['category']}")
+    print(f"🌍 Region: {inputs['region']}")
+    return inputs, None
+
+
+def _sse_response(events) -> Response:
+    """
+    Stream (event, data) pairs as Server-Sent Events.
+    
+    Ends with a "done" event, or an "error" event if generation fails
+    part-way. If the client disconnects, closing the event iterator cancels
+    the Gemini calls that no other request is waiting for.
+    """
+    def generate():
+        try:
+            for event, data in events:
+                yield format_sse(data, event)
+            yield format_sse({}, "done")
+        except Exception as e:
+            print(f"❌ Stream error: {str(e)}")
+            yield format_sse({"message": str(e)}, "error")
+        finally:
+            events.close()
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        "Cache-Control": "no-cache",
+        # Stop nginx-style proxies from buffering the stream
+        "X-Accel-Buffering": "no"
+    })
+
+
+def _pipeline_events(classification: dict, classification_ms: float, use_cache: bool):
+    """
+    Events for /craft_pipeline: the classification, then the story and the
+    lesson for the detected craft as each completes, then the stage timings.
+    """
+    timings = {"classification": round(classification_ms, 1)}
+    yield "classification", classification
+    
+    craft_type = classification['craft_type']
+    parts = iter_bundle(
+        craft_type.replace('_', ' ').title(), craft_type, classification['possible_region'], use_cache
+    )
+    try:
+        for part, result, elapsed_ms in parts:
+            timings[part] = elapsed_ms
+            if isinstance(result, Exception):
+                print(f"⚠️  Pipeline {part} failed after {elapsed_ms} ms: {result}")
+                yield "error", {"part": part, "message": str(result)}
+            else:
+                yield part, result
+    finally:
+        parts.close()
+    
+    timings["total"] = round(timings["classification"] + max(timings["story"], timings["lesson"]), 1)
+    yield "timings", timings
+
 
 @ai_routes.route('/classify_image', methods=['POST'])
 def classify_image():
     """
     Classify craft image using Vision AI.
     
-    Request Body:
-        {
-            "image": "/path/to/image.jpg"
-        }
+    Request Body (any of):
+        JSON with a server-side path:
+            {"image": "/path/to/image.jpg"}
+        JSON with base64 image data (a data URL prefix is allowed):
+            {"image_base64": "iVBORw0KGgo..."}
+        multipart/form-data with a file field named "image"
+        Raw image bytes with Content-Type image/* or application/octet-stream
+    
+    Optional fields (JSON body, form fields or query string):
+        "return_embedding": true   include the 2048-d image embedding
+        "catalog_id": "item-123"   add the image to the similar-crafts index
     
     Response:
         {
@@ -46,21 +213,35 @@ def classify_image():
     
     try:
         # Get request data
-        data = request.get_json()
+        image_source, image_label = _read_image_source()
         
-        if not data or 'image' not in data:
-            print("❌ Error: Missing 'image' field in request")
+        if image_source is None:
+            print("❌ Error: Missing image in request")
             return jsonify({
                 "status": "error",
-                "message": "Missing 'image' field in request body"
+                "message": "Missing image: send an 'image' path or 'image_base64' in JSON, "
+                           "a multipart 'image' file, or raw image bytes"
             }), 400
         
-        image_path = data['image']
-        print(f"📸 Image Path: {image_path}")
+        print(f"📸 Image: {image_label}")
+        
+        return_embedding = _is_true(_request_option('return_embedding'))
+        catalog_id = _request_option('catalog_id')
         
         # Classify image
         print("🔄 Processing image...")
-        result = classify_craft_image(image_path)
+        if return_embedding or catalog_id:
+            result, embedding = embed_craft_image(image_source)
+            if catalog_id:
+                get_similarity_index().add(str(catalog_id), embedding, {
+                    "craft_type": result['craft_type'],
+                    "possible_region": result['possible_region']
+                })
+                print(f"🗂️  Indexed as: {catalog_id}")
+            if return_embedding:
+                result = dict(result, embedding=[round(float(v), 6) for v in embedding])
+        else:
+            result = classify_craft_image(image_source)
         
         print(f"✅ Classification successful!")
         print(f"   Craft Type: {result['craft_type']}")
@@ -80,6 +261,247 @@ def classify_image():
             "message": f"Image file not found: {str(e)}"
         }), 404
         
+    except (ImageTooLargeError, UploadTooLargeError, RequestEntityTooLarge) as e:
+        print(f"❌ Error: {e}")
+        print("="*70 + "\n")
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 413
+        
+    except (InvalidImageError, InvalidUploadError) as e:
+        print(f"❌ Error: Invalid image - {e}")
+        print("="*70 + "\n")
+        return jsonify({
+            "status": "error",
+            "message": f"Invalid image: {str(e)}"
+        }), 400
+        
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
+        print("="*70 + "\n")
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 500
+
+
+@ai_routes.route('/classify_images', methods=['POST'])
+def classify_images():
+    """
+    Classify a batch of craft images using Vision AI.
+    
+    Request Body:
+        {
+            "images": ["/path/to/first.jpg", "/path/to/second.jpg"]
+        }
+    
+    Response (results are in input order; failures are reported inline):
+        {
+            "status": "success",
+            "data": {
+                "results": [
+                    {"image": "/path/to/first.jpg", "status": "success", "data": {...}},
+                    {"image": "/path/to/second.jpg", "status": "error", "message": "..."}
+                ],
+                "succeeded": 1,
+                "failed": 1
+            }
+        }
+    """
+    print("\n" + "="*70)
+    print("🔍 VISION AI - Bulk Image Classification Request")
+    print("="*70)
+    
+    try:
+        # Get request data
+        data = request.get_json()
+        
+        if not data or not isinstance(data.get('images'), list):
+            print("❌ Error: Missing 'images' list in request")
+            return jsonify({
+                "status": "error",
+                "message": "Request body must contain an 'images' list"
+            }), 400
+        
+        image_paths = data['images']
+        
+        if len(image_paths) > MAX_BULK_IMAGES:
+            print(f"❌ Error: Too many images ({len(image_paths)} > {MAX_BULK_IMAGES})")
+            return jsonify({
+                "status": "error",
+                "message": f"At most {MAX_BULK_IMAGES} images are allowed per request"
+            }), 400
+        
+        print(f"📸 Images: {len(image_paths)}")
+        print("🔄 Processing images...")
+        
+        results = classify_craft_images([str(path) for path in image_paths])
+        succeeded = sum(1 for entry in results if entry['status'] == 'success')
+        
+        print(f"✅ Bulk classification finished!")
+        print(f"   Succeeded: {succeeded}")
+        print(f"   Failed: {len(results) - succeeded}")
+        print("="*70 + "\n")
+        
+        return jsonify({
+            "status": "success",
+            "data": {
+                "results": results,
+                "succeeded": succeeded,
+                "failed": len(results) - succeeded
+            }
+        }), 200
+        
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
+        print("="*70 + "\n")
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 500
+
+
+@ai_routes.route('/similar_crafts', methods=['POST'])
+def similar_crafts():
+    """
+    Find catalog images that look like the query image.
+    
+    Images are added to the index with "catalog_id" on /classify_image or
+    with the similarity_index.py build command.
+    
+    Request Body (any of):
+        Any image input accepted by /classify_image
+        JSON with the id of an indexed image:
+            {"id": "item-123", "k": 10}
+    
+    Response:
+        {
+            "status": "success",
+            "data": {
+                "results": [
+                    {"id": "item-456", "score": 0.91, "craft_type": "pottery", ...}
+                ],
+                "query_time_ms": 3.2
+            }
+        }
+    """
+    print("\n" + "="*70)
+    print("🧭 VISION AI - Similar Crafts Request")
+    print("="*70)
+    
+    try:
+        try:
+            k = int(_request_option('k') or 10)
+        except (TypeError, ValueError):
+            k = 0
+        if not 1 <= k <= MAX_SIMILAR_RESULTS:
+            print("❌ Error: Invalid k")
+            return jsonify({
+                "status": "error",
+                "message": f"'k' must be an integer between 1 and {MAX_SIMILAR_RESULTS}"
+            }), 400
+        
+        index = get_similarity_index()
+        query_id = _request_option('id')
+        
+        if query_id is not None:
+            print(f"🗂️  Query item: {query_id}")
+            embedding = index.get_vector(str(query_id))
+            if embedding is None:
+                print("❌ Error: Unknown catalog id")
+                return jsonify({
+                    "status": "error",
+                    "message": f"No indexed image with id '{query_id}'"
+                }), 404
+            # The query item itself is always its own nearest neighbour
+            k += 1
+        else:
+            image_source, image_label = _read_image_source()
+            if image_source is None:
+                print("❌ Error: Missing image in request")
+                return jsonify({
+                    "status": "error",
+                    "message": "Send an indexed 'id' or an image as for /classify_image"
+                }), 400
+            print(f"📸 Image: {image_label}")
+            _, embedding = embed_craft_image(image_source)
+        
+        start = time.perf_counter()
+        results = index.search(embedding, k)
+        query_time_ms = (time.perf_counter() - start) * 1000.0
+        
+        if query_id is not None:
+            results = [item for item in results if item['id'] != str(query_id)][:k - 1]
+        
+        print(f"✅ Found {len(results)} similar crafts in {query_time_ms:.1f} ms")
+        print("="*70 + "\n")
+        
+        return jsonify({
+            "status": "success",
+            "data": {
+                "results": results,
+                "index_size": len(index),
+                "query_time_ms": round(query_time_ms, 2)
+            }
+        }), 200
+        
+    except FileNotFoundError as e:
+        print(f"❌ Error: Image file not found - {e}")
+        print("="*70 + "\n")
+        return jsonify({
+            "status": "error",
+            "message": f"Image file not found: {str(e)}"
+        }), 404
+        
+    except (ImageTooLargeError, UploadTooLargeError, RequestEntityTooLarge) as e:
+        print(f"❌ Error: {e}")
+        print("="*70 + "\n")
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 413
+        
+    except (InvalidImageError, InvalidUploadError) as e:
+        print(f"❌ Error: Invalid image - {e}")
+        print("="*70 + "\n")
+        return jsonify({
+            "status": "error",
+            "message": f"Invalid image: {str(e)}"
+        }), 400
+        
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
+        print("="*70 + "\n")
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 500
+
+
+@ai_routes.route('/classifier/reload', methods=['POST'])
+def reload_image_classifier():
+    """
+    Reload the Vision AI classifier without restarting the server.
+    
+    The replacement model is loaded and warmed up before it is swapped in;
+    classification requests keep using the current model until then.
+    """
+    print("\n" + "="*70)
+    print("♻️  VISION AI - Classifier Reload Request")
+    print("="*70)
+    
+    try:
+        reload_classifier()
+        
+        print("✅ Classifier reloaded successfully!")
+        print("="*70 + "\n")
+        
+        return jsonify({
+            "status": "success",
+            "message": "Classifier reloaded"
+        }), 200
+        
     except Exception as e:
         print(f"❌ Error: {str(e)}")
         print("="*70 + "\n")
@@ -89,6 +511,36 @@ def classify_image():
         }), 500
 
 
+@ai_routes.route('/classifier/stats', methods=['GET'])
+def classifier_stats():
+    """
+    Runtime statistics for the Vision AI classifier.
+    """
+    scheduler = get_batch_scheduler()
+    cache = get_result_cache()
+    near_duplicates = get_near_duplicate_index()
+    
+    # The in-process classifier, or the inference server in model-server mode
+    classifier = loaded_inference_backend()
+    model_server = classifier.stats() if model_server_enabled() and classifier else None
+    
+    return jsonify({
+        "status": "success",
+        "data": {
+            "model_loaded": classifier is not None,
+            "model_version": classifier.model_version if classifier else None,
+            "cascade": classifier.cascade_stats() if classifier else None,
+            "startup": classifier.load_report if classifier else None,
+            "model_server": model_server,
+            # Inference stage queue/wait stats are under "batching"
+            "pipeline": get_pipeline().stats(),
+            "batching": scheduler.stats() if scheduler else None,
+            "result_cache": cache.stats() if cache else None,
+            "near_duplicates": near_duplicates.stats() if near_duplicates else None
+        }
+    }), 200
+
+
 @ai_routes.route('/generate_story', methods=['POST'])
 def create_story():
     """
@@ -98,7 +550,8 @@ def create_story():
         {
             "craft_name": "Pottery",
             "category": "pottery",
-            "region": "India"
+            "region": "India",
+            "bypass_cache": false   // optional: regenerate even if cached
         }
     
     Response:
@@ -111,7 +564,7 @@ def create_story():
                     "region": "...",
                     "category": "...",
                     "story": {...},
-                    "meta": {...}
+                    "meta": {...}   // "cached": true when served from cache
                 }
             }
         }
@@ -121,38 +574,14 @@ def create_story():
     print("="*70)
     
     try:
-        # Get request data
-        data = request.get_json()
-        
-        if not data:
-            print("❌ Error: No JSON data provided")
-            return jsonify({
-                "status": "error",
-                "message": "Request body must be JSON"
-            }), 400
-        
-        # Validate required fields
-        required_fields = ['craft_name', 'category', 'region']
-        missing_fields = [field for field in required_fields if field not in data]
+        inputs, error = _generation_request()
+        if error:
+            return error
         
-        if missing_fields:
-            print(f"❌ Error: Missing fields: {', '.join(missing_fields)}")
-            return jsonify({
-                "status": "error",
-                "message": f"Missing required fields: {', '.join(missing_fields)}"
-            }), 400
-        
-        craft_name = data['craft_name']
-        category = data['category']
-        region = data['region']
-        
-        print(f"📝 Craft: {craft_name}")
-        print(f"📦 Category: {category}")
-        print(f"🌍 Region: {region}")
         print("🔄 Generating story (this may take 10-30 seconds)...")
         
-        # Generate story
-        result = generate_story(craft_name, category, region)
+        # Generate story (cached results keep their original generated_at)
+        result = generate_story(**inputs)
         
         print(f"✅ Story generated successfully!")
         print(f"   Title: {result['json']['story']['title']}")
@@ -181,7 +610,8 @@ def create_lesson():
         {
             "craft_name": "Pottery",
             "category": "pottery",
-            "region": "India"
+            "region": "India",
+            "bypass_cache": false   // optional: regenerate even if cached
         }
     
     Response:
@@ -194,7 +624,7 @@ def create_lesson():
                 "steps": [...],
                 "quiz": [...],
                 "summary": "...",
-                "meta": {...}
+                "meta": {...}   // "cached": true when served from cache
             }
         }
     """
@@ -203,49 +633,240 @@ def create_lesson():
     print("="*70)
     
     try:
-        # Get request data
-        data = request.get_json()
+        inputs, error = _generation_request()
+        if error:
+            return error
+        
+        print("🔄 Generating lesson (this may take 10-30 seconds)...")
+        
+        # Generate lesson (cached results keep their original generated_at)
+        result = generate_lesson(**inputs)
+        
+        print(f"✅ Lesson generated successfully!")
+        print(f"   Title: {result['lesson_title']}")
+        print(f"   Steps: {len(result['steps'])}")
+        print(f"   Quiz Questions: {len(result['quiz'])}")
+        print("="*70 + "\n")
+        
+        return jsonify({
+            "status": "success",
+            "data": result
+        }), 200
+        
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
+        print("="*70 + "\n")
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 500
+
+
+@ai_routes.route('/generate_story/stream', methods=['POST'])
+def stream_story_route():
+    """
+    Stream story generation as Server-Sent Events.
+    
+    Request Body: same as /generate_story
+    
+    Events:
+        event: text    data: {"text": "...story text as it arrives..."}
+        event: story   data: {"text": "...", "json": {...}}  // same as /generate_story data
+        event: done    data: {}
+        event: error   data: {"message": "..."}
+    
+    The final "story" event is authoritative; clients should replace the
+    streamed text with its "text" field.
+    """
+    print("\n" + "="*70)
+    print("📖 VERTEX AI - Streaming Story Request")
+    print("="*70)
+    
+    inputs, error = _generation_request()
+    if error:
+        return error
+    
+    return _sse_response(stream_story(**inputs))
+
+
+@ai_routes.route('/generate_lesson/stream', methods=['POST'])
+def stream_lesson_route():
+    """
+    Stream lesson generation as Server-Sent Events.
+    
+    Request Body: same as /generate_lesson
+    
+    Events:
+        event: step    data: {"index": 0, "step": "Step 1: ..."}  // as soon as each step is parsed
+        event: lesson  data: {...}  // same as /generate_lesson data
+        event: done    data: {}
+        event: error   data: {"message": "..."}
+    """
+    print("\n" + "="*70)
+    print("🎓 VERTEX AI - Streaming Lesson Request")
+    print("="*70)
+    
+    inputs, error = _generation_request()
+    if error:
+        return error
+    
+    return _sse_response(stream_lesson(**inputs))
+
+
+@ai_routes.route('/generate_bundle', methods=['POST'])
+def create_bundle():
+    """
+    Generate the story and the lesson for a craft concurrently.
+    
+    Both Gemini calls run at the same time, so the request takes as long as
+    the slower of the two. If one fails, the other is still returned.
+    
+    Request Body:
+        {
+            "craft_name": "Pottery",
+            "category": "pottery",
+            "region": "India",
+            "bypass_cache": false,   // optional: regenerate even if cached
+            "stream": false          // optional: Server-Sent Events, see below
+        }
+    
+    Response ("partial" when one part failed; 500 only if both failed):
+        {
+            "status": "success",
+            "data": {
+                "story": {...},    // same as /generate_story data, or null
+                "lesson": {...},   // same as /generate_lesson data, or null
+                "errors": {},      // e.g. {"lesson": "..."}
+                "timings_ms": {"story": 11234.5, "lesson": 18012.3}
+            }
+        }
+    
+    Streaming events (in completion order):
+        event: story   data: {...}
+        event: lesson  data: {...}
+        event: error   data: {"part": "lesson", "message": "..."}
+        event: done    data: {}
+    """
+    print("\n" + "="*70)
+    print("📚 VERTEX AI - Story + Lesson Bundle Request")
+    print("="*70)
+    
+    inputs, error = _generation_request()
+    if error:
+        return error
+    
+    if _is_true(request.get_json().get('stream')):
+        return _sse_response(stream_bundle(**inputs))
+    
+    try:
+        print("🔄 Generating story and lesson in parallel...")
+        bundle = generate_bundle(**inputs)
         
-        if not data:
-            print("❌ Error: No JSON data provided")
+        if len(bundle["errors"]) == 2:
+            print(f"❌ Error: {bundle['errors']}")
+            print("="*70 + "\n")
             return jsonify({
                 "status": "error",
-                "message": "Request body must be JSON"
-            }), 400
+                "message": "Story and lesson generation both failed",
+                "errors": bundle["errors"]
+            }), 500
         
-        # Validate required fields
-        required_fields = ['craft_name', 'category', 'region']
-        missing_fields = [field for field in required_fields if field not in data]
+        for part, elapsed_ms in bundle["timings_ms"].items():
+            outcome = "failed" if part in bundle["errors"] else "done"
+            print(f"   {part.capitalize()}: {outcome} in {elapsed_ms} ms")
+        print("="*70 + "\n")
         
-        if missing_fields:
-            print(f"❌ Error: Missing fields: {', '.join(missing_fields)}")
+        return jsonify({
+            "status": "partial" if bundle["errors"] else "success",
+            "data": bundle
+        }), 200
+        
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
+        print("="*70 + "\n")
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 500
+
+
+@ai_routes.route('/craft_pipeline', methods=['POST'])
+def craft_pipeline():
+    """
+    Classify a craft photo, then generate its story and lesson, in one request.
+    
+    The story and lesson are started in parallel as soon as classification
+    finishes, using the detected craft_type and possible_region. Results are
+    streamed as Server-Sent Events as each stage completes.
+    
+    Request Body:
+        Any image input accepted by /classify_image, plus optionally
+        "bypass_cache": true to regenerate the story and lesson
+    
+    Events:
+        event: classification  data: {...}  // same as /classify_image data
+        event: story           data: {...}  // same as /generate_story data
+        event: lesson          data: {...}  // same as /generate_lesson data
+        event: error           data: {"part": "story", "message": "..."}
+        event: timings         data: {"classification": 850.2, "story": 11234.5,
+                                      "lesson": 18012.3, "total": 18862.5}
+        event: done            data: {}
+    
+    Story and lesson timings are measured from the end of classification.
+    An image that cannot be classified is rejected before the stream starts,
+    with the same status codes as /classify_image.
+    """
+    print("\n" + "="*70)
+    print("🧵 AI PIPELINE - Image → Story + Lesson Request")
+    print("="*70)
+    
+    try:
+        image_source, image_label = _read_image_source()
+        
+        if image_source is None:
+            print("❌ Error: Missing image in request")
             return jsonify({
                 "status": "error",
-                "message": f"Missing required fields: {', '.join(missing_fields)}"
+                "message": "Missing image: send an image as for /classify_image"
             }), 400
         
-        craft_name = data['craft_name']
-        category = data['category']
-        region = data['region']
+        print(f"📸 Image: {image_label}")
+        use_cache = not _is_true(_request_option('bypass_cache'))
         
-        print(f"📝 Craft: {craft_name}")
-        print(f"📦 Category: {category}")
-        print(f"🌍 Region: {region}")
-        print("🔄 Generating lesson (this may take 10-30 seconds)...")
+        print("🔄 Processing image...")
+        start = time.perf_counter()
+        classification = classify_craft_image(image_source)
+        classification_ms = (time.perf_counter() - start) * 1000.0
         
-        # Generate lesson
-        result = generate_lesson(craft_name, category, region)
+        print(f"✅ Classified as {classification['craft_type']} in {classification_ms:.1f} ms")
+        print(f"🔄 Generating story and lesson for {classification['possible_region']}...")
+        print("="*70 + "\n")
         
-        print(f"✅ Lesson generated successfully!")
-        print(f"   Title: {result['lesson_title']}")
-        print(f"   Steps: {len(result['steps'])}")
-        print(f"   Quiz Questions: {len(result['quiz'])}")
+        return _sse_response(_pipeline_events(classification, classification_ms, use_cache))
+        
+    except FileNotFoundError as e:
+        print(f"❌ Error: Image file not found - {e}")
         print("="*70 + "\n")
+        return jsonify({
+            "status": "error",
+            "message": f"Image file not found: {str(e)}"
+        }), 404
         
+    except (ImageTooLargeError, UploadTooLargeError, RequestEntityTooLarge) as e:
+        print(f"❌ Error: {e}")
+        print("="*70 + "\n")
         return jsonify({
-            "status": "success",
-            "data": result
-        }), 200
+            "status": "error",
+            "message": str(e)
+        }), 413
+        
+    except (InvalidImageError, InvalidUploadError) as e:
+        print(f"❌ Error: Invalid image - {e}")
+        print("="*70 + "\n")
+        return jsonify({
+            "status": "error",
+            "message": f"Invalid image: {str(e)}"
+        }), 400
         
     except Exception as e:
         print(f"❌ Error: {str(e)}")
@@ -256,6 +877,28 @@ def create_lesson():
         }), 500
 
 
+@ai_routes.route('/generation/stats', methods=['GET'])
+def generation_stats():
+    """
+    Cache statistics for story and lesson generation.
+    """
+    cache = get_generation_cache()
+    refresher = get_refresher()
+    
+    return jsonify({
+        "status": "success",
+        "data": {
+            "cache": cache.stats() if cache else None,
+            # Stale-while-revalidate background refreshes
+            "refresh": refresher.stats() if refresher else None,
+            # Identical concurrent generations that shared one Gemini call
+            "single_flight": single_flight_stats(),
+            # Gemini calls in flight/waiting under GEMINI_MAX_CONCURRENCY
+            "gemini": gemini_call_stats()
+        }
+    }), 200
+
+
 @ai_routes.route('/health', methods=['GET'])
 def health_check():
     """
@@ -265,7 +908,7 @@ def health_check():
         "status": "success",
         "message": "AI Services are running",
         "services": {
-            "vision_ai": "ready",
+            "vision_ai": "ready" if is_classifier_loaded() else "not_loaded",
             "story_generation": "ready",
             "lesson_generation": "ready"
         }
@@ -2,6 +2,11 @@
 Shared utilities for AI services.
 """
 
-from .utils import get_timestamp, add_metadata, create_hybrid_response
+from .utils import get_timestamp, add_metadata, create_hybrid_response, format_sse
+from .cache import TieredCache
+from .single_flight import SingleFlight, SharedCallCancelled
 
-__all__ = ['get_timestamp', 'add_metadata', 'create_hybrid_response']
+__all__ = [
+    'get_timestamp', 'add_metadata', 'create_hybrid_response', 'format_sse',
+    'TieredCache', 'SingleFlight', 'SharedCallCancelled'
+]
@@ -0,0 +1,170 @@
+"""
+Two-tier result cache shared by the AI services.
+
+An in-memory LRU tier bounded by entry count sits in front of an optional
+SQLite tier, so cached results survive restarts. Values must be JSON
+serializable. With `ttl_seconds`, entries older than the TTL (measured from
+when they were first written, in either tier) are treated as misses. Hit,
+miss, expiry and eviction counters are exposed via `stats()`.
+"""
+
+import copy
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class TieredCache:
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        db_path: Optional[str] = None,
+        namespace: str = "default",
+        max_disk_entries: Optional[int] = None,
+        ttl_seconds: Optional[float] = None
+    ):
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.namespace = namespace
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+
+        # key -> (created_at, value)
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "evictions": 0,
+            "disk_evictions": 0,
+            "writes": 0
+        }
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " namespace TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS cache_created_at ON cache (namespace, created_at)"
+            )
+            self._db.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self.get_with_age(key)
+        return entry[0] if entry is not None else None
+
+    def get_with_age(self, key: str) -> Optional[tuple]:
+        # Returns (value, seconds since it was written) or None
+        now = time.time()
+        expired = False
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[0], now):
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return copy.deepcopy(entry[1]), now - entry[0]
+                del self._memory[key]
+                expired = True
+
+        entry = self._disk_get(key)
+        if entry is not None and self._expired(entry[0], now):
+            entry = None
+            expired = True
+        if entry is None:
+            with self._lock:
+                self._counters["misses"] += 1
+                if expired:
+                    self._counters["expired"] += 1
+            return None
+
+        with self._lock:
+            self._counters["disk_hits"] += 1
+            self._memory_set(key, entry[1], entry[0])
+        return copy.deepcopy(entry[1]), now - entry[0]
+
+    def set(self, key: str, value: Any):
+        value = copy.deepcopy(value)
+        created_at = time.time()
+        with self._lock:
+            self._counters["writes"] += 1
+            self._memory_set(key, value, created_at)
+        self._disk_set(key, value, created_at)
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hits"] = stats["memory_hits"] + stats["disk_hits"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["max_entries"] = self.max_entries
+        stats["ttl_seconds"] = self.ttl_seconds
+        stats["disk_enabled"] = self._db is not None
+        return stats
+
+    def _memory_set(self, key: str, value: Any, created_at: float):
+        # Caller holds self._lock
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def _disk_get(self, key: str) -> Optional[tuple]:
+        # Returns (created_at, value)
+        if self._db is None:
+            return None
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT created_at, value FROM cache WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            ).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def _disk_set(self, key: str, value: Any, created_at: float):
+        if self._db is None:
+            return
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, created_at) VALUES (?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value), created_at)
+            )
+            if self.max_disk_entries is not None:
+                deleted = self._db.execute(
+                    "DELETE FROM cache WHERE namespace = ? AND key IN ("
+                    " SELECT key FROM cache WHERE namespace = ?"
+                    " ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (self.namespace, self.namespace, self.max_disk_entries)
+                ).rowcount
+                if deleted > 0:
+                    with self._lock:
+                        self._counters["disk_evictions"] += deleted
+            self._db.commit()
@@ -0,0 +1,190 @@
+"""
+Single-flight coalescing of identical concurrent calls.
+
+The first caller for a key (the leader) starts the call; callers that
+arrive with the same key while it is running (followers) wait for it and
+receive a copy of its result, or the same exception. Once the call
+finishes, the next caller starts a new one. Leader/follower counters are
+exposed via `stats()`.
+
+`do()`, `do_async()` and `do_stream()` share the same in-flight calls, so
+blocking, asyncio and streaming callers of the same key coalesce with each
+other. A streaming leader passes its progress through as it is produced;
+streaming followers only get the final result.
+
+`do_async()` runs the call as its own task, not inside the leader: a
+cancelled caller (leader or follower) only stops waiting. The task itself
+is cancelled once no caller is waiting for it any more, and the remaining
+callers never see another caller's cancellation. Followers of a blocking
+or streaming leader that was interrupted (e.g. its client went away) start
+the call again instead of failing.
+"""
+
+import asyncio
+import copy
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Generator, Optional
+
+
+class SharedCallCancelled(RuntimeError):
+    # Raised to callers still waiting on a call that was cancelled or
+    # interrupted, in place of the BaseException that stopped it
+    pass
+
+
+class _Call:
+
+    def __init__(self):
+        self.future = Future()
+        # Never cancellable through the future itself: callers detach instead
+        self.future.set_running_or_notify_cancel()
+        self.followers = 0
+        self.waiters = 1
+        self.task: Optional[asyncio.Task] = None
+
+
+class SingleFlight:
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+
+        self._counters = {
+            "leaders": 0,
+            "followers": 0,
+            "max_followers": 0,
+            "failures": 0,
+            "detached": 0,
+            "cancelled": 0
+        }
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        while True:
+            call, leader = self._join(key)
+            if leader:
+                break
+            try:
+                # Each follower gets its own copy to mutate
+                return copy.deepcopy(call.future.result())
+            except SharedCallCancelled:
+                # The leader was interrupted; start over
+                continue
+
+        try:
+            result = fn()
+        except Exception as e:
+            self._fail(key, call, e)
+            raise
+        except BaseException as e:
+            self._fail(key, call, SharedCallCancelled(f"Shared call for {key} was interrupted: {e!r}"))
+            raise
+        self._succeed(key, call, result)
+        return result
+
+    def do_stream(self, key: str, stream: Callable[[], Generator]) -> Generator:
+        # For `result, led = yield from do_stream(...)`: the leader re-yields
+        # what stream() yields and gets (its return value, True); followers
+        # yield nothing and get (the leader's result, False)
+        while True:
+            call, leader = self._join(key)
+            if leader:
+                break
+            try:
+                return copy.deepcopy(call.future.result()), False
+            except SharedCallCancelled:
+                continue
+
+        try:
+            result = yield from stream()
+        except Exception as e:
+            self._fail(key, call, e)
+            raise
+        except BaseException as e:
+            # Including GeneratorExit when the leader's consumer stops early
+            self._fail(key, call, SharedCallCancelled(f"Shared call for {key} was interrupted: {e!r}"))
+            raise
+        self._succeed(key, call, result)
+        return result, True
+
+    async def do_async(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        while True:
+            call, leader = self._join(key)
+            if leader:
+                call.task = asyncio.ensure_future(self._run(key, call, fn))
+
+            waiting = asyncio.wrap_future(call.future)
+            try:
+                # Shielded: cancelling this caller must not cancel the shared call
+                result = await asyncio.shield(waiting)
+            except asyncio.CancelledError:
+                # Nobody will read the outcome now; keep asyncio from logging it
+                waiting.add_done_callback(lambda future: future.cancelled() or future.exception())
+                self._detach(key, call)
+                raise
+            except SharedCallCancelled:
+                # A blocking or streaming leader was interrupted; start over
+                continue
+            return copy.deepcopy(result)
+
+    async def _run(self, key: str, call: _Call, fn: Callable[[], Awaitable[Any]]):
+        # The shared task; its outcome only ever reaches callers via call.future
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            self._fail(key, call, SharedCallCancelled(f"Shared call for {key} was cancelled"))
+            raise
+        except Exception as e:
+            self._fail(key, call, e)
+            return
+        self._succeed(key, call, result)
+
+    def _join(self, key: str) -> tuple:
+        # Returns (the call, True if this caller leads it)
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                self._counters["leaders"] += 1
+                return call, True
+            call.followers += 1
+            call.waiters += 1
+            self._counters["followers"] += 1
+            self._counters["max_followers"] = max(self._counters["max_followers"], call.followers)
+            return call, False
+
+    def _detach(self, key: str, call: _Call):
+        # A cancelled async caller; the last one out cancels the shared task
+        with self._lock:
+            call.waiters -= 1
+            self._counters["detached"] += 1
+            abandoned = call.waiters == 0 and call.task is not None and not call.task.done()
+            if abandoned:
+                self._counters["cancelled"] += 1
+                # Later callers start a fresh call instead of joining this one
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+        if abandoned:
+            call.task.cancel()
+
+    def _fail(self, key: str, call: _Call, error: Exception):
+        with self._lock:
+            self._counters["failures"] += 1
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.future.set_exception(error)
+
+    def _succeed(self, key: str, call: _Call, result: Any):
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.future.set_result(copy.deepcopy(result))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["in_flight"] = len(self._calls)
+        calls = stats["leaders"] + stats["followers"]
+        stats["coalesced_rate"] = round(stats["followers"] / calls, 4) if calls else 0.0
+        return stats
@@ -0,0 +1,107 @@
+"""
+In-memory handling of uploaded files.
+
+Uploads are read straight from the request stream into memory with a hard
+size limit, so oversized bodies are rejected while streaming instead of
+after being fully buffered, and nothing is ever written to disk.
+"""
+
+import base64
+import binascii
+import io
+import os
+from typing import BinaryIO, Optional
+
+from flask import Request
+
+# Largest accepted image upload (decoded bytes)
+MAX_UPLOAD_BYTES = int(os.getenv('MAX_UPLOAD_BYTES', str(20 * 1024 * 1024)))
+
+_READ_CHUNK_BYTES = 64 * 1024
+
+
+class UploadTooLargeError(ValueError):
+    pass
+
+
+class InvalidUploadError(ValueError):
+    pass
+
+
+class InMemoryRequest(Request):
+    """
+    Request class that keeps multipart file parts in memory.
+
+    Werkzeug's default spools file parts larger than 500 KB to a temporary
+    file; the total body size is already capped by MAX_CONTENT_LENGTH, so
+    keeping parts in memory avoids a disk write and re-read per upload.
+    """
+
+    def _get_file_stream(
+        self,
+        total_content_length: Optional[int],
+        content_type: Optional[str],
+        filename: Optional[str] = None,
+        content_length: Optional[int] = None
+    ) -> BinaryIO:
+        return io.BytesIO()
+
+
+def max_request_bytes(max_upload_bytes: int = MAX_UPLOAD_BYTES) -> int:
+    """
+    Request body limit that still admits a max-size image once base64 or
+    multipart encoded.
+    """
+    return (max_upload_bytes + 2) // 3 * 4 + 64 * 1024
+
+
+def read_limited(stream: BinaryIO, limit: int = MAX_UPLOAD_BYTES) -> bytes:
+    """
+    Read a stream into memory, failing as soon as it exceeds `limit` bytes.
+
+    Args:
+        stream: Binary stream (request body or uploaded file part)
+        limit: Maximum number of bytes to accept
+
+    Returns:
+        bytes: The complete stream contents
+    """
+    chunks = []
+    total = 0
+    while True:
+        chunk = stream.read(_READ_CHUNK_BYTES)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > limit:
+            raise UploadTooLargeError(f"Upload exceeds the {limit} byte limit")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def decode_base64_image(payload: str, limit: int = MAX_UPLOAD_BYTES) -> bytes:
+    """
+    Decode a base64 (or data URL) image payload with a size limit.
+
+    Args:
+        payload: Base64 text, optionally prefixed with "data:<mime>;base64,"
+        limit: Maximum number of decoded bytes to accept
+
+    Returns:
+        bytes: The decoded image bytes
+    """
+    if payload.startswith('data:'):
+        payload = payload.split(',', 1)[-1]
+
+    # Reject on the encoded length before allocating the decoded buffer
+    if len(payload) > (limit + 2) // 3 * 4 + 1024:
+        raise UploadTooLargeError(f"Upload exceeds the {limit} byte limit")
+
+    try:
+        image_bytes = base64.b64decode(payload)
+    except (binascii.Error, ValueError) as e:
+        raise InvalidUploadError(f"Invalid base64 image data: {e}")
+
+    if len(image_bytes) > limit:
+        raise UploadTooLargeError(f"Upload exceeds the {limit} byte limit")
+    return image_bytes
@@ -3,8 +3,9 @@ Utility functions for AI services.
 Provides helper functions for metadata generation and response formatting.
 """
 
+import json
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 
 def get_timestamp() -> str:
@@ -50,3 +51,18 @@ def create_hybrid_response(text: str, json_data: Dict[str, Any]) -> Dict[str, An
         "text": text,
         "json": json_data
     }
+
+
+def format_sse(data: Any, event: Optional[str] = None) -> str:
+    """
+    Format one Server-Sent Events message.
+    
+    Args:
+        data: JSON serializable payload, sent as a single data line
+        event: Optional event name
+        
+    Returns:
+        str: The message, terminated by a blank line
+    """
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data)}\n\n"
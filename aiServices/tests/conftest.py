@@ -0,0 +1,116 @@
+"""
+Shared fixtures for the offline tests.
+
+`gemini` replaces the Gemini model behind the story and lesson services with
+a scripted fake and gives each test its own generation cache and
+single-flight table, so no API key or network access is needed. `client` is
+a Flask test client for the /ai routes, configured like app.py but without
+the vision model warmup.
+"""
+
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Iterator, Optional
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+STORY_RESPONSE = (
+    'STORY: Potters in the region have shaped river clay for centuries.\n\n'
+    'JSON: {"title": "River Clay", "historical_origin": "Ancient", '
+    '"artisan_background": "Families", "cultural_significance": "Festivals", '
+    '"symbolism": "Earth", "traditional_usage": "Storage", "why_unique": "Clay"}'
+)
+
+LESSON_RESPONSE = json.dumps({
+    "lesson_title": "Throwing a Pot",
+    "introduction": "Learn the basics.",
+    "materials_required": ["Clay", "Wheel"],
+    "steps": ["Step 1: Wedge the clay", "Step 2: Centre it", "Step 3: Open the form"],
+    "quiz": [
+        {"question": f"Question {i}?", "options": ["A) a", "B) b", "C) c", "D) d"], "answer": "A"}
+        for i in range(3)
+    ],
+    "summary": "Practice daily."
+})
+
+
+class FakeGemini:
+    # Stands in for GeminiModel: returns `response` after `delay` seconds
+
+    def __init__(self, response: str, delay: float = 0.05):
+        self.response = response
+        self.delay = delay
+        self.error: Optional[Exception] = None
+        self.calls = 0
+        self.completed = 0
+        self.cancelled = 0
+
+    async def generate_content_async(self, prompt: str, timeout: Optional[float] = None) -> str:
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error:
+            raise self.error
+        self.completed += 1
+        return self.response
+
+    def generate_content(self, prompt: str, timeout: Optional[float] = None) -> str:
+        from vertex_ai.model_gemini import run_on_gemini_loop
+        return run_on_gemini_loop(self.generate_content_async(prompt, timeout))
+
+    def stream_content(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        self.calls += 1
+        size = max(1, len(self.response) // 8)
+        for start in range(0, len(self.response), size):
+            time.sleep(self.delay / 8)
+            if self.error and start > len(self.response) // 2:
+                raise self.error
+            yield self.response[start:start + size]
+        self.completed += 1
+
+
+@pytest.fixture
+def gemini(monkeypatch):
+    from shared.cache import TieredCache
+    from shared.single_flight import SingleFlight
+    from vertex_ai import generation_cache, lesson_service, story_service
+
+    models = {
+        "story": FakeGemini(STORY_RESPONSE),
+        "lesson": FakeGemini(LESSON_RESPONSE)
+    }
+    monkeypatch.setattr(story_service, "get_gemini_model", lambda: models["story"])
+    monkeypatch.setattr(lesson_service, "get_gemini_model", lambda: models["lesson"])
+    monkeypatch.setattr(generation_cache, "_cache", TieredCache(max_entries=64, namespace="test"))
+    monkeypatch.setattr(generation_cache, "_single_flight", SingleFlight())
+    monkeypatch.setattr(generation_cache, "_refresher", None)
+    return models
+
+
+@pytest.fixture
+def client():
+    from flask import Flask
+    from routes_ai import ai_routes
+    from shared.uploads import InMemoryRequest, max_request_bytes
+
+    app = Flask(__name__)
+    app.request_class = InMemoryRequest
+    app.config['MAX_CONTENT_LENGTH'] = max_request_bytes()
+    app.register_blueprint(ai_routes)
+    return app.test_client()
+
+
+def wait_for(condition, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached in time")
+        time.sleep(0.01)
@@ -80,8 +80,54 @@ def test_classify_image():
         print(f"\n❌ Error: {e}")
         return False
 
+def test_classify_images():
+    print_header("TEST 3: BULK IMAGE CLASSIFICATION (Vision AI)")
+    
+    image_path = str(Path(__file__).parent.parent / "images" / "Pottery.png")
+    missing_path = str(Path(__file__).parent.parent / "images" / "missing.png")
+    
+    payload = {
+        "images": [image_path, missing_path, image_path]
+    }
+    
+    print(f"\n📸 Test Images: {len(payload['images'])} (one missing on purpose)")
+    
+    try:
+        print("\n🔄 Sending request to /ai/classify_images...")
+        start_time = time.time()
+        
+        response = requests.post(
+            f"{API_BASE}/classify_images",
+            json=payload,
+            headers={"Content-Type": "application/json"}
+        )
+        
+        elapsed_time = time.time() - start_time
+        
+        print_response(response)
+        
+        if response.status_code != 200:
+            print("\n❌ Bulk classification failed!")
+            return False
+        
+        results = response.json()['data']['results']
+        statuses = [entry['status'] for entry in results]
+        
+        if statuses == ['success', 'error', 'success'] and results[1]['image'] == missing_path:
+            print(f"\n✅ Bulk classification successful!")
+            print(f"   ⏱️  Time: {elapsed_time:.2f}s")
+            print(f"   📦 Results returned in input order: {statuses}")
+            return True
+        else:
+            print(f"\n❌ Unexpected per-image statuses: {statuses}")
+            return False
+            
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        return False
+
 def test_generate_story():
-    print_header("TEST 3: STORY GENERATION (Vertex AI)")
+    print_header("TEST 4: STORY GENERATION (Vertex AI)")
     
     payload = {
         "craft_name": "Pottery",
@@ -131,7 +177,7 @@ def test_generate_story():
         return False
 
 def test_generate_lesson():
-    print_header("TEST 4: LESSON GENERATION (Vertex AI)")
+    print_header("TEST 5: LESSON GENERATION (Vertex AI)")
     
     payload = {
         "craft_name": "Pottery",
@@ -193,6 +239,7 @@ def run_all_tests():
     results = {
         "health_check": False,
         "classify_image": False,
+        "classify_images": False,
         "generate_story": False,
         "generate_lesson": False
     }
@@ -208,6 +255,8 @@ def run_all_tests():
     
     results["classify_image"] = test_classify_image()
     
+    results["classify_images"] = test_classify_images()
+    
     results["generate_story"] = test_generate_story()
     
     results["generate_lesson"] = test_generate_lesson()
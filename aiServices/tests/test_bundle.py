@@ -0,0 +1,74 @@
+import threading
+import time
+
+from conftest import wait_for
+from vertex_ai.bundle_service import generate_bundle, iter_bundle
+from vertex_ai.generation_cache import generation_cache_key, get_generation_cache
+from vertex_ai.lesson_service import generate_lesson
+
+CRAFT = ("Pottery", "pottery", "India")
+
+
+def test_parts_run_in_parallel(gemini):
+    gemini["story"].delay = 0.3
+    gemini["lesson"].delay = 0.3
+    
+    start = time.perf_counter()
+    bundle = generate_bundle(*CRAFT)
+    elapsed = time.perf_counter() - start
+    
+    assert bundle["errors"] == {}
+    assert bundle["story"]["json"]["story"]["title"] == "River Clay"
+    assert bundle["lesson"]["lesson_title"] == "Throwing a Pot"
+    assert elapsed < 0.55
+
+
+def test_one_failed_part_keeps_the_other(gemini):
+    gemini["story"].error = RuntimeError("quota exceeded")
+    
+    bundle = generate_bundle(*CRAFT)
+    
+    assert bundle["story"] is None
+    assert bundle["errors"] == {"story": "quota exceeded"}
+    assert bundle["lesson"]["lesson_title"] == "Throwing a Pot"
+
+
+def test_closing_before_second_part_cancels_unshared_work(gemini):
+    gemini["lesson"].delay = 0.5
+    
+    parts = iter_bundle(*CRAFT)
+    part, _, _ = next(parts)
+    parts.close()
+    
+    assert part == "story"
+    wait_for(lambda: gemini["lesson"].cancelled == 1)
+    assert gemini["lesson"].completed == 0
+
+
+def test_closing_before_second_part_keeps_shared_work(gemini):
+    gemini["story"].delay = 0.15
+    gemini["lesson"].delay = 0.5
+    outcome = {}
+    
+    def request_lesson():
+        # Joins the bundle's lesson generation while it is in flight
+        wait_for(lambda: gemini["lesson"].calls == 1)
+        try:
+            outcome["lesson"] = generate_lesson(*CRAFT)
+        except BaseException as e:
+            outcome["error"] = e
+    
+    waiting_request = threading.Thread(target=request_lesson)
+    waiting_request.start()
+    
+    parts = iter_bundle(*CRAFT)
+    part, _, _ = next(parts)
+    parts.close()
+    waiting_request.join(2)
+    
+    assert part == "story"
+    assert "error" not in outcome
+    assert outcome["lesson"]["lesson_title"] == "Throwing a Pot"
+    assert gemini["lesson"].calls == 1
+    assert gemini["lesson"].cancelled == 0
+    assert get_generation_cache().get(generation_cache_key("lesson", *CRAFT)) is not None
@@ -0,0 +1,111 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from conftest import wait_for
+from vertex_ai import model_gemini
+from vertex_ai.model_gemini import GeminiModel, gemini_call_stats, run_on_gemini_loop
+
+
+class FakeResponse:
+
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    # Records how many calls overlap; streams yield `chunks` one at a time
+
+    def __init__(self, delay=0.05, chunks=("a", "b", "c")):
+        self.delay = delay
+        self.chunks = chunks
+        self.active = 0
+        self.max_active = 0
+        self.cancelled = 0
+
+    async def generate_content_async(self, prompt, stream=False, request_options=None):
+        if stream:
+            return self._stream()
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.active -= 1
+        return FakeResponse(prompt.upper())
+
+    async def _stream(self):
+        for chunk in self.chunks:
+            try:
+                await asyncio.sleep(self.delay)
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                raise
+            yield FakeResponse(chunk)
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    # A GeminiModel around the fake, with a fresh concurrency limit of 2
+    monkeypatch.setattr(model_gemini, "GEMINI_MAX_CONCURRENCY", 2)
+    run_on_gemini_loop(_reset_semaphore())
+    model = object.__new__(GeminiModel)
+    model._model = FakeGenerativeModel()
+    yield model
+    run_on_gemini_loop(_reset_semaphore())
+
+
+async def _reset_semaphore():
+    # The semaphore may only be touched on the Gemini loop
+    model_gemini._semaphore = None
+
+
+def test_calls_beyond_the_limit_wait_for_a_slot(fake_model):
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        results = list(pool.map(fake_model.generate_content, ["a", "b", "c", "d", "e", "f"]))
+    
+    assert results == ["A", "B", "C", "D", "E", "F"]
+    assert fake_model._model.max_active == 2
+    assert gemini_call_stats()["in_flight"] == 0
+
+
+def test_timeout_raises_and_frees_the_slot(fake_model):
+    fake_model._model.delay = 5
+    timeouts = gemini_call_stats()["timeouts"]
+    
+    with pytest.raises(TimeoutError):
+        fake_model.generate_content("slow", timeout=0.05)
+    
+    assert gemini_call_stats()["timeouts"] == timeouts + 1
+    fake_model._model.delay = 0.01
+    assert [fake_model.generate_content("x") for _ in range(3)] == ["X"] * 3
+
+
+def test_cancelling_an_async_caller_cancels_the_call(fake_model):
+    fake_model._model.delay = 5
+    
+    async def cancel_after_start():
+        task = asyncio.ensure_future(fake_model.generate_content_async("slow"))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    
+    asyncio.run(cancel_after_start())
+    wait_for(lambda: fake_model._model.cancelled == 1)
+    assert gemini_call_stats()["in_flight"] == 0
+
+
+def test_stream_yields_chunks_and_closing_it_cancels_the_call(fake_model):
+    assert list(fake_model.stream_content("story")) == ["a", "b", "c"]
+    
+    fake_model._model.delay = 0.2
+    chunks = fake_model.stream_content("story")
+    assert next(chunks) == "a"
+    chunks.close()
+    wait_for(lambda: fake_model._model.cancelled == 1)
+    assert gemini_call_stats()["in_flight"] == 0
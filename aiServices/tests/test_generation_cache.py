@@ -0,0 +1,146 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from conftest import STORY_RESPONSE, wait_for
+from vertex_ai.generation_cache import (
+    GenerationRefresher,
+    generation_cache_key,
+    get_generation_cache,
+    get_refresher
+)
+from vertex_ai.lesson_service import generate_lesson_async
+from vertex_ai.model_gemini import run_on_gemini_loop
+from vertex_ai.story_service import generate_story
+
+CRAFT = ("Pottery", "pottery", "India")
+
+
+def test_results_are_cached_with_original_timestamp(gemini):
+    first = generate_story(*CRAFT)
+    second = generate_story("  pottery ", "POTTERY", "india")
+    
+    assert gemini["story"].calls == 1
+    assert second["json"]["meta"]["cached"] is True
+    assert second["json"]["meta"]["generated_at"] == first["json"]["meta"]["generated_at"]
+
+
+def test_fallback_story_is_returned_but_not_cached(gemini):
+    gemini["story"].response = "STORY: Once upon a time.\nJSON: {\"title\": "
+    
+    result = generate_story(*CRAFT)
+    
+    assert result["json"]["meta"]["fallback"] is True
+    assert result["json"]["story"]["title"] == "Traditional Craft Story"
+    assert get_generation_cache().get(generation_cache_key("story", *CRAFT)) is None
+    
+    gemini["story"].response = STORY_RESPONSE
+    retried = generate_story(*CRAFT)
+    assert gemini["story"].calls == 2
+    assert "fallback" not in retried["json"]["meta"]
+
+
+def test_fallback_lesson_from_async_path_is_not_cached(gemini):
+    gemini["lesson"].response = '{"lesson_title": "Missing everything else"}'
+    
+    result = run_on_gemini_loop(generate_lesson_async(*CRAFT))
+    
+    assert result["meta"]["fallback"] is True
+    assert get_generation_cache().get(generation_cache_key("lesson", *CRAFT)) is None
+
+
+def test_fallback_refresh_keeps_the_stale_entry(gemini, monkeypatch):
+    generate_story(*CRAFT)
+    monkeypatch.setenv("GEMINI_CACHE_SOFT_TTL_SECONDS", "0.01")
+    wait_for(lambda: get_generation_cache().get_with_age(generation_cache_key("story", *CRAFT))[1] > 0.01)
+    gemini["story"].response = "not a story"
+    
+    stale = generate_story(*CRAFT)
+    
+    assert stale["json"]["meta"]["stale"] is True
+    wait_for(lambda: get_refresher().stats()["failed"] == 1)
+    cached = get_generation_cache().get(generation_cache_key("story", *CRAFT))
+    assert cached["json"]["story"]["title"] == "River Clay"
+    assert "fallback" not in cached["json"]["meta"]
+
+
+def test_refresher_deduplicates_and_throttles():
+    release = threading.Event()
+    refresher = GenerationRefresher(rate_per_minute=0.001, burst=2)
+    
+    assert refresher.schedule("a", release.wait) is True
+    assert refresher.schedule("a", release.wait) is False
+    assert refresher.schedule("b", release.wait) is True
+    assert refresher.schedule("c", release.wait) is False
+    
+    stats = refresher.stats()
+    assert (stats["scheduled"], stats["deduplicated"], stats["throttled"]) == (2, 1, 1)
+    release.set()
+    wait_for(lambda: refresher.stats()["refreshed"] == 2)
+    assert refresher.stats()["in_progress"] == 0
+
+
+def test_refresher_drops_work_when_the_queue_is_full():
+    release = threading.Event()
+    refresher = GenerationRefresher(rate_per_minute=600, burst=10, max_queue=1)
+    
+    refresher.schedule("a", release.wait)
+    wait_for(lambda: refresher.stats()["queue_depth"] == 0)
+    refresher.schedule("b", release.wait)
+    
+    assert refresher.schedule("c", release.wait) is False
+    assert refresher.stats()["dropped"] == 1
+    release.set()
+
+
+def test_stale_entry_is_refreshed_once_for_concurrent_requests(gemini, monkeypatch):
+    generate_story(*CRAFT)
+    monkeypatch.setenv("GEMINI_CACHE_SOFT_TTL_SECONDS", "0.01")
+    wait_for(lambda: get_generation_cache().get_with_age(generation_cache_key("story", *CRAFT))[1] > 0.01)
+    gemini["story"].delay = 0.2
+    
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: generate_story(*CRAFT), range(8)))
+    
+    assert all(result["json"]["meta"]["stale"] for result in results)
+    wait_for(lambda: get_refresher().stats()["refreshed"] == 1)
+    assert gemini["story"].calls == 2
+    assert get_refresher().stats()["deduplicated"] == 7
+
+
+def test_concurrent_identical_streams_share_one_gemini_call(gemini):
+    from vertex_ai.story_service import stream_story
+    
+    gemini["story"].delay = 0.4
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        first = pool.submit(lambda: list(stream_story(*CRAFT)))
+        wait_for(lambda: gemini["story"].calls == 1)
+        second = pool.submit(lambda: list(stream_story(*CRAFT)))
+        streamed, joined = first.result(), second.result()
+    
+    assert gemini["story"].calls == 1
+    assert len([event for event, _ in streamed if event == "text"]) > 1
+    assert joined == [("text", {"text": streamed[-1][1]["text"]}), ("story", streamed[-1][1])]
+
+
+def test_streams_and_plain_requests_join_each_other(gemini):
+    from vertex_ai.lesson_service import generate_lesson, stream_lesson
+    
+    gemini["lesson"].delay = 0.4
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        plain = pool.submit(generate_lesson, *CRAFT)
+        wait_for(lambda: gemini["lesson"].calls == 1)
+        events = list(stream_lesson(*CRAFT))
+        lesson = plain.result()
+    
+    assert gemini["lesson"].calls == 1
+    assert events[-1] == ("lesson", lesson)
+    assert [data["step"] for event, data in events if event == "step"] == lesson["steps"]
+    
+    gemini["lesson"].calls = 0
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        streamed = pool.submit(lambda: list(stream_lesson(*CRAFT, use_cache=False)))
+        wait_for(lambda: gemini["lesson"].calls == 1)
+        joined = generate_lesson(*CRAFT, use_cache=False)
+    
+    assert gemini["lesson"].calls == 1
+    assert joined == streamed.result()[-1][1]
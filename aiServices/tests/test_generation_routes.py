@@ -0,0 +1,126 @@
+import json
+
+import pytest
+
+
+CRAFT = {"craft_name": "Pottery", "category": "pottery", "region": "India"}
+
+CLASSIFICATION = {"craft_type": "pottery", "possible_region": "India", "confidence": 0.9}
+
+
+def sse_events(response):
+    # [(event, data), ...] from a text/event-stream body
+    events = []
+    for message in response.get_data(as_text=True).strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in message.split("\n"))
+        events.append((fields.get("event"), json.loads(fields["data"])))
+    return events
+
+
+@pytest.mark.parametrize("path", [
+    "/ai/generate_story",
+    "/ai/generate_lesson",
+    "/ai/generate_story/stream",
+    "/ai/generate_lesson/stream",
+    "/ai/generate_bundle"
+])
+def test_generation_routes_reject_incomplete_requests(client, gemini, path):
+    assert client.post(path, data="not json", content_type="text/plain").status_code == 400
+    
+    response = client.post(path, json={"craft_name": "Pottery"})
+    assert response.status_code == 400
+    assert "category, region" in response.get_json()["message"]
+    assert gemini["story"].calls == gemini["lesson"].calls == 0
+
+
+def test_story_stream_sends_text_then_the_story(client, gemini):
+    response = client.post("/ai/generate_story/stream", json=CRAFT)
+    events = sse_events(response)
+    
+    assert response.mimetype == "text/event-stream"
+    assert [event for event, _ in events[-2:]] == ["story", "done"]
+    text = "".join(data["text"] for event, data in events if event == "text")
+    assert text.strip() == events[-2][1]["text"]
+    
+    cached = sse_events(client.post("/ai/generate_story/stream", json=CRAFT))
+    assert [event for event, _ in cached] == ["text", "story", "done"]
+    assert cached[1][1]["json"]["meta"]["cached"] is True
+    assert gemini["story"].calls == 1
+
+
+def test_lesson_stream_sends_each_step_then_the_lesson(client, gemini):
+    events = sse_events(client.post("/ai/generate_lesson/stream", json=CRAFT))
+    
+    steps = [data for event, data in events if event == "step"]
+    lesson = events[-2][1]
+    assert [step["step"] for step in steps] == lesson["steps"]
+    assert [event for event, _ in events[-2:]] == ["lesson", "done"]
+
+
+def test_stream_failing_part_way_ends_with_an_error_event(client, gemini):
+    gemini["lesson"].error = RuntimeError("connection reset")
+    
+    events = sse_events(client.post("/ai/generate_lesson/stream", json=CRAFT))
+    
+    assert events[-1] == ("error", {"message": "connection reset"})
+
+
+def test_bundle_returns_partial_results(client, gemini):
+    gemini["lesson"].error = RuntimeError("quota exceeded")
+    
+    body = client.post("/ai/generate_bundle", json=CRAFT).get_json()
+    
+    assert body["status"] == "partial"
+    assert body["data"]["story"]["json"]["story"]["title"] == "River Clay"
+    assert body["data"]["lesson"] is None
+    assert body["data"]["errors"] == {"lesson": "quota exceeded"}
+
+
+def test_bundle_stream_sends_both_parts(client, gemini):
+    gemini["story"].delay = 0.2
+    
+    events = sse_events(client.post("/ai/generate_bundle", json=dict(CRAFT, stream=True)))
+    
+    assert [event for event, _ in events] == ["lesson", "story", "done"]
+    assert gemini["story"].calls == gemini["lesson"].calls == 1
+
+
+def test_craft_pipeline_streams_classification_story_and_lesson(client, gemini, monkeypatch):
+    import routes_ai
+    
+    monkeypatch.setattr(routes_ai, "classify_craft_image", lambda source: dict(CLASSIFICATION))
+    
+    response = client.post("/ai/craft_pipeline", data=b"image bytes", content_type="image/jpeg")
+    events = sse_events(response)
+    
+    assert events[0] == ("classification", CLASSIFICATION)
+    assert sorted(event for event, _ in events[1:3]) == ["lesson", "story"]
+    event, timings = events[3]
+    assert event == "timings"
+    assert timings["total"] >= max(timings["story"], timings["lesson"])
+    assert events[-1] == ("done", {})
+
+
+def test_craft_pipeline_rejects_bad_images_before_streaming(client, gemini, monkeypatch):
+    import routes_ai
+    from vision_ai.image_io import InvalidImageError
+    
+    def classify(source):
+        raise InvalidImageError("cannot identify image file")
+    
+    monkeypatch.setattr(routes_ai, "classify_craft_image", classify)
+    
+    assert client.post("/ai/craft_pipeline", json={}).status_code == 400
+    response = client.post("/ai/craft_pipeline", data=b"garbage", content_type="image/jpeg")
+    assert response.status_code == 400
+    assert gemini["story"].calls == gemini["lesson"].calls == 0
+
+
+def test_generation_stats_report_every_component(client, gemini):
+    client.post("/ai/generate_story", json=CRAFT)
+    
+    data = client.get("/ai/generation/stats").get_json()["data"]
+    
+    assert data["cache"]["writes"] == 1
+    assert data["single_flight"]["leaders"] == 1
+    assert set(data["gemini"]) >= {"in_flight", "waiting", "max_concurrency"}
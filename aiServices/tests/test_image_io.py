@@ -0,0 +1,82 @@
+import base64
+import io
+
+import pytest
+from PIL import Image
+
+from shared.uploads import InvalidUploadError, decode_base64_image
+from vision_ai.image_io import InvalidImageError, decode_image
+
+
+def jpeg_bytes(size=(64, 48)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (120, 80, 40)).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+def test_decodes_a_valid_image():
+    assert decode_image(jpeg_bytes(), target_size=32).mode == 'RGB'
+
+
+@pytest.mark.parametrize("reduced", [True, False])
+def test_unknown_format_is_an_invalid_image(reduced):
+    with pytest.raises(InvalidImageError):
+        decode_image(b"not an image at all", reduced=reduced)
+
+
+@pytest.mark.parametrize("reduced", [True, False])
+def test_truncated_image_is_an_invalid_image(reduced):
+    with pytest.raises(InvalidImageError):
+        decode_image(jpeg_bytes()[:200], reduced=reduced)
+
+
+def test_missing_file_is_not_an_invalid_image(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        decode_image(str(tmp_path / "missing.jpg"))
+
+
+def test_bad_base64_is_an_invalid_upload():
+    with pytest.raises(InvalidUploadError):
+        decode_base64_image("data:image/jpeg;base64,abcde")
+
+
+def test_invalid_images_are_rejected_with_400(client, monkeypatch):
+    import routes_ai
+
+    monkeypatch.setattr(routes_ai, "classify_craft_image", lambda source: decode_image(source))
+
+    response = client.post("/ai/classify_image", data=b"garbage", content_type="image/jpeg")
+    assert response.status_code == 400
+
+    response = client.post("/ai/classify_image", json={"image_base64": "@@@"})
+    assert response.status_code == 400
+
+
+def test_other_value_errors_are_server_errors(client, monkeypatch):
+    import routes_ai
+
+    def classify(source):
+        raise ValueError("Unknown aggregation mode: broken")
+
+    monkeypatch.setattr(routes_ai, "classify_craft_image", classify)
+    body = base64.b64encode(jpeg_bytes()).decode()
+
+    response = client.post("/ai/classify_image", json={"image_base64": body})
+    assert response.status_code == 500
+
+
+@pytest.mark.parametrize("mode", ["P", "1", "I;16"])
+def test_large_images_in_modes_reduce_cannot_handle(mode):
+    image = Image.new(mode, (3000, 2500))
+    if mode == "P":
+        image.putpalette([0, 0, 0, 200, 40, 40] * 128)
+        image.paste(1, (0, 0, 1500, 2500))
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    
+    decoded = decode_image(buffer.getvalue(), target_size=256)
+    
+    assert decoded.mode == 'RGB'
+    assert min(decoded.size) >= 256 and decoded.size[0] < 3000
+    if mode == "P":
+        assert decoded.getpixel((10, 10)) == (200, 40, 40)
@@ -0,0 +1,132 @@
+import queue
+import threading
+
+import pytest
+import torch
+
+from conftest import wait_for
+from vision_ai import inference_server
+from vision_ai.inference_server import InferenceServer
+
+
+class FakeProcess:
+    # Plays a worker process: each start() takes the next outcome from the
+    # worker's script ("ready" or "fail") and answers batches while ready
+    
+    scripts = {}
+    
+    def __init__(self, target, args, name, daemon):
+        self.index, self.requests, self.responses = args[0], args[1], args[2]
+        self.pid = 1000 + self.index
+        self.exitcode = None
+        self._alive = False
+    
+    def start(self):
+        outcome = self.scripts[self.index].pop(0)
+        if outcome == "fail":
+            self.exitcode = 1
+            self.responses.put((self.index, None, 'failed', "RuntimeError: weights missing"))
+            return
+        self._alive = True
+        threading.Thread(target=self._serve, daemon=True).start()
+        self.responses.put((self.index, None, 'ready', ("model-v1", {"worker": self.index})))
+    
+    def _serve(self):
+        while True:
+            message = self.requests.get()
+            if message is None:
+                self._alive = False
+                return
+            request_id, op, slot, count, _ = message
+            payload = ("model-v2", {}) if op == 'reload' else [{"worker": self.index}] * count
+            self.responses.put((self.index, request_id, 'ok', payload))
+    
+    def kill(self):
+        self._alive = False
+        self.exitcode = -9
+        self.requests.put(None)
+    
+    def is_alive(self):
+        return self._alive
+    
+    def join(self, timeout=None):
+        pass
+    
+    def terminate(self):
+        self._alive = False
+
+
+class FakeContext:
+    Queue = queue.Queue
+    Process = FakeProcess
+
+
+@pytest.fixture
+def start_server(monkeypatch):
+    monkeypatch.setattr(inference_server.torch_mp, "get_context", lambda method: FakeContext())
+    servers = []
+    
+    def start(scripts, **options):
+        FakeProcess.scripts = scripts
+        server = InferenceServer(
+            num_workers=len(scripts), max_batch_size=1, buffers_per_worker=1,
+            restart_backoff=0.01, start_timeout=5.0, **options
+        )
+        servers.append(server)
+        return server
+    
+    yield start
+    for server in servers:
+        server.close()
+
+
+def batch():
+    return torch.zeros(1, 3, 224, 224)
+
+
+def worker_state(server, index):
+    return server.stats()["workers"][index]["state"]
+
+
+def test_failed_start_fails_the_constructor(start_server):
+    with pytest.raises(RuntimeError, match="weights missing"):
+        start_server({0: ["fail"]})
+
+
+def test_failed_restarts_back_off_then_give_up_while_others_serve(start_server):
+    server = start_server({0: ["ready", "fail", "fail", "fail"], 1: ["ready"]}, max_restarts=2)
+    
+    server._workers[0].process.kill()
+    wait_for(lambda: worker_state(server, 0) == 'failed', timeout=10)
+    
+    stats = server.stats()["workers"][0]
+    assert stats["consecutive_failures"] == 3
+    assert stats["restarts"] == 3
+    assert "weights missing" in stats["last_error"]
+    # The healthy worker keeps serving
+    assert server.classify_batch(batch()) == [{"worker": 1}]
+
+
+def test_all_workers_down_fails_fast_and_reload_recovers(start_server):
+    server = start_server({0: ["ready", "fail", "ready"]}, max_restarts=0)
+    
+    server._workers[0].process.kill()
+    wait_for(lambda: worker_state(server, 0) == 'failed', timeout=5)
+    with pytest.raises(RuntimeError, match="All inference workers are down"):
+        server.classify_batch(batch())
+    
+    server.reload()
+    
+    assert worker_state(server, 0) == 'ready'
+    assert server.classify_batch(batch()) == [{"worker": 0}]
+
+
+def test_backoff_restart_recovers_on_its_own(start_server):
+    server = start_server({0: ["ready", "fail", "ready"]}, max_restarts=3)
+    
+    server._workers[0].process.kill()
+    wait_for(lambda: worker_state(server, 0) == 'backoff', timeout=5)
+    wait_for(lambda: worker_state(server, 0) == 'ready', timeout=5)
+    
+    assert server.stats()["workers"][0]["consecutive_failures"] == 0
+    assert server.classify_batch(batch()) == [{"worker": 0}]
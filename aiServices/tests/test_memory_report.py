@@ -0,0 +1,44 @@
+import pytest
+import torch
+from torch.ao.quantization import quantize_dynamic
+
+from vision_ai.memory_report import activation_peak_bytes, model_memory_report, parameter_bytes
+
+
+def test_quantized_packed_weights_are_counted():
+    model = torch.nn.Sequential(torch.nn.Linear(256, 256))
+    quantized = quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    
+    assert list(quantized.parameters()) == []
+    # int8 weights: about a quarter of the fp32 layer, never zero
+    assert 256 * 256 <= parameter_bytes(quantized) < parameter_bytes(model)
+
+
+def test_activation_peaks_are_measured_once_per_config():
+    model = torch.nn.Sequential(torch.nn.Conv2d(3, 4, 3), torch.nn.ReLU()).eval()
+    calls = []
+    
+    def forward(batch):
+        calls.append(len(batch))
+        return model(batch)
+    
+    first = model_memory_report(model, forward, [1, 2], config=("test", "eager"))
+    second = model_memory_report(model, forward, [1, 2], config=("test", "eager"))
+    
+    assert calls == [1, 2]
+    assert first == second
+    assert first["activation_peak_mb"]["2"] > 0
+
+
+def test_unmeasurable_forward_reports_none_and_bugs_propagate(capsys):
+    def unsupported(batch):
+        raise RuntimeError("The following operation failed in the TorchScript interpreter.\nTraceback")
+    
+    assert activation_peak_bytes(unsupported, 1) is None
+    assert "TorchScript interpreter" in capsys.readouterr().out
+    
+    def broken(batch):
+        raise KeyError("tracker bug")
+    
+    with pytest.raises(KeyError):
+        activation_peak_bytes(broken, 1)
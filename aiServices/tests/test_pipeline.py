@@ -0,0 +1,122 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pytest
+import torch
+
+from vision_ai.batching import BatchScheduler
+from vision_ai.pipeline import ClassificationPipeline
+
+
+def resolved(value) -> Future:
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+def test_pipeline_answers_early_or_passes_images_on():
+    pipeline = ClassificationPipeline(
+        read=lambda source: ({"cached": source}, None) if source == "hit" else (None, source),
+        decode=lambda payload: (None, payload.upper()),
+        infer=lambda payload: resolved({"label": payload}),
+        io_workers=2,
+        decode_workers=2
+    )
+    
+    futures = [pipeline.submit(source) for source in ["hit", "a", "b"]]
+    
+    assert [future.result(timeout=2) for future in futures] == [
+        {"cached": "hit"}, {"label": "A"}, {"label": "B"}
+    ]
+    stats = pipeline.stats()
+    assert stats["io"]["processed"] == 3 and stats["decode"]["processed"] == 2
+
+
+def test_pipeline_stage_errors_fail_only_that_image():
+    def decode(payload):
+        if payload == "corrupt":
+            raise ValueError("cannot decode")
+        return None, payload
+    
+    pipeline = ClassificationPipeline(
+        read=lambda source: (None, source), decode=decode, infer=resolved, io_workers=1, decode_workers=1
+    )
+    
+    bad, good = pipeline.submit("corrupt"), pipeline.submit("ok")
+    
+    with pytest.raises(ValueError):
+        bad.result(timeout=2)
+    assert good.result(timeout=2) == "ok"
+
+
+def test_full_queue_blocks_the_caller():
+    release = threading.Event()
+    
+    def read(source):
+        release.wait()
+        return source, None
+    
+    pipeline = ClassificationPipeline(read=read, decode=None, infer=None, io_workers=1, max_queue=1)
+    pipeline.submit(1)
+    pipeline.submit(2)
+    
+    submitted = threading.Event()
+    threading.Thread(target=lambda: (pipeline.submit(3), submitted.set()), daemon=True).start()
+    assert not submitted.wait(0.1)
+    release.set()
+    assert submitted.wait(2)
+
+
+def test_concurrent_requests_share_batches():
+    batch_sizes = []
+    
+    def classify_batch(batch):
+        batch_sizes.append(len(batch))
+        return [float(row.sum()) for row in batch]
+    
+    scheduler = BatchScheduler(classify_batch, max_batch_size=4, max_wait_ms=50)
+    
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda i: scheduler.classify(torch.full((3,), float(i)), timeout=2), range(8)))
+    
+    assert results == [3.0 * i for i in range(8)]
+    assert max(batch_sizes) <= 4 and len(batch_sizes) < 8
+    assert scheduler.stats()["largest_batch"] == max(batch_sizes)
+
+
+def test_failed_batch_fails_each_caller():
+    def classify_batch(batch):
+        raise RuntimeError("out of memory")
+    
+    scheduler = BatchScheduler(classify_batch, max_batch_size=2, max_wait_ms=1)
+    
+    with pytest.raises(RuntimeError, match="out of memory"):
+        scheduler.classify(torch.zeros(3), timeout=2)
+
+
+def test_bulk_route_keeps_input_order_and_reports_failures(client, monkeypatch):
+    from vision_ai import image_classifier
+    
+    def classify(source, future):
+        if source == "missing.jpg":
+            future.set_exception(FileNotFoundError(source))
+        else:
+            future.set_result({"craft_type": source.split(".")[0]})
+    
+    class FakePipeline:
+        def submit(self, source):
+            future = Future()
+            threading.Timer(0.01, classify, (source, future)).start()
+            return future
+    
+    monkeypatch.setattr(image_classifier, "get_pipeline", FakePipeline)
+    
+    response = client.post("/ai/classify_images", json={"images": ["pottery.jpg", "missing.jpg", "weaving.jpg"]})
+    data = response.get_json()["data"]
+    
+    assert response.status_code == 200
+    assert [entry["image"] for entry in data["results"]] == ["pottery.jpg", "missing.jpg", "weaving.jpg"]
+    assert data["results"][1] == {
+        "image": "missing.jpg", "status": "error", "message": "Image file not found: missing.jpg"
+    }
+    assert (data["succeeded"], data["failed"]) == (2, 1)
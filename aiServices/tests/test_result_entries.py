@@ -0,0 +1,12 @@
+from vision_ai.result_entries import error_entry, success_entry
+
+
+def test_success_entry_wraps_the_result():
+    assert success_entry("a.jpg", {"craft_type": "pottery"}) == {
+        "image": "a.jpg", "status": "success", "data": {"craft_type": "pottery"}
+    }
+
+
+def test_error_entries_keep_the_message():
+    assert error_entry("a.jpg", ValueError("bad"))["message"] == "bad"
+    assert error_entry("b.jpg", FileNotFoundError("b.jpg"))["message"] == "Image file not found: b.jpg"
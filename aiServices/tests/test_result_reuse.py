@@ -0,0 +1,85 @@
+import io
+from pathlib import Path
+
+import pytest
+from PIL import Image, ImageOps
+
+from shared.cache import TieredCache
+from vision_ai import image_classifier
+from vision_ai import near_duplicates as near_duplicates_module
+from vision_ai.near_duplicates import NearDuplicateIndex
+
+IMAGE = Path(__file__).parent.parent / "images" / "Pottery.png"
+
+
+class FakeClassifier:
+    model_version = "test-model"
+    
+    def load_image(self, image_bytes):
+        return Image.open(io.BytesIO(image_bytes)).convert('RGB')
+    
+    def preprocess(self, image):
+        pytest.fail("a near-duplicate must not be preprocessed")
+
+
+@pytest.fixture
+def stores(monkeypatch):
+    cache = TieredCache(max_entries=16, namespace="test")
+    near_duplicates = NearDuplicateIndex(max_distance=10)
+    monkeypatch.setattr(image_classifier, "get_result_cache", lambda: cache)
+    monkeypatch.setattr(image_classifier, "get_near_duplicate_index", lambda: near_duplicates)
+    return cache, near_duplicates
+
+
+def test_near_duplicate_meta_is_not_stored_for_the_new_image(stores):
+    cache, near_duplicates = stores
+    classifier = FakeClassifier()
+    original = classifier.load_image(IMAGE.read_bytes())
+    image_classifier._store_result(
+        ("original", near_duplicates.hash_image(original), classifier.model_version),
+        {"craft_type": "pottery", "meta": {"model_version": classifier.model_version}}
+    )
+    
+    recompressed = io.BytesIO()
+    original.save(recompressed, format="JPEG", quality=70)
+    reused, payload = image_classifier._decode_step((classifier, recompressed.getvalue(), "recompressed"))
+    
+    assert payload is None
+    assert reused["craft_type"] == "pottery"
+    assert reused["meta"]["cached"] is True
+    assert reused["meta"]["near_duplicate"] is True
+    assert "near_duplicate_distance" in reused["meta"]
+    
+    stored = cache.get("recompressed")
+    assert stored["craft_type"] == "pottery"
+    assert "near_duplicate_distance" not in stored["meta"]
+    assert "near_duplicate" not in stored["meta"]
+    assert "cached" not in stored["meta"]
+
+
+def test_near_duplicate_reuse_is_off_by_default(monkeypatch):
+    monkeypatch.delenv("VISION_NEAR_DUP", raising=False)
+    
+    assert near_duplicates_module.get_near_duplicate_index() is None
+
+
+def test_different_images_are_not_merged():
+    # The two halves of one photo, and its mirror image: same colours,
+    # lighting and background, different content
+    photo = Image.open(IMAGE).convert('RGB')
+    width, height = photo.size
+    images = {
+        "left": photo.crop((0, 0, width // 2, height)).resize(photo.size),
+        "right": photo.crop((width // 2, 0, width, height)).resize(photo.size),
+        "mirrored": ImageOps.mirror(photo)
+    }
+    near_duplicates = NearDuplicateIndex()
+    near_duplicates.add(near_duplicates.hash_image(photo), {"craft_type": "pottery", "meta": {}}, "v1")
+    
+    for name, image in images.items():
+        image_hash = near_duplicates.hash_image(image)
+        assert near_duplicates.lookup(image_hash, "v1") is None, name
+        near_duplicates.add(image_hash, {"craft_type": name, "meta": {}}, "v1")
+    
+    assert near_duplicates.stats()["reused"] == 0
+    assert near_duplicates.lookup(near_duplicates.hash_image(photo.resize((354, 185))), "v1") is not None
@@ -0,0 +1,122 @@
+import numpy as np
+import pytest
+
+from vision_ai.similarity_index import IVFIndex, VectorIndex, _load_pending, _rotate_pending, load_index
+
+DIM = 8
+
+
+def unit(seed):
+    vector = np.random.default_rng(seed).standard_normal(DIM).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def build_pending(directory, count):
+    index = VectorIndex(dim=DIM, directory=str(directory))
+    for i in range(count):
+        index.add(f"item-{i}", unit(i), {"craft_type": "pottery"})
+    return index
+
+
+def load(directory):
+    # load_index on a never-compacted directory assumes the default
+    # dimension; replay into a small index the same way
+    index = VectorIndex(dim=DIM, directory=str(directory))
+    _load_pending(index, directory)
+    return index
+
+
+def test_pending_additions_survive_a_reload(tmp_path):
+    build_pending(tmp_path, 3)
+    
+    index = load(tmp_path)
+    
+    assert len(index) == 3
+    assert index.search(unit(1), 1)[0]["id"] == "item-1"
+
+
+def test_partially_written_last_vector_is_dropped(tmp_path):
+    build_pending(tmp_path, 3)
+    with open(tmp_path / "pending.f32", 'ab') as f:
+        f.write(unit(3).tobytes()[:DIM * 4 // 2])  # crash mid-append
+    
+    index = load(tmp_path)
+    
+    assert len(index) == 3
+    assert (tmp_path / "pending.f32").stat().st_size == 3 * DIM * 4
+    # Appends after the recovery stay aligned
+    index.add("item-3", unit(3), {"craft_type": "pottery"})
+    assert len(load(tmp_path)) == 4
+
+
+def test_vector_without_its_item_and_torn_line_are_dropped(tmp_path):
+    build_pending(tmp_path, 2)
+    with open(tmp_path / "pending.f32", 'ab') as f:
+        f.write(unit(2).tobytes())
+    with open(tmp_path / "pending.jsonl", 'a', encoding='utf-8') as f:
+        f.write('{"id": "item-2", "craft_')
+    
+    index = load(tmp_path)
+    
+    assert len(index) == 2
+    assert (tmp_path / "pending.jsonl").read_text().count("\n") == 2
+    assert (tmp_path / "pending.f32").stat().st_size == 2 * DIM * 4
+
+
+def test_compacted_index_replays_truncated_pending_file(tmp_path):
+    index = build_pending(tmp_path, 4)
+    index.compact('flat')
+    index.add("item-4", unit(4), {"craft_type": "textile"})
+    with open(tmp_path / "pending.f32", 'ab') as f:
+        f.write(b"\0" * 5)
+    
+    reloaded = load_index(str(tmp_path))
+    
+    assert len(reloaded) == 5
+    assert reloaded.search(unit(4), 1)[0]["id"] == "item-4"
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf"])
+def test_compacting_an_empty_index(tmp_path, index_type):
+    assert len(VectorIndex(dim=DIM).compact(index_type)) == 0
+    
+    compacted = VectorIndex(dim=DIM, directory=str(tmp_path)).compact(index_type)
+    
+    assert len(compacted) == 0 and compacted.index_type == index_type
+    assert compacted.search(unit(0), 3) == []
+    compacted.add("item-0", unit(0))
+    assert load_index(str(tmp_path)).search(unit(0), 1)[0]["id"] == "item-0"
+
+
+def test_additions_during_a_compaction_are_kept(tmp_path, monkeypatch):
+    build_pending(tmp_path, 3)
+    server = load_index(str(tmp_path), DIM)
+    build = IVFIndex._from_live_rows.__func__
+    
+    def build_while_the_server_appends(cls, *args, **kwargs):
+        server.add("item-new", unit(99), {"craft_type": "textile"})
+        return build(cls, *args, **kwargs)
+    
+    monkeypatch.setattr(IVFIndex, "_from_live_rows", classmethod(build_while_the_server_appends))
+    compacted = load_index(str(tmp_path), DIM).compact('ivf', nlist=2)
+    
+    assert len(compacted) == 4
+    assert compacted.search(unit(99), 1)[0]["id"] == "item-new"
+    assert not list(tmp_path.glob("*.compacting"))
+    assert (tmp_path / "pending.jsonl").read_text().count("\n") == 1
+
+
+def test_interrupted_compaction_is_replayed_and_finished(tmp_path):
+    build_pending(tmp_path, 3)
+    _rotate_pending(tmp_path)  # compaction crashed right after rotating
+    VectorIndex(dim=DIM, directory=str(tmp_path)).add("item-3", unit(3))
+    
+    assert len(load_index(str(tmp_path), DIM)) == 4
+    
+    compacted = load_index(str(tmp_path), DIM).compact('flat')
+    assert len(compacted) == 4
+    assert not list(tmp_path.glob("pending*.compacting"))
+    assert (tmp_path / "pending.jsonl").read_text().count("\n") == 1
+    
+    compacted.compact('flat')
+    assert len(np.load(tmp_path / "vectors.npy")) == 4
@@ -0,0 +1,216 @@
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from shared.single_flight import SingleFlight
+
+
+class SlowCall:
+    # An async call that records how often it ran and whether it was cancelled
+    
+    def __init__(self, delay=0.2, result=None, error=None):
+        self.delay = delay
+        self.result = result if result is not None else {"value": 1}
+        self.error = error
+        self.calls = 0
+        self.cancelled = False
+    
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error:
+            raise self.error
+        return self.result
+
+
+def drain(generator):
+    # (everything the generator yielded, its return value)
+    events = []
+    while True:
+        try:
+            events.append(next(generator))
+        except StopIteration as stop:
+            return events, stop.value
+
+
+def test_followers_share_one_call_and_get_copies():
+    flight = SingleFlight()
+    call = SlowCall(delay=0.05)
+    
+    async def main():
+        return await asyncio.gather(*(flight.do_async("k", call) for _ in range(5)))
+    
+    results = asyncio.run(main())
+    assert call.calls == 1
+    assert all(result == {"value": 1} for result in results)
+    results[0]["value"] = 2
+    assert results[1]["value"] == 1
+    assert flight.stats()["followers"] == 4
+
+
+def test_cancelled_leader_does_not_cancel_waiting_follower():
+    flight = SingleFlight()
+    call = SlowCall(delay=0.2)
+    
+    async def main():
+        leader = asyncio.ensure_future(flight.do_async("k", call))
+        await asyncio.sleep(0.02)
+        follower = asyncio.ensure_future(flight.do_async("k", call))
+        await asyncio.sleep(0.02)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+    
+    assert asyncio.run(main()) == {"value": 1}
+    assert call.calls == 1
+    assert not call.cancelled
+    assert flight.stats()["cancelled"] == 0
+
+
+def test_cancelled_leader_does_not_fail_blocking_follower():
+    flight = SingleFlight()
+    call = SlowCall(delay=0.3)
+    outcome = {}
+    
+    async def main():
+        leader = asyncio.ensure_future(flight.do_async("k", call))
+        await asyncio.sleep(0.02)
+        
+        def follow():
+            try:
+                outcome["result"] = flight.do("k", lambda: pytest.fail("follower must not run the call"))
+            except BaseException as e:
+                outcome["error"] = e
+        
+        thread = threading.Thread(target=follow)
+        thread.start()
+        while flight.stats()["followers"] == 0:
+            await asyncio.sleep(0.01)
+        leader.cancel()
+        await asyncio.sleep(0.4)
+        thread.join(1)
+    
+    asyncio.run(main())
+    assert outcome == {"result": {"value": 1}}
+
+
+def test_call_is_cancelled_when_every_waiter_is_cancelled():
+    flight = SingleFlight()
+    call = SlowCall(delay=0.2)
+    
+    async def main():
+        waiters = [asyncio.ensure_future(flight.do_async("k", call)) for _ in range(2)]
+        await asyncio.sleep(0.02)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0.01)
+        assert call.cancelled
+        # The abandoned call is not joined: the next caller starts a new one
+        return await flight.do_async("k", call)
+    
+    assert asyncio.run(main()) == {"value": 1}
+    assert call.calls == 2
+    assert flight.stats()["cancelled"] == 1
+
+
+def test_errors_reach_every_caller_as_exceptions():
+    flight = SingleFlight()
+    call = SlowCall(delay=0.05, error=ValueError("bad response"))
+    
+    async def main():
+        return await asyncio.gather(
+            *(flight.do_async("k", call) for _ in range(3)), return_exceptions=True
+        )
+    
+    errors = asyncio.run(main())
+    assert all(isinstance(error, ValueError) for error in errors)
+    assert call.calls == 1
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_followers_of_an_interrupted_blocking_leader_start_over():
+    flight = SingleFlight()
+    started = threading.Event()
+    outcome = {}
+    
+    def interrupted():
+        started.set()
+        time.sleep(0.1)
+        raise KeyboardInterrupt()
+    
+    def follow():
+        started.wait()
+        outcome["result"] = flight.do("k", lambda: {"value": 2})
+    
+    thread = threading.Thread(target=follow)
+    thread.start()
+    with pytest.raises(KeyboardInterrupt):
+        flight.do("k", interrupted)
+    thread.join(1)
+    assert outcome["result"] == {"value": 2}
+    assert flight.stats()["leaders"] == 2
+
+
+def test_stream_leader_yields_progress_and_followers_get_the_result():
+    flight = SingleFlight()
+    release = threading.Event()
+    outcome = {}
+    
+    def stream():
+        yield "first"
+        release.wait(1)
+        yield "second"
+        return {"value": 3}
+    
+    def follow():
+        outcome["events"], outcome["result"] = drain(flight.do_stream("k", stream))
+    
+    leader = flight.do_stream("k", stream)
+    assert next(leader) == "first"
+    thread = threading.Thread(target=follow)
+    thread.start()
+    time.sleep(0.05)
+    release.set()
+    assert next(leader) == "second"
+    with pytest.raises(StopIteration) as done:
+        next(leader)
+    thread.join(1)
+    
+    assert done.value.value == ({"value": 3}, True)
+    assert outcome == {"events": [], "result": ({"value": 3}, False)}
+    assert flight.stats()["followers"] == 1
+
+
+def test_closed_stream_leader_hands_the_call_to_a_follower():
+    flight = SingleFlight()
+    outcome = {}
+    
+    def stream():
+        yield "progress"
+        return {"value": 5}
+    
+    leader = flight.do_stream("k", stream)
+    next(leader)
+    
+    def follow():
+        outcome["result"] = flight.do("k", lambda: {"value": 6})
+    
+    thread = threading.Thread(target=follow)
+    thread.start()
+    time.sleep(0.05)
+    leader.close()
+    thread.join(1)
+    
+    assert outcome["result"] == {"value": 6}
@@ -0,0 +1,123 @@
+import json
+
+from conftest import LESSON_RESPONSE, STORY_RESPONSE
+from vertex_ai.lesson_service import LessonStepStream, build_lesson_result
+from vertex_ai.story_service import StoryTextStream, build_story_result
+
+STORY_TEXT = "Potters in the region have shaped river clay for centuries."
+STEPS = json.loads(LESSON_RESPONSE)["steps"]
+
+
+def stream_story(chunks):
+    parser = StoryTextStream()
+    return "".join(parser.feed(chunk) for chunk in chunks) + parser.finish()
+
+
+def stream_steps(chunks):
+    parser = LessonStepStream()
+    steps = []
+    for chunk in chunks:
+        steps.extend(parser.feed(chunk))
+    return steps
+
+
+def test_story_text_at_every_chunk_boundary():
+    for split in range(len(STORY_RESPONSE) + 1):
+        chunks = [STORY_RESPONSE[:split], STORY_RESPONSE[split:]]
+        assert stream_story(chunks).strip() == STORY_TEXT, split
+
+
+def test_story_text_one_character_at_a_time():
+    assert stream_story(list(STORY_RESPONSE)).strip() == STORY_TEXT
+
+
+def test_story_label_and_json_marker_split_across_chunks():
+    chunks = ["  ST", "ORY", ":\n\n", "Clay pots", " were fired. J", "SO", "N: {\"title\": \"T\"}"]
+
+    assert stream_story(chunks).strip() == "Clay pots were fired."
+
+
+def test_story_without_label_or_marker_streams_everything():
+    assert stream_story(["Just a plain ", "answer."]) == "Just a plain answer."
+    assert stream_story(["STO"]) == "STO"
+
+
+def test_story_held_back_tail_is_released_at_the_end():
+    parser = StoryTextStream()
+
+    assert parser.feed("STORY: Ends with JS") == "Ends wit"
+    assert parser.finish() == "h JS"
+
+
+def test_lesson_steps_at_every_chunk_boundary():
+    for split in range(len(LESSON_RESPONSE) + 1):
+        chunks = [LESSON_RESPONSE[:split], LESSON_RESPONSE[split:]]
+        assert stream_steps(chunks) == list(enumerate(STEPS)), split
+
+
+def test_lesson_steps_one_character_at_a_time():
+    assert stream_steps(list(LESSON_RESPONSE)) == list(enumerate(STEPS))
+
+
+def test_lesson_steps_with_escapes_and_brackets_inside_strings():
+    steps = ['Mix "slip" [clay, water]', "Fire at 900°C, then cool"]
+    response = '```json\n{"lesson_title": "x", "steps": ' + json.dumps(steps) + ', "quiz": []}\n```'
+
+    assert stream_steps(list(response)) == list(enumerate(steps))
+
+
+def test_lesson_step_objects_split_inside_a_field():
+    response = '{"steps" : [ {"title": "Wedge", "detail": "Push, fold"} , {"title": "Centre"} ]}'
+
+    assert stream_steps([response[:30], response[30:45], response[45:]]) == [
+        (0, {"title": "Wedge", "detail": "Push, fold"}),
+        (1, {"title": "Centre"})
+    ]
+
+
+def test_malformed_lesson_stream_yields_no_steps_and_falls_back():
+    response = 'Sorry, here is a lesson: {"steps": ["Step 1: Wedge", oops'
+
+    assert stream_steps(list(response)) == [(0, "Step 1: Wedge")]
+    result = build_lesson_result("Pottery", "pottery", "India", response)
+    assert result["meta"]["fallback"] is True
+    assert result["lesson_title"] == "Introduction to Traditional Craft"
+
+
+def test_malformed_story_falls_back():
+    response = 'STORY: A short tale.\nJSON: {"title": "Unfinished'
+
+    assert stream_story([response]).strip() == "A short tale."
+    result = build_story_result("Pottery", "pottery", "India", response)
+    assert result["text"] == "A short tale."
+    assert result["json"]["meta"]["fallback"] is True
+    assert result["json"]["story"]["title"] == "Traditional Craft Story"
+
+
+def test_well_formed_responses_are_not_fallbacks():
+    assert "fallback" not in build_story_result("Pottery", "pottery", "India", STORY_RESPONSE)["json"]["meta"]
+    assert "fallback" not in build_lesson_result("Pottery", "pottery", "India", LESSON_RESPONSE)["meta"]
+
+
+def test_malformed_streamed_story_falls_back_and_keeps_its_text(gemini):
+    from vertex_ai import generation_cache
+    from vertex_ai.story_service import stream_story as stream_story_events
+
+    gemini["story"].response = "STORY: A tale without its JSON part, just prose."
+
+    events = list(stream_story_events("Pottery", "pottery", "India"))
+    text = "".join(data["text"] for kind, data in events if kind == "text")
+    kind, result = events[-1]
+
+    assert text == "A tale without its JSON part, just prose."
+    assert kind == "story" and result["json"]["meta"]["fallback"] is True
+    assert generation_cache._cache.stats()["memory_entries"] == 0
+
+
+def test_public_parsers_keep_their_return_shapes():
+    from vertex_ai.lesson_service import parse_lesson_response
+    from vertex_ai.story_service import parse_story_response
+    
+    story_text, story_data = parse_story_response(STORY_RESPONSE)
+    assert story_text == STORY_TEXT and story_data["title"] == "River Clay"
+    assert parse_lesson_response(LESSON_RESPONSE)["steps"] == STEPS
@@ -0,0 +1,48 @@
+import time
+
+from shared.cache import TieredCache
+
+
+def test_lru_evicts_the_least_recently_used_entry():
+    cache = TieredCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_the_ttl():
+    cache = TieredCache(ttl_seconds=0.05)
+    cache.set("a", {"value": 1})
+    
+    assert cache.get("a") == {"value": 1}
+    time.sleep(0.08)
+    assert cache.get("a") is None
+    assert cache.stats()["expired"] == 1
+
+
+def test_disk_tier_keeps_the_original_write_time(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite")
+    TieredCache(db_path=db_path, ttl_seconds=0.1).set("a", [1, 2])
+    
+    reopened = TieredCache(db_path=db_path, ttl_seconds=0.1)
+    value, age = reopened.get_with_age("a")
+    assert value == [1, 2] and age >= 0
+    assert reopened.stats()["disk_hits"] == 1
+    
+    time.sleep(0.12)
+    assert TieredCache(db_path=db_path, ttl_seconds=0.1).get("a") is None
+
+
+def test_values_are_copied_in_and_out():
+    cache = TieredCache()
+    value = {"meta": {}}
+    cache.set("a", value)
+    value["meta"]["cached"] = True
+    cache.get("a")["meta"]["stale"] = True
+    
+    assert cache.get("a") == {"meta": {}}
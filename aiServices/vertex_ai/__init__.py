@@ -1,6 +1,12 @@
 from .model_gemini import get_gemini_model, GeminiModel
-from .story_service import generate_story
-from .lesson_service import generate_lesson
+from .story_service import generate_story, generate_story_async
+from .lesson_service import generate_lesson, generate_lesson_async
+from .bundle_service import generate_bundle, stream_bundle
 
-__all__ = ['get_gemini_model', 'GeminiModel', 'generate_story', 'generate_lesson']
+__all__ = [
+    'get_gemini_model', 'GeminiModel',
+    'generate_story', 'generate_story_async',
+    'generate_lesson', 'generate_lesson_async',
+    'generate_bundle', 'stream_bundle'
+]
 
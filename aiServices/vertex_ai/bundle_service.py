@@ -0,0 +1,84 @@
+import asyncio
+import time
+from concurrent.futures import as_completed
+from typing import Any, Dict, Iterator
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from vertex_ai.model_gemini import get_gemini_loop
+from vertex_ai.story_service import generate_story_async
+from vertex_ai.lesson_service import generate_lesson_async
+
+BUNDLE_PARTS = ('story', 'lesson')
+
+def iter_bundle(craft_name: str, category: str, region: str, use_cache: bool = True) -> Iterator[tuple]:
+    # Starts the story and lesson together on the Gemini loop and yields
+    # (part, result, elapsed_ms) in completion order; a failed part yields
+    # (part, exception, elapsed_ms). Closing the iterator (client went away)
+    # stops this request waiting on the parts still running; a generation
+    # is only cancelled if no other request has joined it, otherwise it
+    # finishes and fills the cache.
+    loop = get_gemini_loop()
+    started = time.perf_counter()
+    generators = {
+        'story': generate_story_async,
+        'lesson': generate_lesson_async
+    }
+    futures = {
+        asyncio.run_coroutine_threadsafe(generate(craft_name, category, region, use_cache), loop): part
+        for part, generate in generators.items()
+    }
+    try:
+        for future in as_completed(futures):
+            elapsed_ms = round((time.perf_counter() - started) * 1000.0, 1)
+            try:
+                yield futures[future], future.result(), elapsed_ms
+            except Exception as e:
+                yield futures[future], e, elapsed_ms
+    finally:
+        # Cancels our wait; single-flight decides whether the call goes on
+        for future in futures:
+            future.cancel()
+
+def generate_bundle(craft_name: str, category: str, region: str, use_cache: bool = True) -> Dict[str, Any]:
+    # Both parts with partial success: a failed part is None and its
+    # message is under "errors"
+    bundle = {part: None for part in BUNDLE_PARTS}
+    bundle["errors"] = {}
+    bundle["timings_ms"] = {}
+    for part, result, elapsed_ms in iter_bundle(craft_name, category, region, use_cache):
+        bundle["timings_ms"][part] = elapsed_ms
+        if isinstance(result, Exception):
+            bundle["errors"][part] = str(result)
+        else:
+            bundle[part] = result
+    return bundle
+
+def stream_bundle(craft_name: str, category: str, region: str, use_cache: bool = True) -> Iterator[tuple]:
+    # Yields ("story", result) and ("lesson", result) as each completes, or
+    # ("error", {"part": ..., "message": ...}) for a part that failed
+    parts = iter_bundle(craft_name, category, region, use_cache)
+    try:
+        for part, result, elapsed_ms in parts:
+            if isinstance(result, Exception):
+                print(f"⚠️  Bundle {part} failed after {elapsed_ms} ms: {result}")
+                yield "error", {"part": part, "message": str(result)}
+            else:
+                yield part, result
+    finally:
+        parts.close()
+
+if __name__ == "__main__":
+    import json
+    
+    result = generate_bundle(
+        craft_name="Madhubani Painting",
+        category="painting",
+        region="Bihar, India"
+    )
+    
+    print("\n" + "="*60)
+    print("BUNDLE:")
+    print("="*60)
+    print(json.dumps(result, indent=2))
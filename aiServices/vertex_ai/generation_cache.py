@@ -0,0 +1,331 @@
+"""
+Response cache for generated stories and lessons.
+
+Traffic is dominated by a few hundred (craft_name, category, region)
+triples, and every Gemini call takes 10-30 s. Results are cached keyed by
+the normalized inputs, the prompt template version and the Gemini model
+name, so editing a template or switching models never serves stale output.
+
+Cached results are returned exactly as generated, with their original
+`meta.generated_at`, plus `meta.cached: true`. Callers can bypass the
+lookup (`use_cache=False`); the fresh result then replaces the cached one.
+Placeholder results built when Gemini's response could not be parsed
+(`meta.fallback: true`) are never cached.
+
+Stale-while-revalidate: an entry older than the soft TTL is still served
+immediately (with `meta.stale: true`) while a background worker regenerates
+it; an entry older than the hard TTL (the cache's own TTL) is a plain miss.
+Refreshes are deduplicated per key and rate-limited by a token bucket, so
+many popular entries going stale together cannot exhaust the Gemini quota;
+a refresh that is throttled is simply retried on a later request.
+
+Identical concurrent generations are coalesced (single-flight): while one
+request is generating a key, every other request for it - and any
+background refresh - waits for that call and shares its result instead of
+calling Gemini again.
+
+`cached_generation_async` is the asyncio counterpart for generators that
+return coroutines, and `stream_generation` the one for streamed responses;
+all of them share the same cache, refresher and in-flight calls.
+"""
+
+import hashlib
+import json
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Generator, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from shared.cache import TieredCache
+from shared.single_flight import SingleFlight
+from vertex_ai.model_gemini import GEMINI_MODEL_NAME, run_on_gemini_loop
+from vertex_ai.prompt_templates import PROMPT_TEMPLATE_VERSION
+
+_cache: Optional[TieredCache] = None
+_cache_lock = threading.Lock()
+
+_refresher: Optional['GenerationRefresher'] = None
+_refresher_lock = threading.Lock()
+
+# In-flight generations by cache key, shared by requests and refreshes
+_single_flight = SingleFlight()
+
+
+def normalize_input(value: str) -> str:
+    # "  Madhubani   painting " and "madhubani painting" are the same request
+    return re.sub(r'\s+', ' ', str(value)).strip().casefold()
+
+
+def generation_cache_key(kind: str, craft_name: str, category: str, region: str) -> str:
+    inputs = [normalize_input(value) for value in (craft_name, category, region)]
+    digest = hashlib.sha256(json.dumps(inputs).encode('utf-8')).hexdigest()
+    return f"{kind}:{GEMINI_MODEL_NAME}:{PROMPT_TEMPLATE_VERSION}:{digest}"
+
+
+def get_generation_cache() -> Optional[TieredCache]:
+    # GEMINI_CACHE_SIZE=0 disables caching; GEMINI_CACHE_DB adds a SQLite
+    # tier so generated content survives restarts.
+    global _cache
+    max_entries = int(os.getenv('GEMINI_CACHE_SIZE', '1024'))
+    if max_entries <= 0:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                max_disk_entries = os.getenv('GEMINI_CACHE_DB_MAX_ENTRIES')
+                ttl_seconds = float(os.getenv('GEMINI_CACHE_TTL_SECONDS', '604800'))
+                _cache = TieredCache(
+                    max_entries=max_entries,
+                    db_path=os.getenv('GEMINI_CACHE_DB') or None,
+                    namespace="gemini_generation",
+                    max_disk_entries=int(max_disk_entries) if max_disk_entries else None,
+                    ttl_seconds=ttl_seconds if ttl_seconds > 0 else None
+                )
+    return _cache
+
+
+class TokenBucket:
+    # `rate` tokens per second, at most `capacity` saved up for bursts
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class GenerationRefresher:
+    # Regenerates stale cache entries on background threads
+
+    def __init__(self, rate_per_minute: float, burst: int, workers: int = 1, max_queue: int = 256):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._bucket = TokenBucket(rate_per_minute / 60.0, burst)
+        self._queue: "queue.Queue[tuple]" = queue.Queue(maxsize=max_queue)
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._threads = []
+
+        self._counters = {
+            "scheduled": 0,
+            "deduplicated": 0,
+            "throttled": 0,
+            "dropped": 0,
+            "refreshed": 0,
+            "failed": 0
+        }
+
+    def schedule(self, cache_key: str, refresh: Callable[[], Any]) -> bool:
+        # refresh() regenerates and stores the entry; returns True if it
+        # was queued for this request
+        with self._lock:
+            if cache_key in self._pending:
+                self._counters["deduplicated"] += 1
+                return False
+            if not self._bucket.try_acquire():
+                self._counters["throttled"] += 1
+                return False
+            try:
+                self._queue.put_nowait((cache_key, refresh))
+            except queue.Full:
+                self._counters["dropped"] += 1
+                return False
+            self._pending.add(cache_key)
+            self._counters["scheduled"] += 1
+            self._ensure_workers()
+        return True
+
+    def _ensure_workers(self):
+        # Caller holds self._lock
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(
+                target=self._run, name=f"gemini-refresh-{len(self._threads)}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            cache_key, refresh = self._queue.get()
+            try:
+                refresh()
+                outcome = "refreshed"
+            except Exception as e:
+                # The stale entry keeps being served; a later request retries
+                print(f"⚠️  Background refresh of {cache_key} failed: {e}")
+                outcome = "failed"
+            with self._lock:
+                self._pending.discard(cache_key)
+                self._counters[outcome] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["in_progress"] = len(self._pending)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["rate_per_minute"] = round(self._bucket.rate * 60.0, 2)
+        stats["burst"] = self._bucket.capacity
+        return stats
+
+
+def soft_ttl_seconds() -> Optional[float]:
+    # Age after which a cached result is served stale and refreshed;
+    # GEMINI_CACHE_SOFT_TTL_SECONDS=0 turns stale-while-revalidate off.
+    soft_ttl = float(os.getenv('GEMINI_CACHE_SOFT_TTL_SECONDS', '86400'))
+    return soft_ttl if soft_ttl > 0 else None
+
+
+def get_refresher() -> Optional[GenerationRefresher]:
+    global _refresher
+    cache = get_generation_cache()
+    if cache is None or soft_ttl_seconds() is None:
+        return None
+    if _refresher is None:
+        with _refresher_lock:
+            if _refresher is None:
+                _refresher = GenerationRefresher(
+                    rate_per_minute=float(os.getenv('GEMINI_REFRESH_PER_MINUTE', '6')),
+                    burst=int(os.getenv('GEMINI_REFRESH_BURST', '3')),
+                    workers=int(os.getenv('GEMINI_REFRESH_WORKERS', '1'))
+                )
+    return _refresher
+
+
+def cached_generation(
+    cache_key: str,
+    generate: Callable[[], Dict[str, Any]],
+    result_meta: Callable[[Dict[str, Any]], Dict[str, Any]],
+    use_cache: bool = True
+) -> Dict[str, Any]:
+    # result_meta(result) returns the result's "meta" dict, which differs
+    # between stories (result["json"]["meta"]) and lessons (result["meta"])
+    cache = get_generation_cache()
+
+    def generate_and_store() -> Dict[str, Any]:
+        # Joins an identical generation already in flight, if any
+        return _single_flight.do(cache_key, lambda: _store(cache, cache_key, generate(), result_meta))
+
+    cached = _cached_result(cache, cache_key, result_meta, use_cache, generate_and_store)
+    if cached is not None:
+        return cached
+    return generate_and_store()
+
+
+async def cached_generation_async(
+    cache_key: str,
+    generate: Callable[[], Awaitable[Dict[str, Any]]],
+    result_meta: Callable[[Dict[str, Any]], Dict[str, Any]],
+    use_cache: bool = True
+) -> Dict[str, Any]:
+    cache = get_generation_cache()
+
+    async def generate_and_store() -> Dict[str, Any]:
+        return _store(cache, cache_key, await generate(), result_meta)
+
+    def refresh() -> Dict[str, Any]:
+        # Background refreshes run on a refresher thread
+        return _single_flight.do(cache_key, lambda: run_on_gemini_loop(generate_and_store()))
+
+    cached = _cached_result(cache, cache_key, result_meta, use_cache, refresh)
+    if cached is not None:
+        return cached
+    return await _single_flight.do_async(cache_key, generate_and_store)
+
+
+def lookup_generation(
+    cache_key: str,
+    generate: Callable[[], Dict[str, Any]],
+    result_meta: Callable[[Dict[str, Any]], Dict[str, Any]],
+    use_cache: bool = True
+) -> Optional[Dict[str, Any]]:
+    # For callers that produce the result themselves (streaming): the cached
+    # result or None; a stale one is refreshed in the background with generate()
+    cache = get_generation_cache()
+
+    def refresh() -> Dict[str, Any]:
+        return _single_flight.do(cache_key, lambda: _store(cache, cache_key, generate(), result_meta))
+
+    return _cached_result(cache, cache_key, result_meta, use_cache, refresh)
+
+
+def stream_generation(
+    cache_key: str,
+    stream: Callable[[], Generator],
+    result_meta: Callable[[Dict[str, Any]], Dict[str, Any]]
+) -> Generator:
+    # For `result, streamed = yield from stream_generation(...)` after a
+    # lookup_generation miss. stream() yields progress events and returns
+    # the result. If the same key is already being generated (streamed or
+    # not), nothing is yielded and that call's result is returned with
+    # streamed=False; otherwise stream() runs and later identical requests
+    # wait for it.
+    cache = get_generation_cache()
+
+    def stream_and_store() -> Generator:
+        result = yield from stream()
+        return _store(cache, cache_key, result, result_meta)
+
+    return (yield from _single_flight.do_stream(cache_key, stream_and_store))
+
+
+def _cached_result(
+    cache: Optional[TieredCache],
+    cache_key: str,
+    result_meta: Callable[[Dict[str, Any]], Dict[str, Any]],
+    use_cache: bool,
+    refresh: Callable[[], Any]
+) -> Optional[Dict[str, Any]]:
+    # The cached result (scheduling a refresh if it is stale), or None
+    if cache is None or not use_cache:
+        return None
+    entry = cache.get_with_age(cache_key)
+    if entry is None:
+        return None
+    cached, age = entry
+    result_meta(cached)["cached"] = True
+    soft_ttl = soft_ttl_seconds()
+    if soft_ttl is not None and age > soft_ttl:
+        result_meta(cached)["stale"] = True
+
+        def refresh_entry() -> Dict[str, Any]:
+            result = refresh()
+            if result_meta(result).get("fallback"):
+                # Not stored; the stale entry keeps being served
+                raise RuntimeError("Gemini returned an unusable response")
+            return result
+
+        get_refresher().schedule(cache_key, refresh_entry)
+    return cached
+
+
+def _store(
+    cache: Optional[TieredCache],
+    cache_key: str,
+    result: Dict[str, Any],
+    result_meta: Callable[[Dict[str, Any]], Dict[str, Any]]
+) -> Dict[str, Any]:
+    # Placeholder results from an unparseable response (meta.fallback) are
+    # returned but not cached, so the next request asks Gemini again
+    if cache is not None and not result_meta(result).get("fallback"):
+        cache.set(cache_key, result)
+    return result
+
+
+def single_flight_stats() -> Dict[str, Any]:
+    return _single_flight.stats()
@@ -1,15 +1,28 @@
 import json
 import re
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, List, Optional
 import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from vertex_ai.model_gemini import get_gemini_model
 from vertex_ai.prompt_templates import get_lesson_prompt
+from vertex_ai.generation_cache import (
+    cached_generation,
+    cached_generation_async,
+    generation_cache_key,
+    lookup_generation,
+    stream_generation
+)
 from shared.utils import add_metadata
 
 def parse_lesson_response(response_text: str) -> Dict[str, Any]:
+    return _parse_lesson(response_text)[0]
+
+def _parse_lesson(response_text: str) -> tuple:
+    # parse_lesson_response plus a fallback flag: (lesson_data, fallback),
+    # fallback being True when the response could not be used and the
+    # placeholder lesson was returned instead
     json_text = re.sub(r'```json\s*', '', response_text)
     json_text = re.sub(r'```\s*$', '', json_text)
     json_text = json_text.strip()
@@ -39,7 +52,7 @@ def parse_lesson_response(response_text: str) -> Dict[str, Any]:
             if len(question['options']) != 4:
                 raise ValueError(f"Quiz question {i+1} must have 4 options")
         
-        return lesson_data
+        return lesson_data, False
         
     except (json.JSONDecodeError, ValueError) as e:
         print(f"Warning: Error parsing lesson response: {e}")
@@ -96,9 +109,36 @@ def parse_lesson_response(response_text: str) -> Dict[str, Any]:
                 }
             ],
             "summary": "You have learned the basic techniques and cultural significance of this traditional craft. Practice these skills to preserve this important cultural heritage."
-        }
+        }, True
+
+def generate_lesson(craft_name: str, category: str, region: str, use_cache: bool = True) -> Dict[str, Any]:
+    # use_cache=False skips the cache lookup; the fresh lesson is still cached
+    cache_key = generation_cache_key('lesson', craft_name, category, region)
+    return cached_generation(
+        cache_key,
+        lambda: _generate_lesson(craft_name, category, region),
+        lambda result: result["meta"],
+        use_cache
+    )
+
+async def generate_lesson_async(
+    craft_name: str,
+    category: str,
+    region: str,
+    use_cache: bool = True,
+    timeout: Optional[float] = None
+) -> Dict[str, Any]:
+    # Holds no thread while Gemini is generating; cancelling the awaiting
+    # task cancels the call unless other requests are waiting for it
+    cache_key = generation_cache_key('lesson', craft_name, category, region)
+    return await cached_generation_async(
+        cache_key,
+        lambda: _generate_lesson_async(craft_name, category, region, timeout),
+        lambda result: result["meta"],
+        use_cache
+    )
 
-def generate_lesson(craft_name: str, category: str, region: str) -> Dict[str, Any]:
+def _generate_lesson(craft_name: str, category: str, region: str) -> Dict[str, Any]:
     gemini = get_gemini_model()
     
     prompt = get_lesson_prompt(craft_name, category, region)
@@ -106,13 +146,116 @@ def generate_lesson(craft_name: str, category: str, region: str) -> Dict[str, An
     print(f"Generating lesson for {craft_name}...")
     response = gemini.generate_content(prompt)
     
-    lesson_data = parse_lesson_response(response)
+    return build_lesson_result(craft_name, category, region, response)
+
+async def _generate_lesson_async(craft_name: str, category: str, region: str, timeout: Optional[float]) -> Dict[str, Any]:
+    gemini = get_gemini_model()
+    
+    prompt = get_lesson_prompt(craft_name, category, region)
+    
+    print(f"Generating lesson for {craft_name}...")
+    response = await gemini.generate_content_async(prompt, timeout)
+    
+    return build_lesson_result(craft_name, category, region, response)
+
+def stream_lesson(craft_name: str, category: str, region: str, use_cache: bool = True) -> Iterator[tuple]:
+    # Yields ("step", {"index": i, "step": ...}) as each step is parsed out
+    # of the streamed JSON, then ("lesson", result) with the same result
+    # generate_lesson returns
+    cache_key = generation_cache_key('lesson', craft_name, category, region)
+    cached = lookup_generation(
+        cache_key,
+        lambda: _generate_lesson(craft_name, category, region),
+        lambda result: result["meta"],
+        use_cache
+    )
+    if cached is not None:
+        for index, step in enumerate(cached["steps"]):
+            yield "step", {"index": index, "step": step}
+        yield "lesson", cached
+        return
+    
+    result, streamed = yield from stream_generation(
+        cache_key,
+        lambda: _stream_lesson(craft_name, category, region),
+        lambda result: result["meta"]
+    )
+    if not streamed:
+        # Another request generated it meanwhile: all steps at once, as for cached results
+        for index, step in enumerate(result["steps"]):
+            yield "step", {"index": index, "step": step}
+    yield "lesson", result
+
+def _stream_lesson(craft_name: str, category: str, region: str) -> Iterator[tuple]:
+    # Yields the step events and returns the result
+    gemini = get_gemini_model()
+    
+    prompt = get_lesson_prompt(craft_name, category, region)
+    
+    print(f"Streaming lesson for {craft_name}...")
+    steps = LessonStepStream()
+    chunks = []
+    for chunk in gemini.stream_content(prompt):
+        chunks.append(chunk)
+        for index, step in steps.feed(chunk):
+            yield "step", {"index": index, "step": step}
+    
+    return build_lesson_result(craft_name, category, region, "".join(chunks))
+
+class LessonStepStream:
+    # Incrementally parses the "steps" array of a streamed lesson JSON,
+    # returning each element once it is complete.
+    
+    _STEPS_START = re.compile(r'"steps"\s*:\s*\[')
+    _SEPARATOR = re.compile(r'[\s,]*')
+    
+    def __init__(self):
+        self._buffer = ''
+        self._position = None  # next unparsed offset inside the array
+        self._finished = False
+        self._decoder = json.JSONDecoder()
+        self.count = 0
+    
+    def feed(self, chunk: str) -> List[tuple]:
+        # Returns [(index, step)] for the steps completed by this chunk
+        self._buffer += chunk
+        completed = []
+        if self._finished:
+            return completed
+        
+        if self._position is None:
+            match = self._STEPS_START.search(self._buffer)
+            if not match:
+                return completed
+            self._position = match.end()
+        
+        while True:
+            position = self._SEPARATOR.match(self._buffer, self._position).end()
+            if position >= len(self._buffer):
+                break
+            if self._buffer[position] == ']':
+                self._finished = True
+                break
+            try:
+                step, end = self._decoder.raw_decode(self._buffer, position)
+            except json.JSONDecodeError:
+                break  # element not complete yet
+            completed.append((self.count, step))
+            self.count += 1
+            self._position = end
+        return completed
+
+def build_lesson_result(craft_name: str, category: str, region: str, response: str) -> Dict[str, Any]:
+    lesson_data, fallback = _parse_lesson(response)
     
     lesson_data["craft_name"] = craft_name
     lesson_data["category"] = category
     lesson_data["region"] = region
     
     lesson_data = add_metadata(lesson_data, "gemini-pro")
+    if fallback:
+        # Placeholder content: returned, but never cached
+        lesson_data["meta"]["fallback"] = True
     
     print("✓ Lesson generated successfully")
     return lesson_data
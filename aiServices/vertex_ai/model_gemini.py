@@ -1,8 +1,102 @@
+import asyncio
+import contextlib
 import os
-from typing import Optional
+import queue
+import threading
+from typing import Any, Callable, Coroutine, Dict, Iterator, Optional
 import google.generativeai as genai
 from dotenv import load_dotenv
 
+# Part of the generation cache key, so switching models invalidates it
+GEMINI_MODEL_NAME = 'gemini-2.5-flash'
+
+# Gemini calls in flight per process, across all requests; more wait
+GEMINI_MAX_CONCURRENCY = int(os.getenv('GEMINI_MAX_CONCURRENCY', '32'))
+GEMINI_TIMEOUT_SECONDS = float(os.getenv('GEMINI_TIMEOUT_SECONDS', '60'))
+
+# Every Gemini call runs on one background event loop, so the concurrency
+# limit is global and a pending generation holds no thread: blocking callers
+# wait on a future, async callers await it from their own loop.
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+# Only created and touched on the Gemini event loop
+_semaphore: Optional[asyncio.Semaphore] = None
+_call_counters = {
+    "calls": 0,
+    "in_flight": 0,
+    "waiting": 0,
+    "timeouts": 0,
+    "cancelled": 0,
+    "failures": 0
+}
+
+
+def get_gemini_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="gemini-event-loop", daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+def run_on_gemini_loop(coro: Coroutine) -> Any:
+    # Blocks the calling thread until the coroutine finishes on the loop
+    return asyncio.run_coroutine_threadsafe(coro, get_gemini_loop()).result()
+
+
+async def await_on_gemini_loop(coro: Coroutine) -> Any:
+    # Awaitable from any event loop; cancelling the caller cancels the call
+    loop = get_gemini_loop()
+    if asyncio.get_running_loop() is loop:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+
+@contextlib.asynccontextmanager
+async def _gemini_slot(timeout: float):
+    # Runs on the Gemini loop: waits for a free slot under
+    # GEMINI_MAX_CONCURRENCY and counts the call's outcome
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+    
+    _call_counters["waiting"] += 1
+    try:
+        await _semaphore.acquire()
+    except asyncio.CancelledError:
+        _call_counters["cancelled"] += 1
+        raise
+    finally:
+        _call_counters["waiting"] -= 1
+    
+    _call_counters["calls"] += 1
+    _call_counters["in_flight"] += 1
+    try:
+        yield
+    except asyncio.TimeoutError:
+        _call_counters["timeouts"] += 1
+        raise TimeoutError(f"Gemini call timed out after {timeout:g}s") from None
+    except asyncio.CancelledError:
+        _call_counters["cancelled"] += 1
+        raise
+    except Exception:
+        _call_counters["failures"] += 1
+        raise
+    finally:
+        _call_counters["in_flight"] -= 1
+        _semaphore.release()
+
+
+def gemini_call_stats() -> Dict[str, Any]:
+    stats = dict(_call_counters)
+    stats["max_concurrency"] = GEMINI_MAX_CONCURRENCY
+    stats["timeout_seconds"] = GEMINI_TIMEOUT_SECONDS
+    return stats
+
 class GeminiModel:
     
     _instance: Optional['GeminiModel'] = None
@@ -28,16 +122,69 @@ class GeminiModel:
         
         genai.configure(api_key=api_key)
         
-        self._model = genai.GenerativeModel('gemini-2.5-flash')
+        self._model = genai.GenerativeModel(GEMINI_MODEL_NAME)
         
         print("✓ Gemini Pro model initialized successfully")
     
     def get_model(self):
         return self._model
     
-    def generate_content(self, prompt: str) -> str:
-        response = self._model.generate_content(prompt)
-        return response.text
+    def generate_content(self, prompt: str, timeout: Optional[float] = None) -> str:
+        return run_on_gemini_loop(self._generate_limited(prompt, timeout))
+    
+    async def generate_content_async(self, prompt: str, timeout: Optional[float] = None) -> str:
+        return await await_on_gemini_loop(self._generate_limited(prompt, timeout))
+    
+    def stream_content(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        # Blocking iterator over text chunks as Gemini produces them;
+        # closing it early (client went away) cancels the call
+        chunks: "queue.Queue[Optional[str]]" = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(
+            self._stream_limited(prompt, timeout, chunks.put), get_gemini_loop()
+        )
+        try:
+            while True:
+                chunk = chunks.get()
+                if chunk is None:
+                    break
+                yield chunk
+            future.result()  # re-raises a failed or timed-out call
+        finally:
+            future.cancel()
+    
+    async def _generate_limited(self, prompt: str, timeout: Optional[float]) -> str:
+        # Runs on the Gemini loop; the timeout covers the call itself, not
+        # the wait for a free slot
+        timeout = GEMINI_TIMEOUT_SECONDS if timeout is None else timeout
+        async with _gemini_slot(timeout):
+            response = await asyncio.wait_for(
+                self._model.generate_content_async(prompt, request_options={"timeout": timeout}),
+                timeout
+            )
+            return response.text
+    
+    async def _stream_limited(self, prompt: str, timeout: Optional[float], emit: Callable[[Optional[str]], None]):
+        # Calls emit(chunk) per text chunk and emit(None) when done; the
+        # timeout covers the whole stream
+        timeout = GEMINI_TIMEOUT_SECONDS if timeout is None else timeout
+        try:
+            async with _gemini_slot(timeout):
+                await asyncio.wait_for(self._consume_stream(prompt, timeout, emit), timeout)
+        finally:
+            emit(None)
+    
+    async def _consume_stream(self, prompt: str, timeout: float, emit: Callable[[Optional[str]], None]):
+        response = await self._model.generate_content_async(
+            prompt, stream=True, request_options={"timeout": timeout}
+        )
+        async for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunks without text parts (e.g. only finish metadata)
+                continue
+            if text:
+                emit(text)
 
 def get_gemini_model() -> GeminiModel:
     return GeminiModel()
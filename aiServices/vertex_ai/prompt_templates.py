@@ -1,3 +1,6 @@
+# Part of the generation cache key; bump whenever a template changes
+PROMPT_TEMPLATE_VERSION = "1"
+
 STORY_PROMPT_TEMPLATE = """
 You are an expert in traditional crafts, cultural heritage, and artisan history.
 
@@ -36,6 +39,39 @@ JSON:
   "traditional_usage": "...",
   "why_unique": "..."
 }}
+"""
+
+LESSON_PROMPT_TEMPLATE = """
+You are an expert craft instructor who teaches traditional crafts to beginners.
+
+Create a structured, hands-on lesson for the craft: "{craft_name}"
+Category: {category}
+Region: {region}
+
+The lesson should include:
+- A clear, engaging lesson title
+- An introduction (3-4 sentences) explaining what the learner will make and the craft's cultural context
+- A list of 5-8 materials and tools required
+- 6-10 step-by-step instructions, each starting with "Step N: "
+- A quiz with exactly 3 multiple-choice questions, each with exactly 4 options labelled "A) ", "B) ", "C) " and "D) ", and the letter of the correct answer
+- A short summary (2-3 sentences) of what the learner has achieved
+
+Respond with ONLY a JSON object in this format:
+{{
+  "lesson_title": "...",
+  "introduction": "...",
+  "materials_required": ["...", "..."],
+  "steps": ["Step 1: ...", "Step 2: ..."],
+  "quiz": [
+    {{
+      "question": "...",
+      "options": ["A) ...", "B) ...", "C) ...", "D) ..."],
+      "answer": "A"
+    }}
+  ],
+  "summary": "..."
+}}
+"""
 
 def get_story_prompt(craft_name: str, category: str, region: str) -> str:
     return STORY_PROMPT_TEMPLATE.format(
@@ -1,15 +1,29 @@
 import json
 import re
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, Optional
 import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from vertex_ai.model_gemini import get_gemini_model
 from vertex_ai.prompt_templates import get_story_prompt
+from vertex_ai.generation_cache import (
+    cached_generation,
+    cached_generation_async,
+    generation_cache_key,
+    lookup_generation,
+    stream_generation
+)
 from shared.utils import add_metadata, create_hybrid_response
 
 def parse_story_response(response_text: str) -> tuple:
+    story_text, story_data, _ = _parse_story(response_text)
+    return story_text, story_data
+
+def _parse_story(response_text: str) -> tuple:
+    # parse_story_response plus a fallback flag: (story_text, story_data,
+    # fallback), fallback being True when the JSON part was missing, empty
+    # or invalid
     parts = response_text.split('JSON:', 1)
     
     if len(parts) < 2:
@@ -31,7 +45,9 @@ def parse_story_response(response_text: str) -> tuple:
         json_text = json_text.strip()
         
         story_data = json.loads(json_text)
+        fallback = not story_data
     except json.JSONDecodeError:
+        fallback = True
         story_data = {
             "title": "Traditional Craft Story",
             "historical_origin": "Ancient craft with rich heritage.",
@@ -42,9 +58,36 @@ def parse_story_response(response_text: str) -> tuple:
             "why_unique": "Unique techniques and cultural context."
         }
     
-    return story_text, story_data
+    return story_text, story_data, fallback
+
+def generate_story(craft_name: str, category: str, region: str, use_cache: bool = True) -> Dict[str, Any]:
+    # use_cache=False skips the cache lookup; the fresh story is still cached
+    cache_key = generation_cache_key('story', craft_name, category, region)
+    return cached_generation(
+        cache_key,
+        lambda: _generate_story(craft_name, category, region),
+        lambda result: result["json"]["meta"],
+        use_cache
+    )
 
-def generate_story(craft_name: str, category: str, region: str) -> Dict[str, Any]:
+async def generate_story_async(
+    craft_name: str,
+    category: str,
+    region: str,
+    use_cache: bool = True,
+    timeout: Optional[float] = None
+) -> Dict[str, Any]:
+    # Holds no thread while Gemini is generating; cancelling the awaiting
+    # task cancels the call unless other requests are waiting for it
+    cache_key = generation_cache_key('story', craft_name, category, region)
+    return await cached_generation_async(
+        cache_key,
+        lambda: _generate_story_async(craft_name, category, region, timeout),
+        lambda result: result["json"]["meta"],
+        use_cache
+    )
+
+def _generate_story(craft_name: str, category: str, region: str) -> Dict[str, Any]:
     gemini = get_gemini_model()
     
     prompt = get_story_prompt(craft_name, category, region)
@@ -52,7 +95,122 @@ def generate_story(craft_name: str, category: str, region: str) -> Dict[str, Any
     print(f"Generating story for {craft_name}...")
     response = gemini.generate_content(prompt)
     
-    story_text, story_data = parse_story_response(response)
+    return build_story_result(craft_name, category, region, response)
+
+async def _generate_story_async(craft_name: str, category: str, region: str, timeout: Optional[float]) -> Dict[str, Any]:
+    gemini = get_gemini_model()
+    
+    prompt = get_story_prompt(craft_name, category, region)
+    
+    print(f"Generating story for {craft_name}...")
+    response = await gemini.generate_content_async(prompt, timeout)
+    
+    return build_story_result(craft_name, category, region, response)
+
+def stream_story(craft_name: str, category: str, region: str, use_cache: bool = True) -> Iterator[tuple]:
+    # Yields ("text", {"text": chunk}) while the STORY part streams in, then
+    # ("story", result) with the same result generate_story returns
+    cache_key = generation_cache_key('story', craft_name, category, region)
+    cached = lookup_generation(
+        cache_key,
+        lambda: _generate_story(craft_name, category, region),
+        lambda result: result["json"]["meta"],
+        use_cache
+    )
+    if cached is not None:
+        yield "text", {"text": cached["text"]}
+        yield "story", cached
+        return
+    
+    result, streamed = yield from stream_generation(
+        cache_key,
+        lambda: _stream_story(craft_name, category, region),
+        lambda result: result["json"]["meta"]
+    )
+    if not streamed:
+        # Another request generated it meanwhile: the text in one piece, as for cached results
+        yield "text", {"text": result["text"]}
+    yield "story", result
+
+def _stream_story(craft_name: str, category: str, region: str) -> Iterator[tuple]:
+    # Yields the text events and returns the result
+    gemini = get_gemini_model()
+    
+    prompt = get_story_prompt(craft_name, category, region)
+    
+    print(f"Streaming story for {craft_name}...")
+    story_text = StoryTextStream()
+    chunks = []
+    for chunk in gemini.stream_content(prompt):
+        chunks.append(chunk)
+        text = story_text.feed(chunk)
+        if text:
+            yield "text", {"text": text}
+    text = story_text.finish()
+    if text:
+        yield "text", {"text": text}
+    
+    return build_story_result(craft_name, category, region, "".join(chunks))
+
+class StoryTextStream:
+    # Picks the story text out of a streamed "STORY: ... JSON: {...}"
+    # response: drops the STORY: label, stops at the JSON: marker and holds
+    # back a few characters that could be the start of that marker.
+    
+    STORY_LABEL = 'STORY:'
+    JSON_MARKER = 'JSON:'
+    
+    def __init__(self):
+        self._buffer = ''
+        self._emitted = None  # buffer offset sent so far; None until the label is checked
+        self._finished = False
+        self._started = False
+    
+    def feed(self, chunk: str) -> str:
+        if self._finished:
+            return ''
+        self._buffer += chunk
+        
+        if self._emitted is None:
+            stripped = self._buffer.lstrip()
+            if len(stripped) < len(self.STORY_LABEL) and self.STORY_LABEL.startswith(stripped):
+                return ''
+            offset = len(self._buffer) - len(stripped)
+            if stripped.startswith(self.STORY_LABEL):
+                offset += len(self.STORY_LABEL)
+            self._emitted = offset
+        
+        marker = self._buffer.find(self.JSON_MARKER, self._emitted)
+        if marker >= 0:
+            end = marker
+            self._finished = True
+        else:
+            end = max(self._emitted, len(self._buffer) - len(self.JSON_MARKER) + 1)
+        
+        text = self._buffer[self._emitted:end]
+        self._emitted = end
+        if not self._started:
+            # Leading blank lines after the label
+            text = text.lstrip()
+            self._started = bool(text)
+        return text
+    
+    def finish(self) -> str:
+        # End of the response: whatever was held back was not a JSON: marker
+        if self._finished:
+            return ''
+        self._finished = True
+        text = self._buffer[self._emitted or 0:]
+        if self._emitted is None:
+            text = text.strip()
+            if text.startswith(self.STORY_LABEL):
+                text = text[len(self.STORY_LABEL):]
+        if not self._started:
+            text = text.lstrip()
+        return text
+
+def build_story_result(craft_name: str, category: str, region: str, response: str) -> Dict[str, Any]:
+    story_text, story_data, fallback = _parse_story(response)
     
     complete_json = {
         "craft_name": craft_name,
@@ -62,6 +220,9 @@ def generate_story(craft_name: str, category: str, region: str) -> Dict[str, Any
     }
     
     complete_json = add_metadata(complete_json, "gemini-pro")
+    if fallback:
+        # Placeholder content: returned, but never cached
+        complete_json["meta"]["fallback"] = True
     
     result = create_hybrid_response(story_text, complete_json)
     
@@ -1,4 +1,23 @@
-from .image_classifier import CraftImageClassifier, classify_craft_image
-
-__all__ = ['CraftImageClassifier', 'classify_craft_image']
+from .image_classifier import (
+    CraftImageClassifier,
+    classify_craft_image,
+    classify_craft_images,
+    embed_craft_image,
+    get_classifier,
+    is_classifier_loaded,
+    warmup_classifier,
+    reload_classifier,
+    swap_classifier
+)
 
+__all__ = [
+    'CraftImageClassifier',
+    'classify_craft_image',
+    'classify_craft_images',
+    'embed_craft_image',
+    'get_classifier',
+    'is_classifier_loaded',
+    'warmup_classifier',
+    'reload_classifier',
+    'swap_classifier'
+]
@@ -0,0 +1,149 @@
+"""
+Dynamic micro-batching for image classification.
+
+Concurrent requests submit preprocessed image tensors to a shared queue. A
+single worker thread collects them until either `max_batch_size` tensors are
+waiting or `max_wait_ms` has passed since the first one arrived, runs one
+stacked forward pass and resolves each caller's future with its own result.
+With `max_in_flight` > 1 (inference running in other processes), up to that
+many batches run concurrently while the next one is being collected.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import torch
+
+
+class BatchScheduler:
+
+    def __init__(
+        self,
+        classify_batch: Callable[[torch.Tensor], List[Any]],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 10.0,
+        max_in_flight: int = 1,
+        max_queue: int = 0
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+
+        self.classify_batch = classify_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_in_flight = max_in_flight
+
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+        self._executor = (
+            ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="vision-batch")
+            if max_in_flight > 1 else None
+        )
+
+        # max_queue > 0 bounds waiting tensors; submit() then blocks when full
+        self.max_queue = max_queue
+        self._queue: "queue.Queue[tuple]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._largest_batch = 0
+        self._queue_wait_total = 0.0
+        self._queue_wait_max = 0.0
+
+    def submit(self, input_tensor: torch.Tensor) -> Future:
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((input_tensor, future, time.monotonic()))
+        return future
+
+    def classify(self, input_tensor: torch.Tensor, timeout: Optional[float] = None) -> Any:
+        return self.submit(input_tensor).result(timeout=timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "batches": self._batches,
+                "items": self._items,
+                "average_batch_size": round(self._items / self._batches, 2) if self._batches else 0.0,
+                "largest_batch": self._largest_batch,
+                "queue_depth": self._queue.qsize(),
+                "max_queue": self.max_queue,
+                "average_queue_wait_ms": round(
+                    self._queue_wait_total * 1000.0 / self._items, 3
+                ) if self._items else 0.0,
+                "max_queue_wait_ms": round(self._queue_wait_max * 1000.0, 3),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "max_in_flight": self.max_in_flight
+            }
+
+    def _ensure_worker(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="vision-batch-scheduler", daemon=True
+                )
+                self._thread.start()
+
+    def _collect_batch(self) -> List[tuple]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    # Still take whatever is already queued, just don't wait.
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            started = time.monotonic()
+            waits = [started - enqueued for _, _, enqueued in batch]
+            batch = [(tensor, future) for tensor, future, _ in batch]
+
+            with self._stats_lock:
+                self._queue_wait_total += sum(waits)
+                self._queue_wait_max = max(self._queue_wait_max, max(waits))
+                self._batches += 1
+                self._items += len(batch)
+                self._largest_batch = max(self._largest_batch, len(batch))
+
+            self._in_flight.acquire()
+            if self._executor is None:
+                self._run_batch(batch)
+            else:
+                self._executor.submit(self._run_batch, batch)
+
+    def _run_batch(self, batch: List[tuple]):
+        try:
+            input_batch = torch.stack([tensor for tensor, _ in batch])
+            results = self.classify_batch(input_batch)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        finally:
+            self._in_flight.release()
+
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
@@ -0,0 +1,260 @@
+"""
+Benchmark the vision hot path stage by stage.
+
+Each iteration classifies one batch and times the stages separately:
+
+    decode          image bytes -> PIL image (reduced decode as configured)
+    preprocess      resize/crop/normalise to a tensor
+    forward         model forward pass
+    softmax_topk    softmax and top-5
+    label_mapping   taxonomy lookups and result dicts
+
+and reports p50/p95/p99 per stage and end to end, plus images/sec, for
+every combination of inference mode, torch thread count and batch size.
+Inputs are the bundled images/Pottery.png and synthetic JPEGs, so it runs
+fully offline; --random-weights avoids needing the pretrained weights (for
+ResNet50 and the VISION_CASCADE_BACKBONE stage, if one is configured).
+
+The JSON report can be passed back as --baseline to flag regressions:
+
+    python vision_ai/benchmark.py --random-weights --output bench.json
+    python vision_ai/benchmark.py --random-weights --modes eager torchscript \\
+        --batch-sizes 1 8 32 --threads 1 4 --baseline bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+import torch
+import torchvision
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from vision_ai.benchmark_decode import make_synthetic_jpeg
+from vision_ai.inference_modes import INFERENCE_MODES, supports_channels_last
+
+STAGES = ('decode', 'preprocess', 'forward', 'softmax_topk', 'label_mapping')
+
+# (width, height) of the synthetic inputs: a web upload and a phone photo
+SYNTHETIC_SIZES = {
+    "synthetic_1MP": (1280, 960),
+    "synthetic_12MP": (4000, 3000)
+}
+
+
+def load_inputs(tmp_dir: str) -> Dict[str, bytes]:
+    inputs = {}
+    pottery = Path(__file__).parent.parent / "images" / "Pottery.png"
+    if pottery.exists():
+        inputs["Pottery.png"] = pottery.read_bytes()
+    for label, size in SYNTHETIC_SIZES.items():
+        path = Path(tmp_dir) / f"{label}.jpg"
+        make_synthetic_jpeg(path, size)
+        inputs[label] = path.read_bytes()
+    return inputs
+
+
+def write_random_weights(weights_dir: str) -> List[str]:
+    # Same architectures and file format as weight_store exports, so the
+    # classifier loads them through VISION_WEIGHTS_DIR without any download:
+    # ResNet50 and the cascade backbone, if VISION_CASCADE_BACKBONE is set.
+    backbones = ["resnet50"]
+    cascade_backbone = os.getenv('VISION_CASCADE_BACKBONE')
+    if cascade_backbone:
+        backbones.append(cascade_backbone)
+    torch.manual_seed(0)
+    for backbone in backbones:
+        model = getattr(torchvision.models, backbone)(weights=None)
+        torch.save(model.state_dict(), Path(weights_dir) / f"{backbone}.pt")
+    return backbones
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "mean": round(float(np.mean(samples)), 3)
+    }
+
+
+def run_batch(classifier, images: List[bytes]) -> Dict[str, float]:
+    # Returns the milliseconds spent in each stage for one batch
+    timings = {}
+
+    start = time.perf_counter()
+    decoded = [classifier.load_image(image) for image in images]
+    timings["decode"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    input_batch = torch.stack([classifier.preprocess(image) for image in decoded])
+    timings["preprocess"] = time.perf_counter() - start
+
+    _, model_timings = classifier.classify_batch_timed(input_batch)
+    timings.update(model_timings)
+
+    return {stage: seconds * 1000.0 for stage, seconds in timings.items()}
+
+
+def benchmark_configuration(
+    classifier,
+    inputs: List[bytes],
+    batch_size: int,
+    iterations: int,
+    warmup: int
+) -> Dict[str, Any]:
+    batch = [inputs[i % len(inputs)] for i in range(batch_size)]
+    for _ in range(warmup):
+        run_batch(classifier, batch)
+
+    stage_samples = {stage: [] for stage in STAGES}
+    totals = []
+    for _ in range(iterations):
+        timings = run_batch(classifier, batch)
+        for stage in STAGES:
+            stage_samples[stage].append(timings[stage])
+        totals.append(sum(timings.values()))
+
+    return {
+        "batch_size": batch_size,
+        "images_per_second": round(batch_size * 1000.0 / float(np.mean(totals)), 2),
+        "latency_ms": percentiles(totals),
+        "stages_ms": {stage: percentiles(samples) for stage, samples in stage_samples.items()}
+    }
+
+
+def run_benchmark(
+    modes: List[str],
+    batch_sizes: List[int],
+    thread_counts: List[int],
+    iterations: int,
+    warmup: int,
+    channels_last: bool,
+    inputs: Dict[str, bytes]
+) -> Dict[str, Any]:
+    from vision_ai.image_classifier import CraftImageClassifier
+
+    report = {
+        "environment": {
+            "torch": torch.__version__,
+            "torchvision": torchvision.__version__,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "weights": os.getenv('VISION_WEIGHTS_DIR') or "torchvision",
+            "cascade_backbone": os.getenv('VISION_CASCADE_BACKBONE') or None
+        },
+        "inputs": sorted(inputs),
+        "iterations": iterations,
+        "runs": []
+    }
+    images = [inputs[name] for name in sorted(inputs)]
+
+    for mode in modes:
+        mode_channels_last = channels_last and supports_channels_last(mode)
+        classifier = CraftImageClassifier(inference_mode=mode, channels_last=mode_channels_last)
+        classifier.warmup()
+
+        for threads in thread_counts:
+            torch.set_num_threads(threads)
+            for batch_size in batch_sizes:
+                result = benchmark_configuration(classifier, images, batch_size, iterations, warmup)
+                result.update({"mode": mode, "channels_last": mode_channels_last, "threads": threads})
+                report["runs"].append(result)
+                print(f"  {mode:<13} threads={threads:<3} batch={batch_size:<4} "
+                      f"{result['images_per_second']:>8.1f} img/s   "
+                      f"p50 {result['latency_ms']['p50']:.1f} ms   "
+                      f"p99 {result['latency_ms']['p99']:.1f} ms")
+
+    return report
+
+
+def _run_key(run: Dict[str, Any]) -> tuple:
+    return (run["mode"], run["channels_last"], run["threads"], run["batch_size"])
+
+
+def compare_to_baseline(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    # Configurations whose throughput dropped or p95 latency rose by more
+    # than `tolerance` (a fraction) against the baseline report
+    baseline_runs = {_run_key(run): run for run in baseline.get("runs", [])}
+    regressions = []
+    for run in report["runs"]:
+        previous = baseline_runs.get(_run_key(run))
+        if previous is None:
+            continue
+        throughput_change = run["images_per_second"] / previous["images_per_second"] - 1
+        p95_change = run["latency_ms"]["p95"] / previous["latency_ms"]["p95"] - 1
+        if throughput_change < -tolerance or p95_change > tolerance:
+            regressions.append({
+                "mode": run["mode"],
+                "threads": run["threads"],
+                "batch_size": run["batch_size"],
+                "images_per_second_change": round(throughput_change, 3),
+                "p95_latency_change": round(p95_change, 3)
+            })
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the vision classification hot path")
+    parser.add_argument('--modes', nargs='+', default=['eager'], choices=INFERENCE_MODES)
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 4, 16])
+    parser.add_argument('--threads', nargs='+', type=int, default=[torch.get_num_threads()])
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--channels-last', action='store_true')
+    parser.add_argument(
+        '--random-weights', action='store_true',
+        help="Use randomly initialised ResNet50 (and VISION_CASCADE_BACKBONE) weights "
+             "(no pretrained weights needed)"
+    )
+    parser.add_argument('--output', help="Write the JSON report to this file")
+    parser.add_argument('--baseline', help="Earlier JSON report to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help="Allowed fractional slowdown against the baseline")
+    args = parser.parse_args()
+
+    print("="*70)
+    print("VISION AI - CLASSIFIER BENCHMARK")
+    print("="*70)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.random_weights:
+            write_random_weights(tmp_dir)
+            os.environ['VISION_WEIGHTS_DIR'] = tmp_dir
+        inputs = load_inputs(tmp_dir)
+        report = run_benchmark(
+            args.modes, args.batch_sizes, args.threads,
+            args.iterations, args.warmup, args.channels_last, inputs
+        )
+    if args.random_weights:
+        report["environment"]["weights"] = "random"
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"\n✓ Report written to {args.output}")
+
+    if args.baseline:
+        regressions = compare_to_baseline(
+            report, json.loads(Path(args.baseline).read_text()), args.tolerance
+        )
+        report["regressions"] = regressions
+        print("\n" + "="*70)
+        if regressions:
+            print(f"✗ {len(regressions)} configuration(s) regressed beyond {args.tolerance:.0%}:")
+            print(json.dumps(regressions, indent=2))
+            sys.exit(1)
+        print(f"✓ No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
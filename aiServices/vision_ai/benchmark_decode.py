@@ -0,0 +1,132 @@
+"""
+Benchmark the reduced-resolution decode path against full-resolution decode.
+
+Each (image, path) pair runs in a fresh process so peak RSS is attributable
+to that decode alone. Synthetic JPEGs at typical phone resolutions are
+generated when no images are given, so it runs fully offline.
+
+Usage:
+    python vision_ai/benchmark_decode.py                       # synthetic 12/24/48 MP
+    python vision_ai/benchmark_decode.py --images photo.jpg --repeat 10 --output decode.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# (width, height) of common phone sensors
+SYNTHETIC_SIZES = {
+    "12MP": (4000, 3000),
+    "24MP": (6000, 4000),
+    "48MP": (8000, 6000)
+}
+
+
+def make_synthetic_jpeg(path: Path, size: tuple):
+    from PIL import Image
+
+    width, height = size
+    noise = Image.effect_noise((width // 4, height // 4), 48).resize(size)
+    gradient = Image.linear_gradient('L').resize(size)
+    Image.merge('RGB', (noise, gradient, noise)).save(path, 'JPEG', quality=90)
+
+
+def _run_decode(image_path: str, reduced: bool, repeat: int, results) -> None:
+    import torchvision.transforms as transforms
+    from vision_ai.image_io import decode_image
+
+    preprocess = transforms.Compose([
+        transforms.Resize(256),
+        transforms.CenterCrop(224),
+        transforms.ToTensor()
+    ])
+
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    decode_ms = []
+    preprocess_ms = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        image = decode_image(image_path, reduced=reduced)
+        decoded = time.perf_counter()
+        preprocess(image)
+        decode_ms.append((decoded - start) * 1000.0)
+        preprocess_ms.append((time.perf_counter() - decoded) * 1000.0)
+        decoded_size = image.size
+        del image
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    results.put({
+        "decoded_size": list(decoded_size),
+        "decode_ms_median": round(statistics.median(decode_ms), 2),
+        "preprocess_ms_median": round(statistics.median(preprocess_ms), 2),
+        "total_ms_median": round(statistics.median(
+            d + p for d, p in zip(decode_ms, preprocess_ms)
+        ), 2),
+        "peak_rss_delta_mb": round((peak_kb - baseline_kb) / 1024.0, 1)
+    })
+
+
+def benchmark_image(image_path: str, repeat: int) -> Dict[str, Any]:
+    context = multiprocessing.get_context('spawn')
+    report = {}
+    for name, reduced in (("full_decode", False), ("reduced_decode", True)):
+        results = context.Queue()
+        process = context.Process(target=_run_decode, args=(image_path, reduced, repeat, results))
+        process.start()
+        report[name] = results.get()
+        process.join()
+
+    report["speedup"] = round(
+        report["full_decode"]["total_ms_median"] / report["reduced_decode"]["total_ms_median"], 2
+    )
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark reduced-resolution image decoding")
+    parser.add_argument('--images', nargs='+', help="Images to benchmark (default: synthetic JPEGs)")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    print("="*70)
+    print("VISION AI - DECODE BENCHMARK")
+    print("="*70)
+
+    report: Dict[str, Any] = {"repeat": args.repeat, "images": {}}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        image_paths: List[tuple] = []
+        if args.images:
+            image_paths = [(Path(path).name, path) for path in args.images]
+        else:
+            for label, size in SYNTHETIC_SIZES.items():
+                path = Path(tmp_dir) / f"synthetic_{label}.jpg"
+                make_synthetic_jpeg(path, size)
+                image_paths.append((f"synthetic_{label}", str(path)))
+
+        for label, path in image_paths:
+            print(f"\n📸 {label}")
+            result = benchmark_image(path, args.repeat)
+            report["images"][label] = result
+            print(f"   Full decode:    {result['full_decode']['total_ms_median']} ms, "
+                  f"+{result['full_decode']['peak_rss_delta_mb']} MB peak RSS")
+            print(f"   Reduced decode: {result['reduced_decode']['total_ms_median']} ms, "
+                  f"+{result['reduced_decode']['peak_rss_delta_mb']} MB peak RSS")
+            print(f"   Speedup: {result['speedup']}x")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+    print("\n" + json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Offline bulk classification of an image archive to JSONL.
+
+Walks a directory tree (or reads a manifest with one path per line) in a
+deterministic order, decodes and preprocesses in a process pool, runs
+batched inference in this process and appends one JSON line per image in
+input order - the same entries /ai/classify_images returns.
+
+Memory stays bounded regardless of archive size: paths are streamed, and
+only a fixed window of decode jobs is in flight at a time.
+
+Progress is checkpointed after every batch (images done, last path, output
+size), so an interrupted run resumes where it stopped:
+
+    python vision_ai/bulk_classify.py --images /archive --output results.jsonl
+    python vision_ai/bulk_classify.py --manifest paths.txt --output results.jsonl --workers 8
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+import torch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from vision_ai.image_classifier import CraftImageClassifier, build_preprocess
+from vision_ai.image_io import DEFAULT_MAX_PIXELS, IMAGE_SUFFIXES, decode_image
+from vision_ai.result_entries import error_entry, success_entry
+
+
+def iter_directory(root: str) -> Iterator[str]:
+    # Sorted walk, one directory listing in memory at a time
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if Path(filename).suffix.lower() in IMAGE_SUFFIXES:
+                yield os.path.join(dirpath, filename)
+
+
+def iter_manifest(manifest: str) -> Iterator[str]:
+    with open(manifest, 'r', encoding='utf-8') as f:
+        for line in f:
+            path = line.strip()
+            if path and not path.startswith('#'):
+                yield path
+
+
+# Decode worker state, set up once per process
+_preprocess = None
+_max_pixels = DEFAULT_MAX_PIXELS
+_reduced = True
+
+
+def _init_decode_worker():
+    global _preprocess, _max_pixels, _reduced
+    torch.set_num_threads(1)
+    _preprocess = build_preprocess()
+    _max_pixels = int(os.getenv('VISION_MAX_DECODE_PIXELS', str(DEFAULT_MAX_PIXELS)))
+    _reduced = os.getenv('VISION_REDUCED_DECODE', 'true').lower() == 'true'
+
+
+def _decode(path: str):
+    # Returns a float32 array [3, 224, 224]; raised errors travel back to
+    # the main process with the future.
+    image = decode_image(path, target_size=256, max_pixels=_max_pixels, reduced=_reduced)
+    return _preprocess(image).numpy()
+
+
+def load_checkpoint(checkpoint_path: Path) -> Optional[Dict[str, Any]]:
+    if not checkpoint_path.exists():
+        return None
+    return json.loads(checkpoint_path.read_text())
+
+
+def save_checkpoint(checkpoint_path: Path, state: Dict[str, Any]):
+    tmp_path = checkpoint_path.with_name(checkpoint_path.name + ".tmp")
+    tmp_path.write_text(json.dumps(state))
+    os.replace(tmp_path, checkpoint_path)
+
+
+def bulk_classify(
+    paths: Iterator[str],
+    output_path: str,
+    checkpoint_path: Optional[str] = None,
+    batch_size: int = 16,
+    workers: Optional[int] = None,
+    report_every: float = 10.0
+) -> Dict[str, Any]:
+    output_path = Path(output_path)
+    checkpoint_path = Path(checkpoint_path or f"{output_path}.checkpoint")
+    workers = workers or max(1, (os.cpu_count() or 1) - 1)
+
+    # Resume: skip what the checkpoint covers and drop any output written
+    # after it (a batch that was written but not yet checkpointed).
+    state = load_checkpoint(checkpoint_path) or {
+        "done": 0,
+        "last_path": None,
+        "output_bytes": output_path.stat().st_size if output_path.exists() else 0
+    }
+    skip = state["done"]
+    if skip:
+        print(f"↻ Resuming after {skip} images (last: {state['last_path']})")
+    with open(output_path, 'ab') as f:
+        f.truncate(state["output_bytes"])
+
+    classifier = CraftImageClassifier()
+    classifier.warmup()
+
+    # Decode jobs in flight: enough to keep every worker busy while a batch
+    # runs, small enough that memory does not grow with the archive.
+    window = batch_size * 2 + workers * 2
+    started = time.perf_counter()
+    last_report = started
+    counts = {"succeeded": 0, "failed": 0}
+
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_decode_worker) as pool, \
+            open(output_path, 'a', encoding='utf-8') as output:
+
+        pending = deque()
+        path_iter = iter(paths)
+        for index, path in enumerate(path_iter):
+            if index < skip:
+                if index == skip - 1 and path != state["last_path"]:
+                    raise RuntimeError(
+                        f"Checkpoint does not match the input order: expected "
+                        f"{state['last_path']} at position {skip}, found {path}"
+                    )
+                continue
+            pending.append((path, pool.submit(_decode, path)))
+            if len(pending) >= window:
+                _classify_ready(classifier, pending, batch_size, output, counts, state)
+                save_checkpoint(checkpoint_path, state)
+
+            now = time.perf_counter()
+            if now - last_report >= report_every:
+                processed = counts["succeeded"] + counts["failed"]
+                print(f"  {state['done']} done, {processed / (now - started):.1f} images/sec")
+                last_report = now
+
+        while pending:
+            _classify_ready(classifier, pending, batch_size, output, counts, state)
+            save_checkpoint(checkpoint_path, state)
+
+    elapsed = time.perf_counter() - started
+    processed = counts["succeeded"] + counts["failed"]
+    return {
+        "processed": processed,
+        "succeeded": counts["succeeded"],
+        "failed": counts["failed"],
+        "resumed_from": skip,
+        "seconds": round(elapsed, 2),
+        "images_per_second": round(processed / elapsed, 2) if elapsed > 0 else 0.0,
+        "output": str(output_path)
+    }
+
+
+def _classify_ready(
+    classifier: CraftImageClassifier,
+    pending: deque,
+    batch_size: int,
+    output,
+    counts: Dict[str, int],
+    state: Dict[str, Any]
+):
+    # Takes the next batch_size jobs in input order, classifies the decoded
+    # ones together and writes every entry (errors inline).
+    jobs = [pending.popleft() for _ in range(min(batch_size, len(pending)))]
+    entries = [None] * len(jobs)
+    decoded = []
+    for i, (path, future) in enumerate(jobs):
+        try:
+            decoded.append((i, torch.from_numpy(future.result())))
+        except BrokenProcessPool:
+            # Not the image's fault: stop before the checkpoint moves past it
+            raise
+        except Exception as e:
+            entries[i] = error_entry(path, e)
+
+    if decoded:
+        try:
+            results = classifier.classify_batch(torch.stack([tensor for _, tensor in decoded]))
+            for (i, _), result in zip(decoded, results):
+                entries[i] = success_entry(jobs[i][0], result)
+        except Exception as e:
+            for i, _ in decoded:
+                entries[i] = error_entry(jobs[i][0], e)
+
+    for entry in entries:
+        counts["succeeded" if entry["status"] == "success" else "failed"] += 1
+        output.write(json.dumps(entry) + "\n")
+    output.flush()
+    os.fsync(output.fileno())
+
+    state["done"] += len(jobs)
+    state["last_path"] = jobs[-1][0]
+    state["output_bytes"] = output.tell()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify an image archive to JSONL")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--images', help="Directory tree to classify")
+    source.add_argument('--manifest', help="File with one image path per line")
+    parser.add_argument('--output', required=True, help="JSONL file to append results to")
+    parser.add_argument('--checkpoint', help="Checkpoint file (default: <output>.checkpoint)")
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--workers', type=int, help="Decode processes (default: CPUs - 1)")
+    args = parser.parse_args()
+
+    print("="*70)
+    print("VISION AI - BULK CLASSIFICATION")
+    print("="*70)
+
+    paths = iter_directory(args.images) if args.images else iter_manifest(args.manifest)
+    summary = bulk_classify(
+        paths, args.output, args.checkpoint, args.batch_size, args.workers
+    )
+
+    print("\n" + "="*70)
+    print(f"✓ {summary['processed']} images in {summary['seconds']}s "
+          f"({summary['images_per_second']} images/sec), {summary['failed']} failed")
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Accuracy check for optimized inference modes.
+
+Runs every requested mode over a reference image set and compares it with
+eager fp32: top-1 agreement, top-k overlap and - most importantly - whether
+the mapped craft_type is unchanged. Exits non-zero if any mode changes a
+craft_type, so it can gate enabling a mode in deployment scripts.
+
+Usage:
+    python vision_ai/check_inference_modes.py --images images/ \\
+        --modes torchscript dynamic_int8 static_int8 --channels-last
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import torch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from vision_ai.image_classifier import CraftImageClassifier
+from vision_ai.image_io import IMAGE_SUFFIXES
+from vision_ai.inference_modes import INFERENCE_MODES, supports_channels_last
+
+
+def collect_images(sources: List[str]) -> List[str]:
+    image_paths = []
+    for source in sources:
+        path = Path(source)
+        if path.is_dir():
+            image_paths.extend(
+                str(p) for p in sorted(path.rglob('*')) if p.suffix.lower() in IMAGE_SUFFIXES
+            )
+        else:
+            image_paths.append(str(path))
+    return image_paths
+
+
+def run_mode(classifier: CraftImageClassifier, input_batch: torch.Tensor, k: int) -> Dict[str, Any]:
+    classifier.warmup()
+    start = time.perf_counter()
+    probabilities = classifier.predict_batch(input_batch)
+    elapsed = time.perf_counter() - start
+
+    results = classifier.classify_batch(input_batch)
+    return {
+        "topk": torch.topk(probabilities, k, dim=1).indices.tolist(),
+        "craft_types": [result["craft_type"] for result in results],
+        "latency_ms_per_image": elapsed * 1000.0 / len(input_batch)
+    }
+
+
+def compare_inference_modes(
+    image_paths: List[str],
+    modes: List[str],
+    k: int = 5,
+    channels_last: bool = False
+) -> Dict[str, Any]:
+    reference = CraftImageClassifier(inference_mode='eager')
+    input_batch = torch.stack([
+        reference.preprocess(reference.load_image(path)) for path in image_paths
+    ])
+    baseline = run_mode(reference, input_batch, k)
+
+    report = {
+        "images": len(image_paths),
+        "k": k,
+        "eager": {"latency_ms_per_image": round(baseline["latency_ms_per_image"], 2)},
+        "modes": {}
+    }
+
+    for mode in modes:
+        mode_channels_last = channels_last and supports_channels_last(mode)
+        classifier = CraftImageClassifier(inference_mode=mode, channels_last=mode_channels_last)
+        candidate = run_mode(classifier, input_batch, k)
+
+        top1_matches = sum(
+            1 for ref, cand in zip(baseline["topk"], candidate["topk"]) if ref[0] == cand[0]
+        )
+        topk_overlap = sum(
+            len(set(ref) & set(cand)) / k for ref, cand in zip(baseline["topk"], candidate["topk"])
+        )
+        craft_mismatches = [
+            {"image": path, "eager": ref, mode: cand}
+            for path, ref, cand in zip(image_paths, baseline["craft_types"], candidate["craft_types"])
+            if ref != cand
+        ]
+
+        report["modes"][mode] = {
+            "channels_last": mode_channels_last,
+            "top1_agreement": round(top1_matches / len(image_paths), 4),
+            "topk_overlap": round(topk_overlap / len(image_paths), 4),
+            "craft_type_agreement": round(1 - len(craft_mismatches) / len(image_paths), 4),
+            "craft_type_mismatches": craft_mismatches,
+            "latency_ms_per_image": round(candidate["latency_ms_per_image"], 2),
+            "speedup_vs_eager": round(
+                baseline["latency_ms_per_image"] / candidate["latency_ms_per_image"], 2
+            )
+        }
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare optimized inference modes against eager fp32")
+    parser.add_argument(
+        '--images', nargs='+',
+        default=[str(Path(__file__).parent.parent / "images")],
+        help="Reference images or directories (default: bundled images/)"
+    )
+    parser.add_argument(
+        '--modes', nargs='+',
+        default=[mode for mode in INFERENCE_MODES if mode != 'eager'],
+        choices=INFERENCE_MODES
+    )
+    parser.add_argument('--k', type=int, default=5, help="Top-k to compare")
+    parser.add_argument(
+        '--channels-last', action='store_true',
+        help="Use channels_last for the modes that support it"
+    )
+    parser.add_argument('--output', help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    image_paths = collect_images(args.images)
+    if not image_paths:
+        print("✗ No reference images found")
+        sys.exit(2)
+
+    print("="*70)
+    print("VISION AI - INFERENCE MODE ACCURACY CHECK")
+    print("="*70)
+    print(f"Reference images: {len(image_paths)}")
+
+    report = compare_inference_modes(image_paths, args.modes, args.k, args.channels_last)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+    failed = [mode for mode, result in report["modes"].items() if result["craft_type_mismatches"]]
+    print("\n" + "="*70)
+    if failed:
+        print(f"✗ craft_type changed under: {', '.join(failed)}")
+        sys.exit(1)
+    print("✓ All modes preserve craft_type on the reference set")
+
+
+if __name__ == "__main__":
+    main()
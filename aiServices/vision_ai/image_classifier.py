@@ -1,45 +1,259 @@
 import torch
-import torchvision.models as models
 import torchvision.transforms as transforms
 from PIL import Image
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+import os
 import sys
+import threading
+import time
+from concurrent.futures import Future
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from shared.utils import get_timestamp
+from vision_ai.model_registry import ClassifierRegistry
+from vision_ai.batching import BatchScheduler
+from vision_ai.pipeline import ClassificationPipeline
+from vision_ai.result_cache import get_result_cache, image_cache_key
+from vision_ai.near_duplicates import get_near_duplicate_index
+from vision_ai.taxonomy import CompiledTaxonomy, load_taxonomy
+from vision_ai.inference_modes import mode_note, optimize_model, uses_autocast
+from vision_ai.image_io import DEFAULT_MAX_PIXELS, ImageSource, decode_image
+from vision_ai.result_entries import error_entry, success_entry
+from vision_ai.memory_report import model_memory_report
+from vision_ai.weight_store import load_backbone, process_memory
+
+AGGREGATION_MODES = ('top5', 'full')
+
+class EmbeddingResNet(torch.nn.Module):
+    # ResNet whose forward returns (logits, pooled penultimate features), so
+    # the embedding survives tracing/quantization along with the classifier.
+    
+    def __init__(self, resnet: torch.nn.Module):
+        super().__init__()
+        self.backbone = torch.nn.Sequential(*list(resnet.children())[:-1])
+        self.fc = resnet.fc
+    
+    def forward(self, x: torch.Tensor) -> tuple:
+        features = torch.flatten(self.backbone(x), 1)
+        return self.fc(features), features
+
+def build_preprocess() -> transforms.Compose:
+    return transforms.Compose([
+        transforms.Resize(256),
+        transforms.CenterCrop(224),
+        transforms.ToTensor(),
+        transforms.Normalize(
+            mean=[0.485, 0.456, 0.406],
+            std=[0.229, 0.224, 0.225]
+        )
+    ])
+
+# Small ImageNet backbones usable as the first cascade stage
+CASCADE_BACKBONES = ('resnet18', 'resnet34', 'mobilenet_v3_small', 'mobilenet_v3_large')
 
 class CraftImageClassifier:
     
-    def __init__(self):
+    def __init__(
+        self,
+        taxonomy_path: Optional[str] = None,
+        aggregation: Optional[str] = None,
+        inference_mode: Optional[str] = None,
+        channels_last: Optional[bool] = None,
+        cascade_backbone: Optional[str] = None,
+        cascade_threshold: Optional[float] = None
+    ):
         print("Loading ResNet50 model (CPU mode)...")
+        load_start = time.perf_counter()
+        
+        # VISION_WEIGHTS_DIR loads mmap-backed local weights; see weight_store.py
+        resnet, resnet_report = load_backbone('resnet50')
+        backbone_reports = [resnet_report]
         
-        self.model = models.resnet50(pretrained=True)
-        self.model.eval()  # Set to evaluation mode
+        # Wrapped so every forward pass also yields the 2048-d embedding
+        model = EmbeddingResNet(resnet)
+        model.eval()  # Set to evaluation mode
         
-        self.preprocess = transforms.Compose([
-            transforms.Resize(256),
-            transforms.CenterCrop(224),
-            transforms.ToTensor(),
-            transforms.Normalize(
-                mean=[0.485, 0.456, 0.406],
-                std=[0.229, 0.224, 0.225]
+        # Decode near the 256px preprocessing size instead of full resolution
+        self.reduced_decode = os.getenv('VISION_REDUCED_DECODE', 'true').lower() == 'true'
+        self.max_decode_pixels = int(os.getenv('VISION_MAX_DECODE_PIXELS', str(DEFAULT_MAX_PIXELS)))
+        
+        self.preprocess = build_preprocess()
+        
+        # Execution engine: see vision_ai/inference_modes.py
+        self.inference_mode = (inference_mode or os.getenv('VISION_INFERENCE_MODE', 'eager')).lower()
+        if channels_last is None:
+            channels_last = os.getenv('VISION_CHANNELS_LAST', 'false').lower() == 'true'
+        self.channels_last = channels_last
+        self.autocast = uses_autocast(self.inference_mode)
+        reference_batches = (
+            self._reference_batches() if self.inference_mode in ('static_int8', 'bf16') else None
+        )
+        # bf16 is only enabled if it maps the reference images to the same
+        # crafts as fp32, so keep the fp32 outputs from before conversion
+        fp32_references = {}
+        if self.inference_mode == 'bf16':
+            fp32_references['resnet50'] = self._fp32_probabilities(model, reference_batches)
+        self.model = optimize_model(
+            model, self.inference_mode, self.channels_last, reference_batches
+        )
+        
+        # Optional two-stage cascade: a small backbone answers first and
+        # ResNet50 only runs for images whose craft-score margin is low.
+        self.cascade_backbone = cascade_backbone or os.getenv('VISION_CASCADE_BACKBONE') or None
+        if cascade_threshold is None:
+            cascade_threshold = float(os.getenv('VISION_CASCADE_THRESHOLD', '0.3'))
+        self.cascade_threshold = cascade_threshold
+        self.cascade_model = None
+        if self.cascade_backbone:
+            if self.cascade_backbone not in CASCADE_BACKBONES:
+                raise ValueError(f"Unsupported cascade backbone: {self.cascade_backbone}")
+            print(f"Loading {self.cascade_backbone} cascade stage...")
+            cascade_model, cascade_report = load_backbone(self.cascade_backbone)
+            backbone_reports.append(cascade_report)
+            if self.inference_mode == 'bf16':
+                fp32_references[self.cascade_backbone] = self._fp32_probabilities(cascade_model, reference_batches)
+            self.cascade_model = optimize_model(
+                cascade_model, self.inference_mode, self.channels_last, reference_batches
             )
-        ])
+        self._cascade_lock = threading.Lock()
+        self._cascade_counters = {
+            "images": 0,
+            "stage1_answered": 0,
+            "stage2_escalated": 0,
+            "stage1_seconds": 0.0,
+            "stage2_seconds": 0.0
+        }
         
         self.class_labels = self._load_imagenet_labels()
         
-        self.craft_keywords = {
-            'pottery': ['pot', 'vase', 'jar', 'pottery', 'ceramic', 'clay'],
-            'textile': ['fabric', 'cloth', 'textile', 'weaving', 'loom', 'thread'],
-            'woodwork': ['wood', 'carving', 'furniture', 'wooden'],
-            'metalwork': ['metal', 'iron', 'bronze', 'brass', 'copper'],
-            'basketry': ['basket', 'wicker', 'weave'],
-            'jewelry': ['necklace', 'bracelet', 'jewelry', 'ornament'],
-            'painting': ['painting', 'canvas', 'art'],
-            'sculpture': ['sculpture', 'statue', 'carving']
+        # Keyword taxonomy compiled to class-index lookup tables
+        if taxonomy_path is None:
+            taxonomy_path = os.getenv('VISION_TAXONOMY_PATH')
+        self.taxonomy = CompiledTaxonomy(load_taxonomy(taxonomy_path), self.class_labels)
+        
+        # "top5": map the five best classes through the lookup tables.
+        # "full": aggregate the whole softmax per craft/material in one matmul.
+        self.aggregation = (aggregation or os.getenv('VISION_AGGREGATION', 'top5')).lower()
+        if self.aggregation not in AGGREGATION_MODES:
+            raise ValueError(f"Unknown aggregation mode: {self.aggregation}")
+        self.craft_min_score = float(os.getenv('VISION_CRAFT_MIN_SCORE', '0.05'))
+        self.material_min_score = float(os.getenv('VISION_MATERIAL_MIN_SCORE', '0.05'))
+        
+        # Part of the result cache key; bump whenever outputs can change
+        self.model_version = (
+            f"resnet50-imagenet:{self.inference_mode}{'-cl' if self.channels_last else ''}"
+            f":{self.taxonomy.fingerprint}:{self.aggregation}"
+        )
+        if self.reduced_decode:
+            self.model_version += ":reduced-decode"
+        if self.cascade_model is not None:
+            self.model_version += f":cascade-{self.cascade_backbone}-{self.cascade_threshold}"
+        if self.aggregation == 'full':
+            self.model_version += f":{self.craft_min_score}:{self.material_min_score}"
+        
+        precision_check = None
+        if fp32_references:
+            precision_check = self._check_reduced_precision(fp32_references, reference_batches)
+        
+        # Parameter bytes of ResNet50, plus activation peaks for the batch
+        # sizes in VISION_MEMORY_REPORT_BATCH_SIZES (off by default: they
+        # cost real forward passes, measured once per process and mode).
+        # torch.compile graphs are skipped rather than compiled here.
+        batch_sizes = [
+            int(size) for size in os.getenv('VISION_MEMORY_REPORT_BATCH_SIZES', '').split(',')
+            if size.strip()
+        ]
+        measure_forward = None if self.inference_mode == 'compile' else (
+            lambda batch: self._run_model(self.model, batch)
+        )
+        memory = model_memory_report(
+            self.model, measure_forward, batch_sizes, config=(self.inference_mode, self.channels_last)
+        )
+        memory.update(process_memory())
+        
+        # Cold-start cost of this instance, reported by /ai/classifier/stats
+        self.load_report = {
+            "backbones": backbone_reports,
+            "startup_seconds": round(time.perf_counter() - load_start, 3),
+            "memory": memory
         }
+        if precision_check is not None:
+            self.load_report["precision_check"] = precision_check
+        note = mode_note(self.inference_mode)
+        if note is not None:
+            self.load_report["inference_mode_note"] = note
+        
+        activation_peak = "".join(
+            f"activation peak (batch {batch_size}): {peak_mb} MB, "
+            for batch_size, peak_mb in memory['activation_peak_mb'].items() if peak_mb is not None
+        )
+        print(f"✓ ResNet50 model loaded successfully ({self.inference_mode} mode)")
+        print(f"  Startup: {self.load_report['startup_seconds']}s, "
+              f"parameters: {memory['parameters_mb']} MB, {activation_peak}"
+              f"RSS: {memory['rss_mb']} MB")
+        if note is not None:
+            print(f"  Note: {note}")
+    
+    def warmup(self):
+        # One dummy forward pass so the first real request does not pay for
+        # lazy allocator/kernel initialisation (or torch.compile tracing).
+        dummy_batch = torch.zeros(1, 3, 224, 224)
+        self.predict_batch(dummy_batch)
+        if self.cascade_model is not None:
+            self._forward(self.cascade_model, dummy_batch)
+    
+    def _reference_batches(self) -> List[torch.Tensor]:
+        # Real images for static quantization calibration and the bf16
+        # check: VISION_CALIBRATION_DIR, or the bundled images/ folder.
+        calibration_dir = Path(os.getenv(
+            'VISION_CALIBRATION_DIR', str(Path(__file__).parent.parent / "images")
+        ))
+        image_paths = sorted(
+            path for path in calibration_dir.rglob('*')
+            if path.suffix.lower() in ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
+        )
+        if not image_paths:
+            raise ValueError(f"No calibration images found in {calibration_dir}")
         
-        print("✓ ResNet50 model loaded successfully")
+        tensors = [self.preprocess(self.load_image(str(path))) for path in image_paths]
+        return [torch.stack(tensors[i:i + 16]) for i in range(0, len(tensors), 16)]
+    
+    def _fp32_probabilities(self, model: torch.nn.Module, batches: List[torch.Tensor]) -> torch.Tensor:
+        outputs = []
+        with torch.no_grad():
+            for batch in batches:
+                output = model(batch)
+                outputs.append(output[0] if isinstance(output, tuple) else output)
+        return torch.nn.functional.softmax(torch.cat(outputs), dim=1)
+    
+    def _check_reduced_precision(
+        self,
+        fp32_references: Dict[str, torch.Tensor],
+        batches: List[torch.Tensor]
+    ) -> Dict[str, Any]:
+        # Refuses to load if any reference image changes craft_type
+        models = {'resnet50': self.model}
+        if self.cascade_model is not None:
+            models[self.cascade_backbone] = self.cascade_model
+        
+        report = {"reference_images": sum(len(batch) for batch in batches), "models": {}}
+        for name, fp32_probabilities in fp32_references.items():
+            probabilities = torch.cat([self._forward(models[name], batch) for batch in batches])
+            expected = [result["craft_type"] for result in self._build_results(fp32_probabilities)]
+            actual = [result["craft_type"] for result in self._build_results(probabilities)]
+            mismatches = sum(1 for a, b in zip(expected, actual) if a != b)
+            top1_matches = int((fp32_probabilities.argmax(dim=1) == probabilities.argmax(dim=1)).sum())
+            if mismatches:
+                raise RuntimeError(
+                    f"{self.inference_mode} changes craft_type for {mismatches} of "
+                    f"{len(expected)} reference images ({name}); use eager instead"
+                )
+            report["models"][name] = {
+                "craft_type_agreement": 1.0,
+                "top1_agreement": round(top1_matches / len(expected), 4),
+                "max_probability_error": round(float((fp32_probabilities - probabilities).abs().max()), 5)
+            }
+        return report
     
     def _load_imagenet_labels(self) -> List[str]:
         return [
@@ -48,67 +262,104 @@ class CraftImageClassifier:
             'metal', 'jewelry', 'ornament', 'painting', 'sculpture'
         ] * 63  # Pad to 1000 classes (simplified for demo)
     
-    def _map_to_craft_type(self, predictions: List[tuple]) -> str:
-        for class_name, _ in predictions:
-            class_lower = class_name.lower()
-            for craft_type, keywords in self.craft_keywords.items():
-                if any(keyword in class_lower for keyword in keywords):
-                    return craft_type
-        
-        return "traditional_craft"
-    
-    def _detect_materials(self, predictions: List[tuple]) -> List[str]:
-        materials = set()
-        material_keywords = {
-            'clay': ['pot', 'pottery', 'ceramic', 'clay'],
-            'wood': ['wood', 'wooden', 'timber'],
-            'metal': ['metal', 'iron', 'bronze', 'brass', 'copper', 'silver', 'gold'],
-            'fabric': ['fabric', 'cloth', 'textile', 'cotton', 'silk', 'wool'],
-            'natural_fiber': ['basket', 'wicker', 'bamboo', 'reed', 'straw']
-        }
-        
-        for class_name, _ in predictions[:5]:
-            class_lower = class_name.lower()
-            for material, keywords in material_keywords.items():
-                if any(keyword in class_lower for keyword in keywords):
-                    materials.add(material)
-        
-        return list(materials) if materials else ['traditional_materials']
+    def _map_to_craft_type(self, top_indices: torch.Tensor) -> str:
+        return self.taxonomy.craft_type(top_indices)
+    
+    def _detect_materials(self, top_indices: torch.Tensor) -> List[str]:
+        return self.taxonomy.detected_materials(top_indices)
     
     def _estimate_region(self, craft_type: str) -> str:
-        region_map = {
-            'pottery': 'South Asia',
-            'textile': 'South Asia',
-            'woodwork': 'Southeast Asia',
-            'metalwork': 'Middle East',
-            'basketry': 'Southeast Asia',
-            'jewelry': 'South Asia',
-            'painting': 'East Asia',
-            'sculpture': 'South Asia'
-        }
-        
-        return region_map.get(craft_type, 'Unknown')
+        return self.taxonomy.region(craft_type)
     
-    def classify_image(self, image_path: str) -> Dict[str, Any]:
-        image = Image.open(image_path).convert('RGB')
-        input_tensor = self.preprocess(image)
-        input_batch = input_tensor.unsqueeze(0)  # Add batch dimension
+    def load_image(self, image_source: ImageSource) -> Image.Image:
+        # Accepts a filesystem path or the raw encoded image bytes
+        return decode_image(
+            image_source,
+            target_size=256,
+            max_pixels=self.max_decode_pixels,
+            reduced=self.reduced_decode
+        )
+    
+    def _forward(self, model, input_batch: torch.Tensor) -> torch.Tensor:
+        return self._forward_with_features(model, input_batch)[0]
+    
+    def _run_model(self, model, input_batch: torch.Tensor):
+        # Raw model output; bf16 weights run under CPU autocast
+        if self.channels_last:
+            input_batch = input_batch.contiguous(memory_format=torch.channels_last)
+        with torch.no_grad(), torch.autocast('cpu', dtype=torch.bfloat16, enabled=self.autocast):
+            return model(input_batch)
+    
+    def _forward_with_features(self, model, input_batch: torch.Tensor) -> tuple:
+        # Returns (probabilities, features); features is None for models
+        # that only return logits (cascade backbones).
+        output = self._run_model(model, input_batch)
         
-        with torch.no_grad():
-            output = self.model(input_batch)
+        features = None
+        if isinstance(output, tuple):
+            output, features = output
+        return torch.nn.functional.softmax(output.float(), dim=1), features
+    
+    def predict_batch(self, input_batch: torch.Tensor) -> torch.Tensor:
+        return self._forward(self.model, input_batch)
+    
+    def predict_batch_with_embeddings(self, input_batch: torch.Tensor) -> tuple:
+        # Returns (probabilities, L2-normalised float32 embeddings [N, 2048])
+        probabilities, features = self._forward_with_features(self.model, input_batch)
+        embeddings = torch.nn.functional.normalize(features.float(), dim=1)
+        return probabilities, embeddings
+    
+    def _predict_cascade(self, input_batch: torch.Tensor) -> tuple:
+        # Returns (probabilities, escalated) where escalated[i] is True when
+        # ResNet50 produced row i.
+        start = time.perf_counter()
+        probabilities = self._forward(self.cascade_model, input_batch)
+        craft_scores, _ = self.taxonomy.aggregate(probabilities)
+        top2_scores = torch.topk(craft_scores, 2, dim=1).values
+        escalated = (top2_scores[:, 0] - top2_scores[:, 1]) < self.cascade_threshold
+        stage1_seconds = time.perf_counter() - start
         
-        probabilities = torch.nn.functional.softmax(output[0], dim=0)
+        stage2_seconds = 0.0
+        if escalated.any():
+            start = time.perf_counter()
+            probabilities[escalated] = self.predict_batch(input_batch[escalated])
+            stage2_seconds = time.perf_counter() - start
         
-        top5_prob, top5_indices = torch.topk(probabilities, 5)
-        predictions = [
-            (self.class_labels[idx], prob.item())
-            for idx, prob in zip(top5_indices, top5_prob)
-        ]
+        num_escalated = int(escalated.sum())
+        with self._cascade_lock:
+            self._cascade_counters["images"] += len(input_batch)
+            self._cascade_counters["stage1_answered"] += len(input_batch) - num_escalated
+            self._cascade_counters["stage2_escalated"] += num_escalated
+            self._cascade_counters["stage1_seconds"] += stage1_seconds
+            self._cascade_counters["stage2_seconds"] += stage2_seconds
         
-        craft_type = self._map_to_craft_type(predictions)
-        materials = self._detect_materials(predictions)
+        return probabilities, escalated.tolist()
+    
+    def cascade_stats(self) -> Optional[Dict[str, Any]]:
+        if self.cascade_model is None:
+            return None
+        with self._cascade_lock:
+            counters = dict(self._cascade_counters)
+        images = counters["images"]
+        escalated = counters["stage2_escalated"]
+        return {
+            "stage1_model": self.cascade_backbone,
+            "stage2_model": "resnet50",
+            "threshold": self.cascade_threshold,
+            "images": images,
+            "stage1_answered": counters["stage1_answered"],
+            "stage2_escalated": escalated,
+            "stage1_hit_rate": round(counters["stage1_answered"] / images, 4) if images else 0.0,
+            # Stage 1 runs on every image, stage 2 only on escalated ones
+            "stage1_ms_per_image": round(counters["stage1_seconds"] * 1000.0 / images, 2) if images else 0.0,
+            "stage2_ms_per_image": round(counters["stage2_seconds"] * 1000.0 / escalated, 2) if escalated else 0.0
+        }
+    
+    def _build_result(self, top_prob: torch.Tensor, top_indices: torch.Tensor) -> Dict[str, Any]:
+        craft_type = self._map_to_craft_type(top_indices)
+        materials = self._detect_materials(top_indices)
         region = self._estimate_region(craft_type)
-        confidence = predictions[0][1]  # Top prediction confidence
+        confidence = top_prob[0].item()  # Top prediction confidence
         
         return {
             "craft_type": craft_type,
@@ -120,8 +371,333 @@ class CraftImageClassifier:
                 "generated_at": get_timestamp()
             }
         }
+    
+    def _build_aggregated_result(
+        self,
+        top_prob: torch.Tensor,
+        craft_scores: torch.Tensor,
+        material_scores: torch.Tensor
+    ) -> Dict[str, Any]:
+        ranked_crafts = self.taxonomy.ranked_crafts(craft_scores)
+        best_craft, best_score = ranked_crafts[0]
+        craft_type = best_craft if best_score >= self.craft_min_score else self.taxonomy.default_craft
+        
+        return {
+            "craft_type": craft_type,
+            "materials_detected": self.taxonomy.scored_materials(material_scores, self.material_min_score),
+            "possible_region": self._estimate_region(craft_type),
+            "confidence": round(top_prob[0].item(), 2),
+            "craft_scores": {craft: round(score, 4) for craft, score in ranked_crafts},
+            "meta": {
+                "model": "resnet50",
+                "generated_at": get_timestamp()
+            }
+        }
+    
+    def classify_batch(self, input_batch: torch.Tensor) -> List[Dict[str, Any]]:
+        if self.cascade_model is None:
+            probabilities = self.predict_batch(input_batch)
+            escalated = None
+        else:
+            probabilities, escalated = self._predict_cascade(input_batch)
+        
+        return self._build_results(probabilities, escalated)
+    
+    def classify_batch_timed(self, input_batch: torch.Tensor) -> tuple:
+        # classify_batch for benchmarks: returns (results, seconds per stage)
+        # with stages "forward", "softmax_topk" and "label_mapping". With a
+        # cascade, the softmax is part of "forward" (stage 1 needs it to
+        # decide which images to escalate).
+        timings = {}
+        escalated = None
+        
+        start = time.perf_counter()
+        if self.cascade_model is None:
+            output = self._run_model(self.model, input_batch)
+            if isinstance(output, tuple):
+                output = output[0]
+        else:
+            probabilities, escalated = self._predict_cascade(input_batch)
+        timings["forward"] = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        if self.cascade_model is None:
+            probabilities = torch.nn.functional.softmax(output.float(), dim=1)
+        top5 = torch.topk(probabilities, 5, dim=1)
+        timings["softmax_topk"] = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        results = self._build_results(probabilities, escalated, top5)
+        timings["label_mapping"] = time.perf_counter() - start
+        
+        return results, timings
+    
+    def classify_batch_with_embeddings(self, input_batch: torch.Tensor) -> tuple:
+        # Embeddings come from ResNet50, so this path skips the cascade.
+        probabilities, embeddings = self.predict_batch_with_embeddings(input_batch)
+        return self._build_results(probabilities), embeddings
+    
+    def _build_results(
+        self,
+        probabilities: torch.Tensor,
+        escalated: Optional[List[bool]] = None,
+        top5: Optional[tuple] = None
+    ) -> List[Dict[str, Any]]:
+        top5_prob, top5_indices = top5 if top5 is not None else torch.topk(probabilities, 5, dim=1)
+        
+        if self.aggregation == 'full':
+            craft_scores, material_scores = self.taxonomy.aggregate(probabilities)
+            results = [
+                self._build_aggregated_result(top5_prob[i], craft_scores[i], material_scores[i])
+                for i in range(len(probabilities))
+            ]
+        else:
+            results = [
+                self._build_result(top5_prob[i], top5_indices[i])
+                for i in range(len(probabilities))
+            ]
+        
+        if escalated is not None:
+            for result, was_escalated in zip(results, escalated):
+                result["meta"]["model"] = "resnet50" if was_escalated else self.cascade_backbone
+                result["meta"]["cascade_stage"] = 2 if was_escalated else 1
+        
+        return results
+    
+    def classify_image(self, image_path: str) -> Dict[str, Any]:
+        input_tensor = self.preprocess(self.load_image(image_path))
+        input_batch = input_tensor.unsqueeze(0)  # Add batch dimension
+        return self.classify_batch(input_batch)[0]
+
+_registry = ClassifierRegistry(CraftImageClassifier)
+
+def get_classifier() -> CraftImageClassifier:
+    return _registry.get()
+
+def is_classifier_loaded() -> bool:
+    if model_server_enabled():
+        return _server is not None
+    return _registry.is_loaded()
+
+def warmup_classifier():
+    if model_server_enabled():
+        return get_inference_server()
+    return _registry.warmup()
+
+def reload_classifier():
+    if model_server_enabled():
+        server = get_inference_server()
+        server.reload()
+        return server
+    return _registry.reload()
+
+def swap_classifier(classifier: CraftImageClassifier) -> Optional[CraftImageClassifier]:
+    return _registry.swap(classifier)
+
+_server = None
+_server_lock = threading.Lock()
 
-def classify_craft_image(image_path: str) -> Dict[str, Any]:
-    classifier = CraftImageClassifier()
-    return classifier.classify_image(image_path)
+# Shared-memory input buffers per inference process (batches in flight)
+INPUT_BUFFERS_PER_WORKER = 2
 
+def model_server_enabled() -> bool:
+    return os.getenv('VISION_MODEL_SERVER', 'false').lower() == 'true'
+
+def _inference_workers() -> int:
+    return int(os.getenv('VISION_INFERENCE_WORKERS', '1'))
+
+def get_inference_server():
+    # This web process's inference processes for VISION_MODEL_SERVER=true;
+    # see vision_ai/inference_server.py
+    global _server
+    if _server is None:
+        with _server_lock:
+            if _server is None:
+                from vision_ai.inference_server import InferenceServer, parse_core_sets
+                threads = os.getenv('VISION_INFERENCE_THREADS')
+                _server = InferenceServer(
+                    num_workers=_inference_workers(),
+                    threads_per_worker=int(threads) if threads else None,
+                    core_sets=parse_core_sets(os.getenv('VISION_INFERENCE_CORES')),
+                    max_batch_size=int(os.getenv('VISION_BATCH_MAX_SIZE', '16')),
+                    buffers_per_worker=INPUT_BUFFERS_PER_WORKER,
+                    max_restarts=int(os.getenv('VISION_INFERENCE_MAX_RESTARTS', '5'))
+                )
+    return _server
+
+def get_inference_backend():
+    # What runs the model: the in-process classifier, or the inference
+    # server in model-server mode. Both provide preprocess, load_image,
+    # model_version, classify_batch and classify_batch_with_embeddings.
+    if model_server_enabled():
+        return get_inference_server()
+    return get_classifier()
+
+def loaded_inference_backend():
+    # Like get_inference_backend, but None instead of loading a model
+    if model_server_enabled():
+        return _server
+    return get_classifier() if is_classifier_loaded() else None
+
+_scheduler: Optional[BatchScheduler] = None
+_scheduler_lock = threading.Lock()
+
+def get_batch_scheduler() -> Optional[BatchScheduler]:
+    # Micro-batching is on by default; VISION_BATCHING=false runs every
+    # request as its own batch-of-one forward pass.
+    global _scheduler
+    if os.getenv('VISION_BATCHING', 'true').lower() != 'true':
+        return None
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                # Keep every inference process busy in model-server mode
+                max_in_flight = (
+                    _inference_workers() * INPUT_BUFFERS_PER_WORKER if model_server_enabled() else 1
+                )
+                _scheduler = BatchScheduler(
+                    lambda input_batch: get_inference_backend().classify_batch(input_batch),
+                    max_batch_size=int(os.getenv('VISION_BATCH_MAX_SIZE', '16')),
+                    max_wait_ms=float(os.getenv('VISION_BATCH_MAX_WAIT_MS', '10')),
+                    max_in_flight=max_in_flight,
+                    max_queue=_pipeline_queue_size()
+                )
+    return _scheduler
+
+def _pipeline_queue_size() -> int:
+    return int(os.getenv('VISION_PIPELINE_QUEUE_SIZE', '64'))
+
+_pipeline: Optional[ClassificationPipeline] = None
+_pipeline_lock = threading.Lock()
+
+def get_pipeline() -> ClassificationPipeline:
+    # io -> decode -> inference stages; see vision_ai/pipeline.py
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                default_decode_workers = str(min(8, os.cpu_count() or 1))
+                _pipeline = ClassificationPipeline(
+                    _read_step,
+                    _decode_step,
+                    _infer_step,
+                    io_workers=int(os.getenv('VISION_IO_WORKERS', '4')),
+                    decode_workers=int(os.getenv('VISION_DECODE_WORKERS', default_decode_workers)),
+                    max_queue=_pipeline_queue_size()
+                )
+    return _pipeline
+
+def _read_step(image_source) -> tuple:
+    # image_source is a filesystem path or the uploaded image bytes.
+    # Returns (cached_result, None) or (None, decode payload).
+    classifier = get_inference_backend()
+    if isinstance(image_source, (bytes, bytearray, memoryview)):
+        image_bytes = image_source
+    else:
+        image_bytes = Path(image_source).read_bytes()
+    
+    cache = get_result_cache()
+    cache_key = None
+    if cache is not None:
+        cache_key = image_cache_key(image_bytes, classifier.model_version)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            cached["meta"]["cached"] = True
+            return cached, None
+    
+    return None, (classifier, image_bytes, cache_key)
+
+def _decode_step(payload: tuple) -> tuple:
+    # Returns (reused_result, None) or (None, (store_key, input_tensor)).
+    # store_key is passed to _store_result once the tensor is classified.
+    classifier, image_bytes, cache_key = payload
+    image = classifier.load_image(image_bytes)
+    
+    # Re-uploads with other bytes (crop, re-compression) reuse the result
+    # of a perceptually near-identical image
+    near_duplicates = get_near_duplicate_index()
+    image_hash = None
+    if near_duplicates is not None:
+        image_hash = near_duplicates.hash_image(image)
+        match = near_duplicates.lookup(image_hash, classifier.model_version)
+        if match is not None:
+            result, distance = match
+            # Stored as-is: the distance only describes this response
+            _store_result((cache_key, None, classifier.model_version), result)
+            result["meta"]["cached"] = True
+            result["meta"]["near_duplicate"] = True
+            result["meta"]["near_duplicate_distance"] = distance
+            return result, None
+    
+    input_tensor = classifier.preprocess(image)
+    return None, ((cache_key, image_hash, classifier.model_version), input_tensor)
+
+def _infer_step(payload: tuple) -> Future:
+    store_key, input_tensor = payload
+    scheduler = get_batch_scheduler()
+    if scheduler is None:
+        future: Future = Future()
+        result = get_inference_backend().classify_batch(input_tensor.unsqueeze(0))[0]
+        _store_result(store_key, result)
+        future.set_result(result)
+        return future
+    
+    # Blocks while the scheduler queue is full
+    future = scheduler.submit(input_tensor)
+    future.add_done_callback(
+        lambda done: _store_result(store_key, done.result()) if done.exception() is None else None
+    )
+    return future
+
+# Meta fields describing how one response was served; never stored
+_RESPONSE_META_FIELDS = ('cached', 'near_duplicate', 'near_duplicate_distance')
+
+def _store_result(store_key: tuple, result: Dict[str, Any]):
+    cache_key, image_hash, model_version = store_key
+    meta = result.get("meta")
+    if meta and any(field in meta for field in _RESPONSE_META_FIELDS):
+        result = dict(result, meta={
+            key: value for key, value in meta.items() if key not in _RESPONSE_META_FIELDS
+        })
+    cache = get_result_cache()
+    if cache is not None and cache_key is not None:
+        cache.set(cache_key, result)
+    near_duplicates = get_near_duplicate_index()
+    if near_duplicates is not None and image_hash is not None:
+        near_duplicates.add(image_hash, result, model_version)
+
+def classify_craft_image(image_source) -> Dict[str, Any]:
+    # image_source: filesystem path, or raw encoded image bytes
+    return get_pipeline().submit(image_source).result()
+
+def embed_craft_image(image_source) -> tuple:
+    # Returns (result, embedding) with embedding as a float32 numpy vector.
+    # Runs ResNet50 directly: the result cache and batch scheduler only
+    # carry classification results.
+    classifier = get_inference_backend()
+    input_tensor = classifier.preprocess(classifier.load_image(image_source))
+    results, embeddings = classifier.classify_batch_with_embeddings(input_tensor.unsqueeze(0))
+    return results[0], embeddings[0].numpy()
+
+def classify_craft_images(image_sources: List, names: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    # Every image goes through the same staged pipeline as single requests,
+    # so reads, decodes and forward passes overlap and share batches with
+    # concurrent traffic. Results keep input order; a failing image yields
+    # an inline error entry instead of failing the whole call. Sources are
+    # paths or image bytes; `names` labels the entries (defaults to the paths).
+    if names is None:
+        names = [
+            source if isinstance(source, str) else f"upload[{i}]"
+            for i, source in enumerate(image_sources)
+        ]
+    
+    pipeline = get_pipeline()
+    futures = [pipeline.submit(source) for source in image_sources]
+    
+    entries = []
+    for name, future in zip(names, futures):
+        try:
+            entries.append(success_entry(name, future.result()))
+        except Exception as e:
+            entries.append(error_entry(name, e))
+    return entries
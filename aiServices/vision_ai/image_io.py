@@ -0,0 +1,98 @@
+"""
+Image decoding for the vision pipeline.
+
+Phone photos are 12-48 MP while the model only sees 224x224, so decoding at
+full resolution wastes most of the time and memory of a request. JPEGs are
+decoded with PIL draft mode, which lets libjpeg scale by 1/2, 1/4 or 1/8
+during the DCT so the full-size bitmap never exists; other formats are
+box-reduced right after decoding, before any colour conversion. The result
+keeps its shorter side at or above `target_size`, so the Resize/CenterCrop
+preprocessing that follows is unchanged.
+"""
+
+import io
+from typing import Union
+
+from PIL import Image
+
+# Large enough for any phone camera after draft scaling, small enough to stop
+# decompression bombs before they allocate gigabytes.
+DEFAULT_MAX_PIXELS = 64_000_000
+
+ImageSource = Union[str, bytes, bytearray, memoryview, io.IOBase]
+
+IMAGE_SUFFIXES = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
+
+# Modes Image.reduce averages correctly; palette, 1-bit and 16-bit images
+# are converted to RGB before reducing (averaging palette indices is wrong)
+_REDUCIBLE_MODES = ('L', 'LA', 'RGB', 'RGBA', 'RGBX', 'CMYK', 'YCbCr', 'I', 'F')
+
+
+class ImageTooLargeError(ValueError):
+    pass
+
+
+class InvalidImageError(ValueError):
+    # The bytes are not an image PIL can decode (unknown format, truncated
+    # or corrupt data); missing files still raise FileNotFoundError
+    pass
+
+
+def decode_image(
+    image_source: ImageSource,
+    target_size: int = 256,
+    max_pixels: int = DEFAULT_MAX_PIXELS,
+    reduced: bool = True
+) -> Image.Image:
+    if isinstance(image_source, (bytes, bytearray, memoryview)):
+        image_source = io.BytesIO(image_source)
+
+    try:
+        image = Image.open(image_source)
+    except (FileNotFoundError, PermissionError, IsADirectoryError):
+        raise
+    except (OSError, SyntaxError) as e:
+        # UnidentifiedImageError, or a header PIL could not parse
+        raise InvalidImageError(f"Cannot decode image: {e}") from e
+
+    if not reduced:
+        width, height = image.size
+        if width * height > max_pixels:
+            raise ImageTooLargeError(
+                f"Image is {width}x{height}, larger than the {max_pixels} pixel limit"
+            )
+        return _load(image).convert('RGB')
+
+    if image.format == 'JPEG':
+        # Picks the largest libjpeg scale that keeps both sides >= target
+        image.draft('RGB', (target_size, target_size))
+
+    width, height = image.size
+    if width * height > max_pixels:
+        raise ImageTooLargeError(
+            f"Image is {width}x{height}, larger than the {max_pixels} pixel limit"
+        )
+
+    _load(image)
+
+    # Non-JPEG formats (and JPEGs that are still much larger than needed)
+    # get a cheap integer box reduction; keep 2x headroom over the target so
+    # the antialiased Resize in preprocessing still sees enough detail.
+    factor = min(image.size) // (target_size * 2)
+    if factor >= 2:
+        if image.mode not in _REDUCIBLE_MODES:
+            image = image.convert('RGB')
+        image = image.reduce(factor)
+
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return image
+
+
+def _load(image: Image.Image) -> Image.Image:
+    # Image.open only reads the header; corrupt pixel data fails here
+    try:
+        image.load()
+    except (OSError, SyntaxError) as e:
+        raise InvalidImageError(f"Cannot decode image: {e}") from e
+    return image
@@ -0,0 +1,447 @@
+"""
+Dedicated inference processes for the vision classifier.
+
+With VISION_MODEL_SERVER=true the web process never loads a model. It only
+decodes and preprocesses images; stacked batches are handed to one or more
+inference child processes, each owning its own classifier, torch intra-op
+thread pool and (optionally) a pinned set of cores, so the web server, the
+GIL and torch no longer compete for the same CPUs. The inference processes
+belong to the web process that started them: with several web processes
+(e.g. gunicorn workers) each one starts its own, so size
+VISION_INFERENCE_WORKERS and the core sets per web process.
+
+Handoff goes through shared memory: every worker gets a few pre-allocated
+input buffers of [max_batch_size, 3, 224, 224] floats. The web process
+copies a batch into a free buffer and sends only (request id, buffer slot,
+batch size) over the queue; the worker runs the model on a view of that
+buffer. Results (small dicts) come back pickled; embedding tensors come back
+through torch's shared-memory tensor reduction.
+
+Batches are dispatched to the worker with the fewest requests in flight. A
+worker that dies fails only its own in-flight requests and is restarted. A
+restart that fails to load the model is retried with exponential backoff,
+up to `max_restarts` consecutive failures; after that the worker stays down
+(the others keep serving) until `reload()` starts it again.
+"""
+
+import itertools
+import os
+import pickle
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import torch
+import torch.multiprocessing as torch_mp
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from vision_ai.image_classifier import build_preprocess
+from vision_ai.image_io import DEFAULT_MAX_PIXELS, ImageSource, decode_image
+
+INPUT_SHAPE = (3, 224, 224)
+
+# Delay before the n-th consecutive restart: base * 2 ** (n - 1), capped
+MAX_RESTART_BACKOFF_SECONDS = 60.0
+
+
+def parse_core_sets(spec: Optional[str]) -> List[List[int]]:
+    # "0-3;4-7" -> [[0, 1, 2, 3], [4, 5, 6, 7]]; one set per worker
+    core_sets = []
+    for group in (spec or '').split(';'):
+        cores = []
+        for part in group.split(','):
+            part = part.strip()
+            if not part:
+                continue
+            if '-' in part:
+                first, last = part.split('-', 1)
+                cores.extend(range(int(first), int(last) + 1))
+            else:
+                cores.append(int(part))
+        if cores:
+            core_sets.append(cores)
+    return core_sets
+
+
+def _worker_main(
+    worker_index: int,
+    requests,
+    responses,
+    input_buffers: torch.Tensor,
+    num_threads: int,
+    cores: Optional[List[int]]
+):
+    # The worker owns a normal in-process classifier
+    os.environ['VISION_MODEL_SERVER'] = 'false'
+    from vision_ai.image_classifier import get_classifier, reload_classifier
+
+    try:
+        if cores:
+            os.sched_setaffinity(0, cores)
+        torch.set_num_threads(num_threads)
+        classifier = get_classifier()
+        classifier.warmup()
+    except Exception as e:
+        responses.put((worker_index, None, 'failed', f"{type(e).__name__}: {e}"))
+        return
+    responses.put((worker_index, None, 'ready', (classifier.model_version, classifier.load_report)))
+
+    while True:
+        message = requests.get()
+        if message is None:
+            break
+        request_id, op, slot, count, tensor = message
+
+        try:
+            if op == 'reload':
+                classifier = reload_classifier()
+                payload = (classifier.model_version, classifier.load_report)
+            else:
+                input_batch = input_buffers[slot, :count] if slot is not None else tensor
+                if op == 'embed':
+                    payload = classifier.classify_batch_with_embeddings(input_batch)
+                else:
+                    payload = classifier.classify_batch(input_batch)
+            responses.put((worker_index, request_id, 'ok', payload))
+        except Exception as e:
+            try:
+                pickle.dumps(e)
+            except Exception:
+                e = RuntimeError(f"{type(e).__name__}: {e}")
+            responses.put((worker_index, request_id, 'error', e))
+
+
+class _Worker:
+
+    def __init__(self, index: int, input_buffers: torch.Tensor, num_threads: int, cores):
+        self.index = index
+        self.input_buffers = input_buffers
+        self.num_threads = num_threads
+        self.cores = cores
+        self.process = None
+        self.requests = None
+        self.ready = False
+        # starting -> ready; a failed start -> backoff (restarted at
+        # retry_at) or, past max_restarts, failed until reload()
+        self.state = 'starting'
+        self.failures = 0
+        self.retry_at = 0.0
+        self.last_error: Optional[str] = None
+        self.free_slots = list(range(len(input_buffers)))
+        # request id -> (future, slot, input tensor kept alive until answered)
+        self.pending: Dict[int, tuple] = {}
+        self.batches = 0
+        self.restarts = 0
+        self.load_report = None
+
+
+class InferenceServer:
+
+    def __init__(
+        self,
+        num_workers: int = 1,
+        threads_per_worker: Optional[int] = None,
+        core_sets: Optional[List[List[int]]] = None,
+        max_batch_size: int = 16,
+        buffers_per_worker: int = 2,
+        start_timeout: float = 600.0,
+        max_restarts: int = 5,
+        restart_backoff: float = 1.0
+    ):
+        if num_workers < 1:
+            raise ValueError("num_workers must be at least 1")
+
+        # Same decode/preprocess settings as CraftImageClassifier
+        self.preprocess = build_preprocess()
+        self.reduced_decode = os.getenv('VISION_REDUCED_DECODE', 'true').lower() == 'true'
+        self.max_decode_pixels = int(os.getenv('VISION_MAX_DECODE_PIXELS', str(DEFAULT_MAX_PIXELS)))
+
+        self.max_batch_size = max_batch_size
+        self.start_timeout = start_timeout
+        self.max_restarts = max_restarts
+        self.restart_backoff = restart_backoff
+        self.model_version: Optional[str] = None
+
+        self._context = torch_mp.get_context('spawn')
+        self._responses = self._context.Queue()
+        self._request_ids = itertools.count()
+        self._cond = threading.Condition()
+        self._closed = False
+        # Until every worker first loads, a failed start fails the constructor
+        self._started = False
+
+        core_sets = core_sets or []
+        self._workers = []
+        for index in range(num_workers):
+            cores = core_sets[index % len(core_sets)] if core_sets else None
+            if threads_per_worker:
+                num_threads = threads_per_worker
+            elif cores:
+                num_threads = len(cores)
+            else:
+                num_threads = max(1, (os.cpu_count() or 1) // num_workers)
+            input_buffers = torch.zeros(buffers_per_worker, max_batch_size, *INPUT_SHAPE).share_memory_()
+            self._workers.append(_Worker(index, input_buffers, num_threads, cores))
+
+        for worker in self._workers:
+            self._start_worker(worker)
+
+        self._dispatcher = threading.Thread(
+            target=self._dispatch_responses, name="vision-inference-responses", daemon=True
+        )
+        self._dispatcher.start()
+
+        try:
+            self._wait_ready(self._workers)
+        except RuntimeError:
+            self.close()
+            raise
+        with self._cond:
+            self._started = True
+
+    def _wait_ready(self, workers: List[_Worker]):
+        # Raises if a worker's start fails or takes longer than start_timeout
+        deadline = time.monotonic() + self.start_timeout
+        with self._cond:
+            while not all(worker.ready for worker in workers):
+                failed = [worker for worker in workers if worker.state in ('backoff', 'failed')]
+                if failed:
+                    raise RuntimeError(
+                        f"Inference worker {failed[0].index} failed to start: {failed[0].last_error}"
+                    )
+                remaining = deadline - time.monotonic()
+                if self._closed or remaining <= 0:
+                    raise RuntimeError("Inference workers failed to start: timed out")
+                self._cond.wait(min(remaining, 1.0))
+
+    def _start_worker(self, worker: _Worker):
+        # Caller holds self._cond, except in the constructor
+        worker.ready = False
+        worker.state = 'starting'
+        worker.requests = self._context.Queue()
+        worker.process = self._context.Process(
+            target=_worker_main,
+            args=(worker.index, worker.requests, self._responses,
+                  worker.input_buffers, worker.num_threads, worker.cores),
+            name=f"vision-inference-{worker.index}",
+            daemon=True
+        )
+        worker.process.start()
+
+    def load_image(self, image_source: ImageSource):
+        return decode_image(
+            image_source,
+            target_size=256,
+            max_pixels=self.max_decode_pixels,
+            reduced=self.reduced_decode
+        )
+
+    def _submit(self, op: str, input_batch: Optional[torch.Tensor] = None, worker: Optional[_Worker] = None) -> Future:
+        count = len(input_batch) if input_batch is not None else 0
+        uses_buffer = input_batch is not None and count <= self.max_batch_size
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Inference server is closed")
+                if worker is not None:
+                    if worker.state == 'failed':
+                        raise RuntimeError(f"Inference worker {worker.index} is down: {worker.last_error}")
+                    candidates = [worker] if worker.ready else []
+                else:
+                    if all(w.state == 'failed' for w in self._workers):
+                        raise RuntimeError(
+                            f"All inference workers are down: {self._workers[0].last_error}; "
+                            "POST /ai/classifier/reload to restart them"
+                        )
+                    candidates = [
+                        w for w in self._workers
+                        if w.ready and (w.free_slots or not uses_buffer)
+                    ]
+                if candidates:
+                    break
+                self._cond.wait()
+
+            target = min(candidates, key=lambda w: len(w.pending))
+            slot = target.free_slots.pop() if uses_buffer else None
+            request_id = next(self._request_ids)
+            future: Future = Future()
+            target.pending[request_id] = (future, slot, input_batch)
+            target.batches += 1
+
+        if slot is not None:
+            target.input_buffers[slot, :count].copy_(input_batch)
+            message = (request_id, op, slot, count, None)
+        else:
+            # Larger than the shared buffers: torch moves the tensor's
+            # storage to shared memory while pickling it.
+            message = (request_id, op, None, count, input_batch)
+        target.requests.put(message)
+        return future
+
+    def classify_batch(self, input_batch: torch.Tensor) -> List[Dict[str, Any]]:
+        return self._submit('classify', input_batch).result()
+
+    def classify_batch_with_embeddings(self, input_batch: torch.Tensor) -> tuple:
+        results, embeddings = self._submit('embed', input_batch).result()
+        return results, embeddings.clone()
+
+    def reload(self) -> str:
+        # One worker at a time, so the others keep serving. A worker that
+        # is down (waiting to restart, or given up) is started afresh, which
+        # loads the current model.
+        for worker in self._workers:
+            with self._cond:
+                revive = worker.state in ('backoff', 'failed')
+                if revive:
+                    worker.failures = 0
+                    worker.restarts += 1
+                    print(f"🔄 Restarting inference worker {worker.index} for reload")
+                    self._start_worker(worker)
+            if revive:
+                self._wait_ready([worker])
+                continue
+            model_version, load_report = self._submit('reload', worker=worker).result()
+            worker.load_report = load_report
+            self.model_version = model_version
+        return self.model_version
+
+    def _dispatch_responses(self):
+        last_check = time.monotonic()
+        while not self._closed:
+            # Other workers' responses must not delay noticing a dead one
+            if time.monotonic() - last_check >= 1.0:
+                self._check_workers()
+                last_check = time.monotonic()
+            try:
+                worker_index, request_id, status, payload = self._responses.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+
+            worker = self._workers[worker_index]
+            with self._cond:
+                if status == 'ready':
+                    worker.ready = True
+                    worker.state = 'ready'
+                    worker.failures = 0
+                    self.model_version, worker.load_report = payload
+                    self._cond.notify_all()
+                    continue
+                if status == 'failed':
+                    if worker.state == 'starting':
+                        self._start_failed(worker, payload)
+                    else:
+                        # Exit already noticed by _check_workers
+                        worker.last_error = payload
+                    continue
+                future, slot, _ = worker.pending.pop(request_id, (None, None, None))
+                if slot is not None:
+                    worker.free_slots.append(slot)
+                self._cond.notify_all()
+
+            if future is None:
+                continue
+            if status == 'ok':
+                future.set_result(payload)
+            else:
+                future.set_exception(payload)
+
+    def _check_workers(self):
+        for worker in self._workers:
+            failed = []
+            with self._cond:
+                if self._closed:
+                    return
+                if worker.state == 'backoff':
+                    if time.monotonic() >= worker.retry_at:
+                        worker.restarts += 1
+                        print(f"🔄 Restarting inference worker {worker.index} "
+                              f"(attempt {worker.failures + 1} of {self.max_restarts + 1})")
+                        self._start_worker(worker)
+                    continue
+                if worker.state == 'failed' or worker.process.is_alive():
+                    continue
+                if worker.state == 'starting':
+                    self._start_failed(
+                        worker, worker.last_error or f"exited with code {worker.process.exitcode} while loading"
+                    )
+                    continue
+                # A serving worker died: its batches fail, it restarts now
+                failed = list(worker.pending.values())
+                worker.pending.clear()
+                worker.free_slots = list(range(len(worker.input_buffers)))
+                worker.restarts += 1
+                print(f"⚠️  Inference worker {worker.index} exited "
+                      f"(code {worker.process.exitcode}); restarting")
+                self._start_worker(worker)
+            for future, _, _ in failed:
+                future.set_exception(RuntimeError(f"Inference worker {worker.index} exited"))
+
+    def _start_failed(self, worker: _Worker, error: str):
+        # Caller holds self._cond
+        worker.ready = False
+        worker.last_error = error
+        worker.failures += 1
+        if not self._started or worker.failures > self.max_restarts:
+            worker.state = 'failed'
+            print(f"❌ Inference worker {worker.index} failed to load: {error}; giving up until reload")
+        else:
+            delay = min(self.restart_backoff * 2 ** (worker.failures - 1), MAX_RESTART_BACKOFF_SECONDS)
+            worker.state = 'backoff'
+            worker.retry_at = time.monotonic() + delay
+            print(f"⚠️  Inference worker {worker.index} failed to load: {error}; retrying in {delay:.0f}s")
+        self._cond.notify_all()
+
+    def cascade_stats(self) -> Optional[Dict[str, Any]]:
+        # Cascade counters live in the worker processes
+        return None
+
+    @property
+    def load_report(self) -> Dict[str, Any]:
+        return {f"worker_{worker.index}": worker.load_report for worker in self._workers}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "workers": [
+                    {
+                        "pid": worker.process.pid,
+                        "alive": worker.process.is_alive(),
+                        "ready": worker.ready,
+                        "state": worker.state,
+                        "consecutive_failures": worker.failures,
+                        "last_error": worker.last_error,
+                        "restart_in_seconds": (
+                            round(max(0.0, worker.retry_at - time.monotonic()), 1)
+                            if worker.state == 'backoff' else None
+                        ),
+                        "threads": worker.num_threads,
+                        "cores": worker.cores,
+                        "in_flight": len(worker.pending),
+                        "batches": worker.batches,
+                        "restarts": worker.restarts
+                    }
+                    for worker in self._workers
+                ],
+                "max_batch_size": self.max_batch_size,
+                "max_restarts": self.max_restarts
+            }
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for worker in self._workers:
+            if worker.process is not None and worker.process.is_alive():
+                worker.requests.put(None)
+        for worker in self._workers:
+            if worker.process is not None:
+                worker.process.join(timeout=5.0)
+                if worker.process.is_alive():
+                    worker.process.terminate()
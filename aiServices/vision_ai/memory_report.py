@@ -0,0 +1,132 @@
+"""
+Memory accounting for loaded classifiers.
+
+Reported at startup next to process RSS (see weight_store.process_memory):
+
+    parameters_mb        bytes held by the model's weights: parameters and
+                         buffers, or the serialized state_dict for quantized
+                         models whose packed weights are neither
+    activation_peak_mb   peak bytes of live intermediate tensors during one
+                         forward pass, per batch size
+
+Activation peaks are measured by watching every tensor the forward pass
+allocates through the PyTorch dispatcher and tracking how many are alive
+at once. Graphs that run outside the dispatcher (TorchScript, torch.compile)
+cannot be measured this way and report None, with the reason logged. Each measurement runs real
+forward passes, so results are kept per process and configuration: reloads
+with the same settings reuse them.
+"""
+
+import io
+import threading
+import weakref
+from typing import Callable, Dict, Hashable, Iterable, Optional
+
+import torch
+from torch.utils._python_dispatch import TorchDispatchMode
+from torch.utils._pytree import tree_flatten
+
+
+# (configuration, batch size) -> measured activation peak bytes
+_activation_peaks: Dict[tuple, Optional[int]] = {}
+_activation_peaks_lock = threading.Lock()
+
+
+def _megabytes(num_bytes: int) -> float:
+    return round(num_bytes / (1024.0 * 1024.0), 1)
+
+
+def parameter_bytes(model: torch.nn.Module) -> Optional[int]:
+    # None when the weights are not visible at all (frozen TorchScript
+    # inlines them into the graph as constants)
+    state = model.state_dict()
+    if not state:
+        return None
+    tensors = dict(model.named_parameters())
+    tensors.update(model.named_buffers())
+    if all(name in tensors for name in state):
+        return sum(tensor.numel() * tensor.element_size() for tensor in tensors.values())
+    # Quantized layers keep packed weights outside parameters() and
+    # buffers(); their serialized size is what they hold in memory
+    serialized = io.BytesIO()
+    torch.save(state, serialized)
+    return serialized.tell()
+
+
+class _ActivationTracker(TorchDispatchMode):
+    # Counts storage bytes of every op output until the last tensor using
+    # that storage is garbage collected. In-place ops and views return
+    # tensors sharing a storage, which is only counted once.
+
+    def __init__(self):
+        super().__init__()
+        self._live: Dict[int, list] = {}  # storage ptr -> [bytes, references]
+        self.current = 0
+        self.peak = 0
+
+    def _release(self, ptr: int):
+        entry = self._live.get(ptr)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] == 0:
+            self.current -= entry[0]
+            del self._live[ptr]
+
+    def __torch_dispatch__(self, func, types, args=(), kwargs=None):
+        output = func(*args, **(kwargs or {}))
+        for tensor in tree_flatten(output)[0]:
+            if not isinstance(tensor, torch.Tensor):
+                continue
+            storage = tensor.untyped_storage()
+            ptr = storage.data_ptr()
+            entry = self._live.get(ptr)
+            if entry is not None:
+                entry[1] += 1
+            else:
+                self._live[ptr] = [storage.nbytes(), 1]
+                self.current += storage.nbytes()
+                self.peak = max(self.peak, self.current)
+            weakref.finalize(tensor, self._release, ptr)
+        return output
+
+
+def activation_peak_bytes(forward: Callable[[torch.Tensor], object], batch_size: int) -> Optional[int]:
+    # Runs forward once on a zero batch; None if it cannot be measured.
+    # Ops that cannot run under a Python dispatch mode (the TorchScript
+    # interpreter, some backend kernels) raise RuntimeError, which includes
+    # NotImplementedError; anything else is a real bug and propagates.
+    input_batch = torch.zeros(batch_size, 3, 224, 224)
+    tracker = _ActivationTracker()
+    try:
+        with torch.no_grad(), tracker:
+            forward(input_batch)
+    except RuntimeError as e:
+        reason = next((line.strip() for line in str(e).splitlines() if line.strip()), type(e).__name__)
+        print(f"⚠️  Activation peak for batch size {batch_size} not measured: {reason}")
+        return None
+    return tracker.peak
+
+
+def model_memory_report(
+    model: torch.nn.Module,
+    forward: Optional[Callable[[torch.Tensor], object]],
+    batch_sizes: Iterable[int],
+    config: Hashable = None
+) -> Dict[str, object]:
+    # config identifies what the activation peak depends on (inference
+    # mode, memory format); a peak already measured for it is reused
+    params = parameter_bytes(model)
+    activations = {}
+    for batch_size in batch_sizes:
+        peak = None
+        if forward is not None:
+            with _activation_peaks_lock:
+                if config is None or (config, batch_size) not in _activation_peaks:
+                    _activation_peaks[(config, batch_size)] = activation_peak_bytes(forward, batch_size)
+                peak = _activation_peaks[(config, batch_size)]
+        activations[str(batch_size)] = _megabytes(peak) if peak is not None else None
+    return {
+        "parameters_mb": _megabytes(params) if params is not None else None,
+        "activation_peak_mb": activations
+    }
@@ -0,0 +1,53 @@
+"""
+Process-wide registry for the vision classifier.
+
+Keeps a single warm classifier per process so requests never reload model
+weights. The instance is created lazily on first use; reload/swap replace it
+atomically, and in-flight requests finish on the instance they started with.
+"""
+
+import threading
+from typing import Any, Callable, Optional
+
+
+class ClassifierRegistry:
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+
+    def get(self) -> Any:
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = self._factory()
+                instance = self._instance
+        return instance
+
+    def is_loaded(self) -> bool:
+        return self._instance is not None
+
+    def warmup(self) -> Any:
+        classifier = self.get()
+        classifier.warmup()
+        return classifier
+
+    def reload(self, factory: Optional[Callable[[], Any]] = None, warmup: bool = True) -> Any:
+        # Build (and warm) the replacement outside the swap lock so requests
+        # keep being served by the current instance while the new one loads.
+        with self._reload_lock:
+            if factory is not None:
+                self._factory = factory
+            classifier = self._factory()
+            if warmup:
+                classifier.warmup()
+            self.swap(classifier)
+            return classifier
+
+    def swap(self, classifier: Any) -> Optional[Any]:
+        with self._lock:
+            previous, self._instance = self._instance, classifier
+        return previous
@@ -0,0 +1,220 @@
+"""
+Near-duplicate detection for classification results.
+
+Re-uploads of the same piece (another crop, JPEG re-compression, slightly
+different lighting) have different bytes, so the exact-hash result cache
+misses them. Each decoded image gets a 64-bit perceptual hash; hashes of
+classified images are kept in a BK-tree, and an image whose hash is within
+VISION_NEAR_DUP_DISTANCE bits of a known one reuses that image's result
+instead of running the model.
+
+Reuse is opt-in (VISION_NEAR_DUP=true): a different piece photographed the
+same way can hash within the distance and would silently get the other
+piece's classification. Reused results are marked `meta.near_duplicate`
+with the distance, so clients can tell.
+
+    phash  DCT of a 32x32 grayscale thumbnail, low 8x8 frequencies vs median;
+           robust to re-compression, resizing and brightness changes
+    dhash  sign of horizontal gradients on a 9x8 thumbnail; cheaper, a little
+           more sensitive to crops
+"""
+
+import copy
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import numpy as np
+from PIL import Image
+
+HASH_ALGORITHMS = ('phash', 'dhash')
+
+
+def _dct_matrix(size: int) -> np.ndarray:
+    # Orthonormal DCT-II basis, so dct(x) = M @ x @ M.T
+    k = np.arange(size)[:, None]
+    n = np.arange(size)[None, :]
+    matrix = np.cos(np.pi * (2 * n + 1) * k / (2 * size)) * np.sqrt(2.0 / size)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+_DCT_32 = _dct_matrix(32)
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    value = 0
+    for bit in bits.reshape(-1):
+        value = (value << 1) | int(bit)
+    return value
+
+
+def phash(image: Image.Image) -> int:
+    pixels = np.asarray(image.convert('L').resize((32, 32), Image.BILINEAR), dtype=np.float64)
+    low = (_DCT_32 @ pixels @ _DCT_32.T)[:8, :8].reshape(-1)
+    # The DC term only reflects overall brightness
+    return _bits_to_int(low > np.median(low[1:]))
+
+
+def dhash(image: Image.Image) -> int:
+    pixels = np.asarray(image.convert('L').resize((9, 8), Image.BILINEAR), dtype=np.int16)
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def perceptual_hash(image: Image.Image, algorithm: str = 'phash') -> int:
+    if algorithm == 'phash':
+        return phash(image)
+    if algorithm == 'dhash':
+        return dhash(image)
+    raise ValueError(f"Unknown perceptual hash: {algorithm}")
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    # Metric tree over Hamming distance: each child edge is labelled with
+    # its distance to the parent, so a radius-r query only descends edges
+    # in [d - r, d + r].
+
+    def __init__(self):
+        self._root = None  # [hash, item_id, {distance: child}]
+
+    def add(self, value: int, item_id: int):
+        node = [value, item_id, {}]
+        if self._root is None:
+            self._root = node
+            return
+        current = self._root
+        while True:
+            distance = hamming_distance(value, current[0])
+            child = current[2].get(distance)
+            if child is None:
+                current[2][distance] = node
+                return
+            current = child
+
+    def search(self, value: int, radius: int) -> list:
+        # Returns [(distance, item_id)] for every stored hash within radius
+        if self._root is None:
+            return []
+        matches = []
+        stack = [self._root]
+        while stack:
+            node_value, item_id, children = stack.pop()
+            distance = hamming_distance(value, node_value)
+            if distance <= radius:
+                matches.append((distance, item_id))
+            for edge, child in children.items():
+                if distance - radius <= edge <= distance + radius:
+                    stack.append(child)
+        return matches
+
+
+class NearDuplicateIndex:
+
+    def __init__(self, max_distance: int = 6, max_entries: int = 100_000, algorithm: str = 'phash'):
+        if algorithm not in HASH_ALGORITHMS:
+            raise ValueError(f"Unknown perceptual hash: {algorithm}")
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.algorithm = algorithm
+
+        self._tree = BKTree()
+        # item id -> (hash, result) in insertion order, for eviction
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._next_id = 0
+        self._dead_nodes = 0
+        self._model_version: Optional[str] = None
+        self._lock = threading.Lock()
+
+        self._lookups = 0
+        self._hits = 0
+        self._distance_total = 0
+
+    def hash_image(self, image: Image.Image) -> int:
+        return perceptual_hash(image, self.algorithm)
+
+    def lookup(self, image_hash: int, model_version: str) -> Optional[tuple]:
+        # Returns (result copy, distance) of the closest known image, if any
+        with self._lock:
+            self._lookups += 1
+            if model_version != self._model_version:
+                return None
+            matches = [
+                (distance, item_id) for distance, item_id in self._tree.search(image_hash, self.max_distance)
+                if item_id in self._entries
+            ]
+            if not matches:
+                return None
+            distance, item_id = min(matches)
+            self._hits += 1
+            self._distance_total += distance
+            result = self._entries[item_id][1]
+        return copy.deepcopy(result), distance
+
+    def add(self, image_hash: int, result: Dict[str, Any], model_version: str):
+        result = copy.deepcopy(result)
+        with self._lock:
+            # Results from another model version are never reused
+            if model_version != self._model_version:
+                self._reset(model_version)
+
+            item_id = self._next_id
+            self._next_id += 1
+            self._entries[item_id] = (image_hash, result)
+            self._tree.add(image_hash, item_id)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._dead_nodes += 1
+            # Evicted ids stay in the tree until it is rebuilt
+            if self._dead_nodes > len(self._entries):
+                self._rebuild()
+
+    def _reset(self, model_version: str):
+        self._tree = BKTree()
+        self._entries.clear()
+        self._dead_nodes = 0
+        self._model_version = model_version
+
+    def _rebuild(self):
+        self._tree = BKTree()
+        for item_id, (image_hash, _) in self._entries.items():
+            self._tree.add(image_hash, item_id)
+        self._dead_nodes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "algorithm": self.algorithm,
+                "max_distance": self.max_distance,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "lookups": self._lookups,
+                "reused": self._hits,
+                "reuse_rate": round(self._hits / self._lookups, 4) if self._lookups else 0.0,
+                "average_distance": round(self._distance_total / self._hits, 2) if self._hits else None
+            }
+
+
+_index: Optional[NearDuplicateIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_near_duplicate_index() -> Optional[NearDuplicateIndex]:
+    # VISION_NEAR_DUP=true enables reuse; VISION_NEAR_DUP_DISTANCE is the
+    # largest Hamming distance (out of 64 bits) treated as the same image.
+    global _index
+    if os.getenv('VISION_NEAR_DUP', 'false').lower() != 'true':
+        return None
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = NearDuplicateIndex(
+                    max_distance=int(os.getenv('VISION_NEAR_DUP_DISTANCE', '6')),
+                    max_entries=int(os.getenv('VISION_NEAR_DUP_MAX_ENTRIES', '100000')),
+                    algorithm=os.getenv('VISION_NEAR_DUP_HASH', 'phash').lower()
+                )
+    return _index
@@ -0,0 +1,150 @@
+"""
+Staged classification pipeline.
+
+Each image flows through three stages connected by bounded queues:
+
+    io         read the file (or take the uploaded bytes), exact cache lookup
+    decode     decode, near-duplicate lookup, preprocess to a tensor
+    inference  the BatchScheduler queue and forward pass
+
+Every stage has its own threads, so while one batch is in the forward pass
+other requests are being read and decoded. Queues are bounded: a full queue
+blocks the stage feeding it, and ultimately the request thread, instead of
+letting work pile up in memory.
+
+Per-stage stats show where time goes: a stage whose queue is full and whose
+wait time grows is the bottleneck. A stage's service time includes waiting
+for room in the next stage's queue.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+
+class PipelineStage:
+
+    def __init__(self, name: str, handler: Callable[[Any, Future], None], workers: int, max_queue: int):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.max_queue = max_queue
+
+        self._queue: "queue.Queue[tuple]" = queue.Queue(maxsize=max_queue)
+        self._threads = []
+        self._lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._processed = 0
+        self._busy = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._service_total = 0.0
+
+    def put(self, item: Any, future: Future):
+        # Blocks while the queue is full (backpressure)
+        self._ensure_workers()
+        self._queue.put((time.monotonic(), item, future))
+
+    def _ensure_workers(self):
+        if self._threads:
+            return
+        with self._lock:
+            if not self._threads:
+                for index in range(self.workers):
+                    thread = threading.Thread(
+                        target=self._run, name=f"vision-{self.name}-{index}", daemon=True
+                    )
+                    thread.start()
+                    self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            enqueued, item, future = self._queue.get()
+            started = time.monotonic()
+            with self._stats_lock:
+                self._busy += 1
+                wait = started - enqueued
+                self._wait_total += wait
+                self._wait_max = max(self._wait_max, wait)
+
+            try:
+                self.handler(item, future)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                with self._stats_lock:
+                    self._busy -= 1
+                    self._processed += 1
+                    self._service_total += time.monotonic() - started
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            processed = self._processed
+            return {
+                "workers": self.workers,
+                "busy": self._busy,
+                "queue_depth": self._queue.qsize(),
+                "max_queue": self.max_queue,
+                "processed": processed,
+                "average_wait_ms": round(self._wait_total * 1000.0 / processed, 3) if processed else 0.0,
+                "max_wait_ms": round(self._wait_max * 1000.0, 3),
+                "average_service_ms": round(self._service_total * 1000.0 / processed, 3) if processed else 0.0
+            }
+
+
+class ClassificationPipeline:
+    # read(source) and decode(payload) return (result, None) when the image
+    # is answered early (cache, near-duplicate) or (None, payload) to pass
+    # it on; infer(payload) returns a Future of the result.
+
+    def __init__(
+        self,
+        read: Callable[[Any], tuple],
+        decode: Callable[[Any], tuple],
+        infer: Callable[[Any], Future],
+        io_workers: int = 4,
+        decode_workers: int = 4,
+        max_queue: int = 64
+    ):
+        self._read = read
+        self._decode = decode
+        self._infer = infer
+        self.io_stage = PipelineStage("io", self._run_read, io_workers, max_queue)
+        self.decode_stage = PipelineStage("decode", self._run_decode, decode_workers, max_queue)
+
+    def submit(self, source: Any) -> Future:
+        future: Future = Future()
+        self.io_stage.put(source, future)
+        return future
+
+    def _run_read(self, source: Any, future: Future):
+        result, payload = self._read(source)
+        if result is not None:
+            future.set_result(result)
+        else:
+            self.decode_stage.put(payload, future)
+
+    def _run_decode(self, payload: Any, future: Future):
+        result, payload = self._decode(payload)
+        if result is not None:
+            future.set_result(result)
+            return
+        self._infer(payload).add_done_callback(lambda inference: _chain(inference, future))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"io": self.io_stage.stats(), "decode": self.decode_stage.stats()}
+
+
+def _chain(source: Future, target: Future):
+    error: Optional[BaseException] = source.exception()
+    if error is not None:
+        target.set_exception(error)
+    else:
+        target.set_result(source.result())
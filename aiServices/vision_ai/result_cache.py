@@ -0,0 +1,44 @@
+"""
+Content-addressed cache for image classification results.
+
+Results are keyed by a SHA-256 of the raw image bytes plus the classifier's
+model version, so the same photo is only run through the network once per
+model, no matter which path or upload it arrives from.
+"""
+
+import hashlib
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from shared.cache import TieredCache
+
+_cache: Optional[TieredCache] = None
+_cache_lock = threading.Lock()
+
+
+def image_cache_key(image_bytes: bytes, model_version: str) -> str:
+    return f"{model_version}:{hashlib.sha256(image_bytes).hexdigest()}"
+
+
+def get_result_cache() -> Optional[TieredCache]:
+    # VISION_CACHE_SIZE=0 disables caching; VISION_CACHE_DB adds a SQLite
+    # tier so results survive restarts.
+    global _cache
+    max_entries = int(os.getenv('VISION_CACHE_SIZE', '4096'))
+    if max_entries <= 0:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                max_disk_entries = os.getenv('VISION_CACHE_DB_MAX_ENTRIES')
+                _cache = TieredCache(
+                    max_entries=max_entries,
+                    db_path=os.getenv('VISION_CACHE_DB') or None,
+                    namespace="vision_classification",
+                    max_disk_entries=int(max_disk_entries) if max_disk_entries else None
+                )
+    return _cache
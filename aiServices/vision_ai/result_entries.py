@@ -0,0 +1,21 @@
+"""
+Per-image entries for bulk classification results.
+
+The /ai/classify_images route and the offline bulk_classify CLI report each
+image the same way: a success entry with the classification, or an inline
+error entry so one bad image does not fail the whole batch.
+"""
+
+from typing import Any, Dict
+
+
+def success_entry(image: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    return {"image": image, "status": "success", "data": result}
+
+
+def error_entry(image: str, error: Exception) -> Dict[str, Any]:
+    if isinstance(error, FileNotFoundError):
+        message = f"Image file not found: {error}"
+    else:
+        message = str(error)
+    return {"image": image, "status": "error", "message": message}
@@ -0,0 +1,526 @@
+"""
+Nearest-neighbour index over craft image embeddings.
+
+Embeddings are the L2-normalised 2048-d ResNet50 features, so the inner
+product is the cosine similarity. Two index types share one on-disk layout:
+
+    flat - exact search over every vector
+    ivf  - inverted file: vectors are clustered with spherical k-means and
+           stored sorted by cluster, so a query only scans the `nprobe`
+           clusters closest to it
+
+Directory layout:
+    meta.json      index type, dimension, IVF parameters
+    vectors.npy    float32 [n, dim]; loaded with mmap so it is shared by
+                   processes and never deserialised
+    items.json     [{"id": ..., **metadata}] for each row of vectors.npy
+    centroids.npy  (ivf) float32 [nlist, dim]
+    offsets.npy    (ivf) int64 [nlist + 1], cluster row ranges
+    pending.f32    vectors added since the last compaction (raw float32)
+    pending.jsonl  items added since the last compaction, one per line
+    pending.lock   taken while appending to or rotating the pending files
+
+Additions are appended to the pending files and searched exactly until
+`compact()` merges them into the main arrays. The web server may keep
+appending while the CLI compacts the same directory: compaction first
+renames the pending files to pending.*.compacting (under the lock, so no
+addition is split between the old and new files), merges those, and
+deletes them only once the new arrays are in place. Additions made in the
+meantime go to fresh pending files and are kept.
+
+CLI:
+    python vision_ai/similarity_index.py build --images catalog/ --index-dir index/ --type ivf
+    python vision_ai/similarity_index.py compact --index-dir index/ [--type ivf]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking of pending files
+    fcntl = None
+
+INDEX_TYPES = ('flat', 'ivf')
+EMBEDDING_DIM = 2048
+
+PENDING_FILES = ("pending.f32", "pending.jsonl")
+COMPACTING_SUFFIX = ".compacting"
+
+
+class VectorIndex:
+
+    index_type = 'flat'
+
+    def __init__(
+        self,
+        dim: int = EMBEDDING_DIM,
+        vectors: Optional[np.ndarray] = None,
+        items: Optional[List[Dict[str, Any]]] = None,
+        directory: Optional[str] = None
+    ):
+        self.dim = dim
+        self.directory = Path(directory) if directory else None
+
+        self._vectors = vectors if vectors is not None else np.zeros((0, dim), dtype=np.float32)
+        self._items: List[Dict[str, Any]] = items or []
+
+        self._pending = np.zeros((64, dim), dtype=np.float32)
+        self._pending_count = 0
+
+        # Row ids across main + pending rows; re-added ids shadow old rows
+        self._rows_by_id: Dict[str, int] = {item["id"]: row for row, item in enumerate(self._items)}
+        self._deleted = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._rows_by_id)
+
+    def add(self, item_id: str, vector: np.ndarray, metadata: Optional[Dict[str, Any]] = None):
+        vector = self._normalise(vector)
+        item = dict(metadata or {}, id=str(item_id))
+
+        with self._lock:
+            if self._pending_count == len(self._pending):
+                grown = np.zeros((len(self._pending) * 2, self.dim), dtype=np.float32)
+                grown[:self._pending_count] = self._pending[:self._pending_count]
+                self._pending = grown
+            self._pending[self._pending_count] = vector
+            self._pending_count += 1
+            self._items.append(item)
+
+            row = len(self._items) - 1
+            previous = self._rows_by_id.get(item["id"])
+            if previous is not None:
+                self._deleted.add(previous)
+            self._rows_by_id[item["id"]] = row
+
+            if self.directory is not None:
+                self._append_pending(vector, item)
+
+    def get_vector(self, item_id: str) -> Optional[np.ndarray]:
+        row = self._rows_by_id.get(str(item_id))
+        if row is None:
+            return None
+        if row < len(self._vectors):
+            return np.asarray(self._vectors[row])
+        return self._pending[row - len(self._vectors)].copy()
+
+    def search(self, vector: np.ndarray, k: int = 10) -> List[Dict[str, Any]]:
+        query = self._normalise(vector)
+        with self._lock:
+            pending = self._pending[:self._pending_count]
+            deleted = set(self._deleted)
+            base_rows = len(self._vectors)
+
+        rows, scores = self._search_main(query, k + len(deleted))
+        if len(pending):
+            pending_scores = pending @ query
+            rows = np.concatenate([rows, np.arange(len(pending)) + base_rows])
+            scores = np.concatenate([scores, pending_scores])
+
+        if deleted:
+            keep = np.array([row not in deleted for row in rows.tolist()], dtype=bool)
+            rows, scores = rows[keep], scores[keep]
+
+        top = self._top_k(scores, k)
+        return [
+            dict(self._items[row], score=round(float(score), 4))
+            for row, score in zip(rows[top].tolist(), scores[top].tolist())
+        ]
+
+    def _search_main(self, query: np.ndarray, k: int) -> tuple:
+        if not len(self._vectors):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        scores = self._vectors @ query
+        top = self._top_k(scores, k)
+        return top, scores[top]
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+        if len(scores) > k:
+            candidates = np.argpartition(-scores, k)[:k]
+        else:
+            candidates = np.arange(len(scores))
+        return candidates[np.argsort(-scores[candidates])]
+
+    def _normalise(self, vector: np.ndarray) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        if vector.shape[0] != self.dim:
+            raise ValueError(f"Expected a {self.dim}-d embedding, got {vector.shape[0]}")
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _live_rows(self) -> tuple:
+        # (vectors, items) for every non-deleted row, main and pending
+        with self._lock:
+            pending = self._pending[:self._pending_count].copy()
+            items = list(self._items)
+            deleted = set(self._deleted)
+        vectors = np.concatenate([np.asarray(self._vectors), pending]) if len(pending) else np.asarray(self._vectors)
+        live = [row for row in range(len(items)) if row not in deleted]
+        return vectors[live], [items[row] for row in live]
+
+    # Persistence
+
+    def _append_pending(self, vector: np.ndarray, item: Dict[str, Any]):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with _pending_lock(self.directory):
+            with open(self.directory / "pending.f32", 'ab') as f:
+                f.write(vector.astype(np.float32).tobytes())
+            with open(self.directory / "pending.jsonl", 'a', encoding='utf-8') as f:
+                f.write(json.dumps(item) + "\n")
+
+    def _meta(self) -> Dict[str, Any]:
+        return {"type": self.index_type, "dim": self.dim}
+
+    def _save_extra(self, directory: Path, tmp_suffix: str):
+        pass
+
+    def save(self, directory: Optional[str] = None):
+        directory = Path(directory) if directory else self.directory
+        directory.mkdir(parents=True, exist_ok=True)
+        tmp_suffix = f".tmp{os.getpid()}"
+
+        with open(directory / f"vectors.npy{tmp_suffix}", 'wb') as f:
+            np.save(f, np.asarray(self._vectors, dtype=np.float32))
+        (directory / f"items.json{tmp_suffix}").write_text(json.dumps(self._items))
+        (directory / f"meta.json{tmp_suffix}").write_text(json.dumps(self._meta()))
+        self._save_extra(directory, tmp_suffix)
+
+        for tmp_file in directory.glob(f"*{tmp_suffix}"):
+            os.replace(tmp_file, directory / tmp_file.name[:-len(tmp_suffix)])
+
+    @classmethod
+    def _from_live_rows(cls, vectors: np.ndarray, items: List[Dict[str, Any]], dim: int, directory, **kwargs):
+        return cls(dim=dim, vectors=vectors, items=items, directory=directory)
+
+    def compact(self, index_type: Optional[str] = None, **kwargs) -> 'VectorIndex':
+        # Merge pending rows and drop shadowed ones; optionally convert the
+        # index type. Returns the freshly loaded (mmap-backed) index.
+        index_class = INDEX_CLASSES[index_type or self.index_type]
+        if self.directory is None:
+            vectors, items = self._live_rows()
+            return index_class._from_live_rows(vectors, items, self.dim, None, **kwargs)
+
+        # Compacts what is on disk, which includes rows other processes added
+        directory = self.directory
+        _rotate_pending(directory)
+        vectors, items = _load_compacted(directory, self.dim)._live_rows()
+        compacted = index_class._from_live_rows(vectors, items, self.dim, str(directory), **kwargs)
+        compacted.save()
+        for name in PENDING_FILES:
+            (directory / f"{name}{COMPACTING_SUFFIX}").unlink(missing_ok=True)
+        return load_index(str(directory), self.dim)
+
+
+class IVFIndex(VectorIndex):
+
+    index_type = 'ivf'
+
+    def __init__(
+        self,
+        dim: int = EMBEDDING_DIM,
+        vectors: Optional[np.ndarray] = None,
+        items: Optional[List[Dict[str, Any]]] = None,
+        directory: Optional[str] = None,
+        centroids: Optional[np.ndarray] = None,
+        offsets: Optional[np.ndarray] = None,
+        nprobe: int = 8
+    ):
+        super().__init__(dim, vectors, items, directory)
+        self.centroids = centroids if centroids is not None else np.zeros((0, dim), dtype=np.float32)
+        self.offsets = offsets if offsets is not None else np.zeros(1, dtype=np.int64)
+        self.nprobe = nprobe
+
+    def _search_main(self, query: np.ndarray, k: int) -> tuple:
+        if not len(self.centroids):
+            return super()._search_main(query, k)
+
+        probe = self._top_k(self.centroids @ query, min(self.nprobe, len(self.centroids)))
+        rows = np.concatenate([
+            np.arange(self.offsets[cluster], self.offsets[cluster + 1]) for cluster in probe.tolist()
+        ])
+        if not len(rows):
+            return rows.astype(np.int64), np.zeros(0, dtype=np.float32)
+
+        # Probed clusters are contiguous row ranges, so this reads only
+        # their pages of the memory-mapped vectors.
+        scores = np.concatenate([
+            self._vectors[self.offsets[cluster]:self.offsets[cluster + 1]] @ query
+            for cluster in probe.tolist()
+        ])
+        top = self._top_k(scores, k)
+        return rows[top], scores[top]
+
+    def _meta(self) -> Dict[str, Any]:
+        return dict(super()._meta(), nlist=len(self.centroids), nprobe=self.nprobe)
+
+    def _save_extra(self, directory: Path, tmp_suffix: str):
+        with open(directory / f"centroids.npy{tmp_suffix}", 'wb') as f:
+            np.save(f, self.centroids.astype(np.float32))
+        with open(directory / f"offsets.npy{tmp_suffix}", 'wb') as f:
+            np.save(f, self.offsets.astype(np.int64))
+
+    @classmethod
+    def _from_live_rows(
+        cls,
+        vectors: np.ndarray,
+        items: List[Dict[str, Any]],
+        dim: int,
+        directory,
+        nlist: Optional[int] = None,
+        nprobe: int = 8,
+        iterations: int = 10,
+        sample_size: int = 50_000,
+        seed: int = 0
+    ):
+        if not len(vectors):
+            # Nothing live to cluster: searches fall back to the (empty) flat scan
+            return cls(dim=dim, directory=directory, nprobe=nprobe)
+        if nlist is None:
+            nlist = max(1, int(np.sqrt(len(vectors))))
+        nlist = min(nlist, max(1, len(vectors)))
+
+        centroids = train_centroids(vectors, nlist, iterations, sample_size, seed)
+        assignments = assign_clusters(vectors, centroids)
+
+        order = np.argsort(assignments, kind='stable')
+        counts = np.bincount(assignments, minlength=nlist)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+        return cls(
+            dim=dim,
+            vectors=np.ascontiguousarray(vectors[order]),
+            items=[items[row] for row in order.tolist()],
+            directory=directory,
+            centroids=centroids,
+            offsets=offsets,
+            nprobe=nprobe
+        )
+
+
+INDEX_CLASSES = {'flat': VectorIndex, 'ivf': IVFIndex}
+
+
+def train_centroids(
+    vectors: np.ndarray,
+    nlist: int,
+    iterations: int = 10,
+    sample_size: int = 50_000,
+    seed: int = 0
+) -> np.ndarray:
+    # Spherical k-means on a sample of the (normalised) vectors
+    rng = np.random.default_rng(seed)
+    if len(vectors) > sample_size:
+        sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+    else:
+        sample = np.asarray(vectors)
+
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = assign_clusters(sample, centroids)
+        for cluster in range(nlist):
+            members = sample[assignments == cluster]
+            if len(members):
+                centroid = members.sum(axis=0)
+                centroids[cluster] = centroid / max(np.linalg.norm(centroid), 1e-12)
+    return centroids.astype(np.float32)
+
+
+def assign_clusters(vectors: np.ndarray, centroids: np.ndarray, chunk_size: int = 8192) -> np.ndarray:
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), chunk_size):
+        chunk = np.asarray(vectors[start:start + chunk_size])
+        assignments[start:start + chunk_size] = np.argmax(chunk @ centroids.T, axis=1)
+    return assignments
+
+
+def load_index(directory: str, dim: int = EMBEDDING_DIM) -> VectorIndex:
+    # `dim` is only used for a directory that was never compacted
+    directory = Path(directory)
+    index = _load_compacted(directory, dim)
+    _load_pending(index, directory)
+    return index
+
+
+def _load_compacted(directory: Path, dim: int) -> VectorIndex:
+    # The main arrays plus the rows of an unfinished compaction, if any
+    if not (directory / "meta.json").exists():
+        # Nothing compacted yet: start flat and replay any pending rows
+        index = VectorIndex(dim=dim, directory=str(directory))
+    else:
+        meta = json.loads((directory / "meta.json").read_text())
+        vectors = np.load(directory / "vectors.npy", mmap_mode='r')
+        items = json.loads((directory / "items.json").read_text())
+
+        if meta["type"] == 'ivf':
+            index = IVFIndex(
+                dim=meta["dim"],
+                vectors=vectors,
+                items=items,
+                directory=str(directory),
+                centroids=np.load(directory / "centroids.npy"),
+                offsets=np.load(directory / "offsets.npy"),
+                nprobe=int(os.getenv('VISION_INDEX_NPROBE', str(meta.get("nprobe", 8))))
+            )
+        else:
+            index = VectorIndex(dim=meta["dim"], vectors=vectors, items=items, directory=str(directory))
+
+    _load_pending(index, directory, COMPACTING_SUFFIX)
+    return index
+
+
+@contextlib.contextmanager
+def _pending_lock(directory: Path):
+    # Serialises appends with rotation and repair, across processes
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / "pending.lock", 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _rotate_pending(directory: Path):
+    with _pending_lock(directory):
+        if any((directory / f"{name}{COMPACTING_SUFFIX}").exists() for name in PENDING_FILES):
+            # Left by an interrupted compaction: merge those rows first; the
+            # current pending rows stay pending until the next compaction
+            return
+        for name in PENDING_FILES:
+            if (directory / name).exists():
+                os.replace(directory / name, directory / f"{name}{COMPACTING_SUFFIX}")
+
+
+def _load_pending(index: VectorIndex, directory: Path, suffix: str = ""):
+    # Each addition appends a vector to pending.f32, then a line to
+    # pending.jsonl. A crash part-way leaves a partial last vector, a torn
+    # last line or a vector without its item: that addition is dropped and
+    # both files are cut back to the complete rows, so later appends stay
+    # aligned.
+    items_path = directory / f"pending.jsonl{suffix}"
+    vectors_path = directory / f"pending.f32{suffix}"
+    if not items_path.exists() or not vectors_path.exists():
+        return
+
+    with _pending_lock(directory):
+        items = []
+        item_ends = []  # byte offset after each complete line
+        with open(items_path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    items.append(json.loads(line))
+                except ValueError:
+                    break
+                item_ends.append((item_ends[-1] if item_ends else 0) + len(line))
+        vectors = np.fromfile(vectors_path, dtype=np.float32)
+        count = min(len(items), len(vectors) // index.dim)
+        vectors = vectors[:count * index.dim].reshape(count, index.dim)
+        items = items[:count]
+
+        items_size = item_ends[count - 1] if count else 0
+        vectors_size = count * index.dim * vectors.itemsize
+        for path, size in ((items_path, items_size), (vectors_path, vectors_size)):
+            if path.stat().st_size != size:
+                print(f"⚠️  Dropping an incomplete addition from {path.name}")
+                os.truncate(path, size)
+
+    directory_backup, index.directory = index.directory, None
+    for item, vector in zip(items, vectors):
+        item_id = item.pop("id")
+        index.add(item_id, vector, item)
+    index.directory = directory_backup
+
+
+_index: Optional[VectorIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_similarity_index() -> VectorIndex:
+    # VISION_INDEX_DIR persists the index; without it the index lives only
+    # in this process.
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index_dir = os.getenv('VISION_INDEX_DIR')
+                _index = load_index(index_dir) if index_dir else VectorIndex()
+    return _index
+
+
+def _build_from_images(image_dir: str, index_dir: str, index_type: str, nlist: Optional[int], batch_size: int):
+    import torch
+
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+    from vision_ai.check_inference_modes import collect_images
+    from vision_ai.image_classifier import CraftImageClassifier
+
+    classifier = CraftImageClassifier()
+    image_paths = collect_images([image_dir])
+
+    index = VectorIndex(directory=index_dir)
+    for start in range(0, len(image_paths), batch_size):
+        chunk = image_paths[start:start + batch_size]
+        tensors = []
+        kept = []
+        for path in chunk:
+            try:
+                tensors.append(classifier.preprocess(classifier.load_image(path)))
+                kept.append(path)
+            except Exception as e:
+                print(f"✗ Skipping {path}: {e}")
+        if not tensors:
+            continue
+        results, embeddings = classifier.classify_batch_with_embeddings(torch.stack(tensors))
+        for path, result, embedding in zip(kept, results, embeddings.numpy()):
+            index.add(path, embedding, {"craft_type": result["craft_type"]})
+        print(f"  {min(start + batch_size, len(image_paths))}/{len(image_paths)} images embedded")
+
+    index.compact(index_type, **({"nlist": nlist} if nlist and index_type == 'ivf' else {}))
+    print(f"✓ {index_type} index with {len(index)} images written to {index_dir}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and maintain the similar-crafts index")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Embed a directory of images into a new index")
+    build.add_argument('--images', required=True)
+    build.add_argument('--index-dir', required=True)
+    build.add_argument('--type', choices=INDEX_TYPES, default='ivf')
+    build.add_argument('--nlist', type=int, help="IVF clusters (default: sqrt(n))")
+    build.add_argument('--batch-size', type=int, default=16)
+
+    compact = subparsers.add_parser("compact", help="Merge pending additions into the main arrays")
+    compact.add_argument('--index-dir', required=True)
+    compact.add_argument('--type', choices=INDEX_TYPES)
+    compact.add_argument('--nlist', type=int)
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        _build_from_images(args.images, args.index_dir, args.type, args.nlist, args.batch_size)
+    else:
+        index = load_index(args.index_dir)
+        index_type = args.type or index.index_type
+        kwargs = {"nlist": args.nlist} if args.nlist and index_type == 'ivf' else {}
+        index = index.compact(index_type, **kwargs)
+        print(f"✓ Compacted {index.index_type} index with {len(index)} images")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Craft taxonomy used to turn model predictions into craft types, materials
+and regions.
+
+The keyword taxonomy is compiled once per model into integer lookup tables
+indexed by class id (class -> craft type id, class -> material bitmask), so
+mapping a prediction is an array lookup instead of a keyword scan. The same
+tables are also expanded into class -> craft and class -> material matrices
+so the full softmax of a whole batch can be aggregated in one matmul. Custom
+taxonomies can be loaded from a JSON file with the same keys as
+DEFAULT_TAXONOMY; sections missing from the file keep their defaults.
+"""
+
+import hashlib
+import json
+from typing import Any, Dict, List, Optional
+
+import torch
+
+DEFAULT_TAXONOMY: Dict[str, Any] = {
+    "craft_keywords": {
+        'pottery': ['pot', 'vase', 'jar', 'pottery', 'ceramic', 'clay'],
+        'textile': ['fabric', 'cloth', 'textile', 'weaving', 'loom', 'thread'],
+        'woodwork': ['wood', 'carving', 'furniture', 'wooden'],
+        'metalwork': ['metal', 'iron', 'bronze', 'brass', 'copper'],
+        'basketry': ['basket', 'wicker', 'weave'],
+        'jewelry': ['necklace', 'bracelet', 'jewelry', 'ornament'],
+        'painting': ['painting', 'canvas', 'art'],
+        'sculpture': ['sculpture', 'statue', 'carving']
+    },
+    "material_keywords": {
+        'clay': ['pot', 'pottery', 'ceramic', 'clay'],
+        'wood': ['wood', 'wooden', 'timber'],
+        'metal': ['metal', 'iron', 'bronze', 'brass', 'copper', 'silver', 'gold'],
+        'fabric': ['fabric', 'cloth', 'textile', 'cotton', 'silk', 'wool'],
+        'natural_fiber': ['basket', 'wicker', 'bamboo', 'reed', 'straw']
+    },
+    "regions": {
+        'pottery': 'South Asia',
+        'textile': 'South Asia',
+        'woodwork': 'Southeast Asia',
+        'metalwork': 'Middle East',
+        'basketry': 'Southeast Asia',
+        'jewelry': 'South Asia',
+        'painting': 'East Asia',
+        'sculpture': 'South Asia'
+    },
+    "default_craft": "traditional_craft",
+    "default_materials": ["traditional_materials"],
+    "default_region": "Unknown"
+}
+
+# Material sets are stored as int64 bitmasks
+MAX_MATERIALS = 63
+
+
+def load_taxonomy(path: Optional[str] = None) -> Dict[str, Any]:
+    taxonomy = dict(DEFAULT_TAXONOMY)
+    if path:
+        with open(path, 'r', encoding='utf-8') as f:
+            custom = json.load(f)
+        unknown = set(custom) - set(DEFAULT_TAXONOMY)
+        if unknown:
+            raise ValueError(f"Unknown taxonomy sections: {', '.join(sorted(unknown))}")
+        taxonomy.update(custom)
+    return taxonomy
+
+
+class CompiledTaxonomy:
+
+    def __init__(self, taxonomy: Dict[str, Any], class_labels: List[str]):
+        self.craft_types: List[str] = list(taxonomy["craft_keywords"])
+        self.materials: List[str] = list(taxonomy["material_keywords"])
+        self.regions: Dict[str, str] = dict(taxonomy["regions"])
+        self.default_craft: str = taxonomy["default_craft"]
+        self.default_materials: List[str] = list(taxonomy["default_materials"])
+        self.default_region: str = taxonomy["default_region"]
+
+        if len(self.materials) > MAX_MATERIALS:
+            raise ValueError(f"At most {MAX_MATERIALS} materials are supported")
+
+        craft_keywords = [taxonomy["craft_keywords"][craft] for craft in self.craft_types]
+        material_keywords = [taxonomy["material_keywords"][material] for material in self.materials]
+
+        class_to_craft = []
+        class_to_materials = []
+        craft_matrix = torch.zeros(len(class_labels), len(self.craft_types))
+        for class_id, label in enumerate(class_labels):
+            label_lower = label.lower()
+
+            # First matching craft in taxonomy order wins (-1: no craft);
+            # the aggregation matrix keeps every matching craft.
+            craft_id = -1
+            for i, keywords in enumerate(craft_keywords):
+                if any(keyword in label_lower for keyword in keywords):
+                    craft_matrix[class_id, i] = 1.0
+                    if craft_id < 0:
+                        craft_id = i
+            class_to_craft.append(craft_id)
+
+            mask = 0
+            for i, keywords in enumerate(material_keywords):
+                if any(keyword in label_lower for keyword in keywords):
+                    mask |= 1 << i
+            class_to_materials.append(mask)
+
+        self.class_to_craft = torch.tensor(class_to_craft, dtype=torch.long)
+        self.class_to_materials = torch.tensor(class_to_materials, dtype=torch.long)
+
+        # Only a handful of columns, so dense matmul beats a sparse kernel
+        self.craft_matrix = craft_matrix
+        self.material_matrix = (
+            (self.class_to_materials.unsqueeze(1) >> torch.arange(len(self.materials))) & 1
+        ).float()
+
+        self.fingerprint = hashlib.sha256(
+            json.dumps([taxonomy, class_labels], sort_keys=True).encode('utf-8')
+        ).hexdigest()[:12]
+
+    def craft_type(self, class_indices: torch.Tensor) -> str:
+        # class_indices are ranked predictions; the best-ranked class that
+        # maps to a craft decides the craft type.
+        for craft_id in self.class_to_craft[class_indices].tolist():
+            if craft_id >= 0:
+                return self.craft_types[craft_id]
+        return self.default_craft
+
+    def detected_materials(self, class_indices: torch.Tensor) -> List[str]:
+        mask = 0
+        for class_mask in self.class_to_materials[class_indices].tolist():
+            mask |= class_mask
+        if not mask:
+            return list(self.default_materials)
+        return [material for i, material in enumerate(self.materials) if mask >> i & 1]
+
+    def aggregate(self, probabilities: torch.Tensor) -> tuple:
+        # probabilities: [batch, num_classes] softmax output. Returns
+        # ([batch, num_crafts], [batch, num_materials]) summed probability
+        # mass per craft type and per material.
+        num_classes = probabilities.shape[1]
+        craft_scores = probabilities @ self.craft_matrix[:num_classes]
+        material_scores = probabilities @ self.material_matrix[:num_classes]
+        return craft_scores, material_scores
+
+    def ranked_crafts(self, craft_scores: torch.Tensor) -> List[tuple]:
+        scores, order = torch.sort(craft_scores, descending=True)
+        return [
+            (self.craft_types[craft_id], score)
+            for craft_id, score in zip(order.tolist(), scores.tolist())
+        ]
+
+    def scored_materials(self, material_scores: torch.Tensor, min_score: float) -> List[str]:
+        scores, order = torch.sort(material_scores, descending=True)
+        materials = [
+            self.materials[material_id]
+            for material_id, score in zip(order.tolist(), scores.tolist())
+            if score >= min_score
+        ]
+        return materials or list(self.default_materials)
+
+    def region(self, craft_type: str) -> str:
+        return self.regions.get(craft_type, self.default_region)
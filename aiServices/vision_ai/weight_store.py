@@ -0,0 +1,134 @@
+"""
+Local, memory-mapped store for backbone weights.
+
+`models.resnet50(pretrained=True)` goes through the torchvision hub cache
+(downloading on a cold node) and deserialises ~100 MB into private memory
+in every worker process. With VISION_WEIGHTS_DIR set, backbones are instead
+built on the meta device and their state dict is loaded from
+`{VISION_WEIGHTS_DIR}/{backbone}.pt` with `torch.load(mmap=True)` and
+`load_state_dict(assign=True)`: parameters point straight at the mapped
+file, so pages come from the OS page cache and are shared by every process
+on the node. The weight store never touches the network; a missing file is
+an error.
+
+Modes that rewrite weights (torchscript freezing, int8 quantization,
+channels_last) copy them into private memory, so the sharing applies to
+`eager` and `compile` without channels_last.
+
+Export the artifacts once (this is the only step that downloads):
+    python vision_ai/weight_store.py export --weights-dir weights/ --backbones resnet50 resnet18
+"""
+
+import argparse
+import os
+import resource
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import torch
+import torchvision.models as models
+
+
+def weights_path(backbone: str, weights_dir: Optional[str] = None) -> Optional[Path]:
+    weights_dir = weights_dir or os.getenv('VISION_WEIGHTS_DIR')
+    if not weights_dir:
+        return None
+    return Path(weights_dir) / f"{backbone}.pt"
+
+
+def load_backbone(backbone: str, weights_dir: Optional[str] = None) -> tuple:
+    # Returns (model, load report). Without a weights directory this falls
+    # back to the torchvision pretrained weights.
+    start = time.perf_counter()
+    path = weights_path(backbone, weights_dir)
+
+    if path is None:
+        model = getattr(models, backbone)(pretrained=True)
+        source = "torchvision"
+    else:
+        if not path.exists():
+            raise FileNotFoundError(
+                f"No weights for {backbone} at {path}; export them with "
+                f"vision_ai/weight_store.py export"
+            )
+        state_dict = torch.load(path, mmap=True, weights_only=True, map_location='cpu')
+        # Meta-device modules have no storage, so nothing is allocated (or
+        # randomly initialised) before the mapped tensors are assigned.
+        with torch.device('meta'):
+            model = getattr(models, backbone)(weights=None)
+        model.load_state_dict(state_dict, assign=True)
+        source = str(path)
+
+    model.eval()
+    return model, {
+        "backbone": backbone,
+        "source": source,
+        "mmap": path is not None,
+        "load_seconds": round(time.perf_counter() - start, 3)
+    }
+
+
+def process_memory() -> Dict[str, Any]:
+    # Resident memory split into anonymous (private) and file-backed pages;
+    # mmap-loaded weights show up as file-backed and are shared.
+    memory = {}
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in ('VmRSS', 'RssAnon', 'RssFile'):
+                    memory[key] = round(int(value.split()[0]) / 1024.0, 1)
+    except OSError:
+        pass
+
+    return {
+        "rss_mb": memory.get('VmRSS'),
+        "rss_anon_mb": memory.get('RssAnon'),
+        "rss_file_mb": memory.get('RssFile'),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1)
+    }
+
+
+def export_weights(backbones: List[str], weights_dir: str) -> List[Path]:
+    weights_dir = Path(weights_dir)
+    weights_dir.mkdir(parents=True, exist_ok=True)
+
+    written = []
+    for backbone in backbones:
+        model = getattr(models, backbone)(pretrained=True)
+        path = weights_dir / f"{backbone}.pt"
+        tmp_path = path.with_suffix(f".pt.tmp{os.getpid()}")
+        torch.save(model.state_dict(), tmp_path)
+        os.replace(tmp_path, path)
+        written.append(path)
+        print(f"✓ {backbone} -> {path}")
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local vision weight store")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export = subparsers.add_parser("export", help="Write torchvision pretrained weights to the store")
+    export.add_argument('--weights-dir', required=True)
+    export.add_argument('--backbones', nargs='+', default=['resnet50'])
+
+    check = subparsers.add_parser("check", help="Load backbones from the store and report time/RSS")
+    check.add_argument('--weights-dir', required=True)
+    check.add_argument('--backbones', nargs='+', default=['resnet50'])
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_weights(args.backbones, args.weights_dir)
+        return
+
+    for backbone in args.backbones:
+        _, report = load_backbone(backbone, args.weights_dir)
+        print(f"✓ {backbone}: {report['load_seconds']}s from {report['source']}")
+    print(process_memory())
+
+
+if __name__ == "__main__":
+    main()